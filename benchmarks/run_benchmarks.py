@@ -0,0 +1,325 @@
+"""
+Benchmarks for Graph operations, I/O and path queries.
+
+Run from the root of the repository:
+    python -m benchmarks.run_benchmarks --output results.json
+and later, to flag what got slower:
+    python -m benchmarks.run_benchmarks --baseline results.json
+--save writes the results to benchmarks/baseline.json, and --baseline without a file compares
+against it. The committed baseline.json was recorded on the code before the optimizations.
+Timings are the median of --repeat runs, with the garbage collector off during each run (as in
+timeit); peak memory is measured with tracemalloc in a separate run. A benchmark is flagged when
+its time or its peak memory is over its threshold times the baseline and also over the baseline
+by a minimum margin, so that tiny timings do not fail the run on noise.
+
+The harness also runs on older versions of the code: the benchmarks of an API the code does not
+have yet (a keyword argument, a method, the binary format) are skipped and listed in the results,
+and the graphs are built edge by edge from a fixed seed, so that every version measures the same
+graphs.
+"""
+import argparse
+import copy
+import gc
+import inspect
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from src.graph import Graph
+from src.random_graph import generate_random_graph
+from src.read_graph import read_graph
+from src.write_graph import write_graph
+
+try:
+    from src import binary_graph
+except ImportError:
+    binary_graph = None
+
+# (number of vertices, number of edges) of the generated graphs, by suite
+SUITES = {
+    "quick": [(1000, 5000), (10000, 50000)],
+    "full": [(1000, 5000), (10000, 50000), (10000, 500000), (100000, 1000000)],
+}
+# a benchmark is flagged when it is this many times slower than the baseline, and slower by at
+# least MIN_SECONDS
+DEFAULT_THRESHOLD = 1.25
+MIN_SECONDS = 0.005
+# ... or when its peak memory is this many times the baseline, and larger by at least MIN_BYTES
+DEFAULT_MEMORY_THRESHOLD = 1.25
+MIN_BYTES = 1 << 20
+DEFAULT_REPEAT = 5
+SEED = 2024
+QUERIES = 50
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def accepts(function, parameter):
+    """
+    :return: True if the function takes a parameter of this name (an API of newer code)
+    """
+    return parameter in inspect.signature(function).parameters
+
+
+def random_edges(vertices, edges):
+    """
+    Draws the edges of a graph from SEED, the same way on every version of the code.
+    :return: a list of edges edges (start_vertex, end_vertex, cost), without duplicates
+    """
+    generator = random.Random(SEED)
+    edges = min(edges, vertices * vertices)
+    pairs = set()
+    while len(pairs) < edges:
+        pairs.add((generator.randrange(vertices), generator.randrange(vertices)))
+    return [(start, end, generator.randint(0, 100)) for start, end in sorted(pairs)]
+
+
+def benchmark_cases(vertices, edges, directory):
+    """
+    Builds the benchmarks for one graph size. Every case is a pair (name, setup) where setup()
+    prepares the input and returns the function to measure, so preparation is not timed; setup is
+    None for the benchmarks of APIs the code does not have.
+    :param vertices: the number of vertices of the generated graph
+    :param edges: the number of edges of the generated graph
+    :param directory: a directory for the files written by the I/O benchmarks
+    :return: a list of (name, setup) pairs
+    """
+    edge_list = []
+
+    def base_graph():
+        if not edge_list:
+            edge_list.extend(random_edges(vertices, edges))
+        graph = Graph(vertices)
+        for edge in edge_list:
+            graph.add_edge(*edge)
+        return graph
+
+    def queries():
+        generator = random.Random(SEED)
+        return [(generator.randrange(vertices), generator.randrange(vertices)) for _ in range(QUERIES)]
+
+    def add_edge():
+        generator = random.Random(SEED)
+        pairs = [(generator.randrange(vertices), generator.randrange(vertices), 1) for _ in range(edges)]
+        graph = Graph(vertices)
+        return lambda: [graph.add_edge(*pair) for pair in pairs]
+
+    def add_edges():
+        generator = random.Random(SEED)
+        pairs = [(generator.randrange(vertices), generator.randrange(vertices), 1) for _ in range(edges)]
+        graph = Graph(vertices)
+        return lambda: graph.add_edges(pairs)
+
+    def remove_vertex():
+        graph = base_graph()
+        victims = random.Random(SEED).sample(range(vertices), min(vertices, 100))
+        return lambda: [graph.remove_vertex(vertex) for vertex in victims]
+
+    def copy_graph(**options):
+        def setup():
+            graph = base_graph()
+            return lambda: graph.copy_graph(**options)
+        return setup
+
+    def deepcopy():
+        graph = base_graph()
+        return lambda: copy.deepcopy(graph)
+
+    def write(extension):
+        def setup():
+            graph = base_graph()
+            return lambda: write_graph(graph, os.path.join(directory, "graph" + extension))
+        return setup
+
+    def read(extension):
+        def setup():
+            file_name = os.path.join(directory, "graph" + extension)
+            write_graph(base_graph(), file_name)
+            return lambda: read_graph(Graph(), file_name)
+        return setup
+
+    def generate():
+        if accepts(generate_random_graph, "seed"):
+            return lambda: generate_random_graph(vertices, edges, seed=SEED)
+        random.seed(SEED)
+        return lambda: generate_random_graph(vertices, edges)
+
+    def backward_bfs():
+        graph = base_graph()
+        pairs = queries()
+        return lambda: [graph.backward_bfs(start, end) for start, end in pairs]
+
+    def dijkstra(**options):
+        def setup():
+            graph = base_graph()
+            pairs = queries()
+            return lambda: [graph.dijkstra(start, end, **options) for start, end in pairs]
+        return setup
+
+    has_queues = accepts(Graph.dijkstra, "queue")
+    return [
+        ("add_edge", add_edge),
+        ("add_edges", add_edges if hasattr(Graph, "add_edges") else None),
+        ("remove_vertex x100", remove_vertex),
+        ("copy_graph", copy_graph()),
+        ("copy_graph full", copy_graph(copy_on_write=False) if accepts(Graph.copy_graph, "copy_on_write") else None),
+        ("copy.deepcopy", deepcopy),
+        ("write_graph text", write(".txt")),
+        ("write_graph binary", write(".bin") if binary_graph is not None else None),
+        ("read_graph text", read(".txt")),
+        ("read_graph binary", read(".bin") if binary_graph is not None else None),
+        ("generate_random_graph", generate),
+        (f"backward_bfs x{QUERIES}", backward_bfs),
+        (f"dijkstra x{QUERIES}", dijkstra()),
+        (f"dijkstra indexed x{QUERIES}", dijkstra(queue="indexed") if has_queues else None),
+        (f"dijkstra bucket x{QUERIES}", dijkstra(queue="bucket") if has_queues else None),
+    ]
+
+
+def measure(setup, repeat):
+    """
+    Times the benchmark (median of repeat runs, each on a fresh setup and without the garbage
+    collector), then runs it once more under tracemalloc to get the peak memory it allocates.
+    :return: a tuple (seconds, peak_bytes)
+    """
+    timings = []
+    for _ in range(repeat):
+        function = setup()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    function = setup()
+    tracemalloc.start()
+    function()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return statistics.median(timings), peak_bytes
+
+
+def run(sizes, repeat, pattern=None, log=sys.stderr):
+    """
+    Runs every benchmark for every graph size.
+    :param sizes: a list of (number of vertices, number of edges) pairs
+    :param repeat: the number of timed runs of each benchmark
+    :param pattern: if given, only run the benchmarks whose name contains it
+    :param log: where to print progress
+    :return: the results, as a JSON-serializable dict
+    """
+    results = []
+    skipped = []
+    with tempfile.TemporaryDirectory() as directory:
+        for vertices, edges in sizes:
+            for name, setup in benchmark_cases(vertices, edges, directory):
+                if pattern is not None and pattern not in name:
+                    continue
+                if setup is None:
+                    if name not in skipped:
+                        skipped.append(name)
+                        print(f"{name:<24} skipped (not supported by this version of the code)", file=log)
+                    continue
+                seconds, peak_bytes = measure(setup, repeat)
+                results.append({"name": name, "vertices": vertices, "edges": edges,
+                                "seconds": seconds, "peak_bytes": peak_bytes})
+                print(f"{name:<24} n={vertices:<8} m={edges:<9} {seconds:10.4f} s "
+                      f"{peak_bytes / 2 ** 20:10.1f} MiB", file=log)
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def compare(current, baseline, threshold, memory_threshold=DEFAULT_MEMORY_THRESHOLD):
+    """
+    Compares the timings and the peak memory of two runs.
+    :param current: the results of the current run
+    :param baseline: the results of the baseline run
+    :param threshold: the slowdown ratio above which a benchmark is a regression (if it is also
+                      slower by MIN_SECONDS)
+    :param memory_threshold: the peak memory ratio above which a benchmark is a regression (if it
+                             also uses MIN_BYTES more)
+    :return: a list of (name, vertices, edges, metric, baseline value, current value) for every
+             metric ("seconds" or "peak_bytes") of a benchmark that regressed
+    """
+    def key(result):
+        return result["name"], result["vertices"], result["edges"]
+
+    limits = {"seconds": (threshold, MIN_SECONDS), "peak_bytes": (memory_threshold, MIN_BYTES)}
+    baseline_results = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = baseline_results.get(key(result))
+        if before is None:
+            continue
+        for metric, (ratio, margin) in limits.items():
+            if result[metric] > before[metric] * ratio and result[metric] - before[metric] > margin:
+                regressions.append((*key(result), metric, before[metric], result[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Graph operations, I/O and path queries.")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick", help="graph sizes to run")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="timed runs per benchmark (the median is kept)")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--save", action="store_true", help=f"write the results to {BASELINE_FILE}")
+    parser.add_argument("--baseline", nargs="?", const=BASELINE_FILE,
+                        help="compare against the JSON results in this file (by default the saved baseline)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown ratio flagged as a regression")
+    parser.add_argument("--memory-threshold", type=float, default=DEFAULT_MEMORY_THRESHOLD,
+                        help="peak memory ratio flagged as a regression")
+    arguments = parser.parse_args(argv)
+
+    baseline = None
+    if arguments.baseline:
+        # read first: --save may replace it
+        with open(arguments.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    current = run(SUITES[arguments.suite], arguments.repeat, arguments.filter)
+
+    file_names = [arguments.output] if arguments.output else []
+    if arguments.save:
+        file_names.append(BASELINE_FILE)
+    for file_name in file_names:
+        with open(file_name, "w") as output_file:
+            json.dump(current, output_file, indent=2)
+            output_file.write("\n")
+    if not file_names:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+
+    if baseline is not None:
+        regressions = compare(current, baseline, arguments.threshold, arguments.memory_threshold)
+        for name, vertices, edges, metric, before, after in regressions:
+            if metric == "seconds":
+                change = f"time {before:.4f} s -> {after:.4f} s"
+            else:
+                change = f"peak memory {before / 2 ** 20:.1f} MiB -> {after / 2 ** 20:.1f} MiB"
+            print(f"REGRESSION {name} n={vertices} m={edges}: {change} ({after / before:.2f}x)", file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+import mmap
+import tempfile
+from array import array
+
+from src.batch_queries import batch_distance_rows
+from src.csr_graph import CSRGraph
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# density (m / n^2) from which "auto" picks Floyd-Warshall over Johnson's algorithm
+DENSE_THRESHOLD = 0.1
+# side of the square tiles updated together by the blocked Floyd-Warshall
+BLOCK_SIZE = 256
+# smallest amount of work (number of vertices asked for * (n + m)) for which Johnson's algorithm
+# starts worker processes when no number of workers is given
+PARALLEL_WORK = 1 << 22
+# distance matrices of more bytes than this are kept in a memory-mapped file instead of in memory
+MEMMAP_THRESHOLD = 1 << 28
+INFINITY = float('inf')
+
+
+# Distances between every pair of a set of vertices
+class DistanceMatrix:
+    """
+    Distances from a list of source vertices to a list of target vertices, stored row-major in
+    one flat buffer of floats (infinity for the pairs with no path). The buffer is a NumPy array
+    when NumPy is installed and an array.array otherwise; both can be backed by a memory-mapped
+    file, in which case the file is kept open as long as the matrix exists.
+    """
+
+    def __init__(self, sources, targets, buffer, backing_file=None):
+        self.__sources = sources
+        self.__targets = targets
+        self.__source_positions = {vertex: i for i, vertex in enumerate(sources)}
+        self.__target_positions = {vertex: j for j, vertex in enumerate(targets)}
+        self.__buffer = buffer
+        self.__backing_file = backing_file
+
+    @property
+    def sources(self):
+        """
+        Complexity - Theta(1)
+        :return: the list of vertices of the rows
+        """
+        return self.__sources
+
+    @property
+    def targets(self):
+        """
+        Complexity - Theta(1)
+        :return: the list of vertices of the columns
+        """
+        return self.__targets
+
+    @property
+    def memory_mapped(self):
+        """
+        Complexity - Theta(1)
+        :return: True if the matrix is stored in a memory-mapped file, False otherwise
+        """
+        return self.__backing_file is not None
+
+    def distance(self, start_vertex, end_vertex):
+        """
+        Complexity - Theta(1)
+        :param start_vertex: a source vertex of the matrix
+        :param end_vertex: a target vertex of the matrix
+        :return: the cost of the lowest cost walk from start_vertex to end_vertex, or None if there
+                 is no path
+        :raises KeyError: if a vertex is not in the matrix
+        """
+        position = self.__source_positions[start_vertex] * len(self.__targets) + self.__target_positions[end_vertex]
+        value = self.__buffer[position]
+        return None if value == INFINITY else int(value)
+
+    def row(self, start_vertex):
+        """
+        Complexity - Theta(number of targets)
+        :param start_vertex: a source vertex of the matrix
+        :return: a dict mapping every target reachable from start_vertex to its distance
+        :raises KeyError: if the vertex is not in the matrix
+        """
+        width = len(self.__targets)
+        first = self.__source_positions[start_vertex] * width
+        buffer = self.__buffer
+        return {target: int(buffer[first + j]) for j, target in enumerate(self.__targets)
+                if buffer[first + j] != INFINITY}
+
+    def as_numpy(self):
+        """
+        Complexity - Theta(1)
+        :return: the matrix as a 2-dimensional NumPy array of floats (a view, not a copy)
+        :raises ValueError: if NumPy is not installed
+        """
+        if numpy is None:
+            raise ValueError("NumPy is not installed")
+        return numpy.asarray(self.__buffer).reshape(len(self.__sources), len(self.__targets))
+
+
+# Compute the distances between every pair of vertices (as an external function)
+def all_pairs_shortest_paths(graph, vertices=None, method="auto", workers=None, memmap_file=None):
+    """
+    Complexity - Theta(n^3) for "floyd_warshall", O(n m + k (n + m) log n) for "johnson", k being
+                 the number of vertices asked for
+    Computes the cost of the lowest cost walk between every pair of vertices.
+    "floyd_warshall" runs a blocked Floyd-Warshall over the whole graph, vectorized with NumPy
+    when it is installed (in pure Python otherwise, which only suits small graphs).
+    "johnson" makes the costs non-negative with Bellman-Ford potentials (skipped when no cost is
+    negative), then runs Dijkstra's algorithm from every vertex asked for, in parallel (see
+    batch_queries.batch_distance_rows).
+    "auto" picks Floyd-Warshall for dense graphs (density of at least DENSE_THRESHOLD) when
+    NumPy is installed and at least half of the vertices are asked for, and Johnson otherwise.
+    Matrices larger than MEMMAP_THRESHOLD bytes are stored in a memory-mapped temporary file.
+    :param graph: the graph (or CSRGraph snapshot), with integer vertices and costs
+    :param vertices: the vertices to compute the distances between (None for all of them); walks
+                     may still go through any vertex of the graph
+    :param method: "auto", "floyd_warshall" or "johnson"
+    :param workers: for "johnson", the number of worker processes (None for one per CPU, or for
+                    this process only when the work is below PARALLEL_WORK; 1 to run in this
+                    process)
+    :param memmap_file: if given, store the matrix in this file, memory-mapped
+    :return: a DistanceMatrix with the vertices as both its sources and its targets
+    :raises ValueError: if the method is unknown, a vertex is not in the graph or the graph has
+                        a negative cost cycle
+    """
+    if method not in ("auto", "floyd_warshall", "johnson"):
+        raise ValueError(f"Unknown all pairs method: {method}")
+
+    snapshot = graph if isinstance(graph, CSRGraph) else graph.freeze()
+    vertex_ids = list(snapshot.parse_vertices())
+    if vertices is None:
+        vertices = vertex_ids
+    else:
+        vertices = list(vertices)
+        for vertex in vertices:
+            if not snapshot.is_vertex(vertex):
+                raise ValueError(f"{vertex} is not a vertex of the graph")
+
+    if method == "auto":
+        vertex_count = len(vertex_ids)
+        dense = snapshot.number_of_edges >= DENSE_THRESHOLD * vertex_count * vertex_count
+        method = "floyd_warshall" if numpy is not None and dense and 2 * len(vertices) >= vertex_count else "johnson"
+
+    if method == "floyd_warshall":
+        return _floyd_warshall(snapshot, vertex_ids, vertices, memmap_file)
+    return _johnson(snapshot, vertices, workers, memmap_file)
+
+
+def _floyd_warshall(snapshot, vertex_ids, vertices, memmap_file):
+    """
+    Complexity - Theta(n^3)
+    :return: the DistanceMatrix of the vertices
+    """
+    n = len(vertex_ids)
+    subset = vertices is not vertex_ids
+    buffer, backing_file = _allocate(n * n, None if subset else memmap_file)
+    _, offsets, targets, costs, _, _, _ = snapshot.buffers()
+
+    if numpy is not None:
+        matrix = buffer.reshape(n, n)
+        rows = numpy.repeat(numpy.arange(n), numpy.diff(numpy.asarray(offsets)))
+        matrix[rows, numpy.asarray(targets)] = numpy.asarray(costs)
+        diagonal = numpy.arange(n)
+        matrix[diagonal, diagonal] = numpy.minimum(matrix[diagonal, diagonal], 0)
+        _blocked_floyd_warshall(matrix)
+        negative_cycle = bool((matrix.diagonal() < 0).any())
+    else:
+        rows = []
+        for i in range(n):
+            row = array('d', [INFINITY]) * n
+            for edge in range(offsets[i], offsets[i + 1]):
+                row[targets[edge]] = costs[edge]
+            row[i] = min(row[i], 0)
+            rows.append(row)
+        _plain_floyd_warshall(rows)
+        negative_cycle = any(rows[i][i] < 0 for i in range(n))
+        for i, row in enumerate(rows):
+            buffer[i * n:(i + 1) * n] = row
+
+    if negative_cycle:
+        raise ValueError("The graph has a negative cost cycle")
+    if not subset:
+        return DistanceMatrix(vertex_ids, vertex_ids, buffer, backing_file)
+
+    positions = {vertex: i for i, vertex in enumerate(vertex_ids)}
+    indices = [positions[vertex] for vertex in vertices]
+    k = len(indices)
+    result, backing_file = _allocate(k * k, memmap_file)
+    if numpy is not None:
+        result.reshape(k, k)[:, :] = buffer.reshape(n, n)[numpy.ix_(indices, indices)]
+    else:
+        for i, row_index in enumerate(indices):
+            for j, column_index in enumerate(indices):
+                result[i * k + j] = buffer[row_index * n + column_index]
+    return DistanceMatrix(vertices, vertices, result, backing_file)
+
+
+def _blocked_floyd_warshall(matrix):
+    """
+    Complexity - Theta(n^3)
+    Floyd-Warshall on a NumPy matrix cut into tiles of BLOCK_SIZE x BLOCK_SIZE, one block of
+    intermediate vertices at a time: the diagonal tile of the block is relaxed first, then the
+    tiles of its rows and of its columns through it, then every other tile through the tiles of
+    its row and column. Each relaxation only touches tiles, which stay in the cache, and each tile
+    is read once per block of intermediate vertices, which keeps a memory-mapped matrix from being
+    streamed n times.
+    :return: None
+    """
+    n = matrix.shape[0]
+    blocks = [slice(start, min(start + BLOCK_SIZE, n)) for start in range(0, n, BLOCK_SIZE)]
+    for middle in blocks:
+        diagonal = matrix[middle, middle]
+        for k in range(diagonal.shape[0]):
+            numpy.minimum(diagonal, diagonal[:, k:k + 1] + diagonal[k], out=diagonal)
+
+        others = [block for block in blocks if block != middle]
+        for block in others:
+            tile = matrix[middle, block]
+            for k in range(diagonal.shape[0]):
+                numpy.minimum(tile, diagonal[:, k:k + 1] + tile[k], out=tile)
+            tile = matrix[block, middle]
+            for k in range(diagonal.shape[0]):
+                numpy.minimum(tile, tile[:, k:k + 1] + diagonal[k], out=tile)
+
+        for row_block in others:
+            column = matrix[row_block, middle]
+            for column_block in others:
+                tile = matrix[row_block, column_block]
+                row = matrix[middle, column_block]
+                for k in range(diagonal.shape[0]):
+                    numpy.minimum(tile, column[:, k:k + 1] + row[k], out=tile)
+
+
+def _plain_floyd_warshall(rows):
+    """
+    Complexity - Theta(n^3)
+    Floyd-Warshall on a list of rows, without NumPy.
+    :return: None
+    """
+    for k, row_k in enumerate(rows):
+        for row_i in rows:
+            cost_ik = row_i[k]
+            if cost_ik == INFINITY:
+                continue
+            for j, cost_kj in enumerate(row_k):
+                if cost_ik + cost_kj < row_i[j]:
+                    row_i[j] = cost_ik + cost_kj
+
+
+def _johnson(snapshot, vertices, workers, memmap_file):
+    """
+    Complexity - O(n m + k (n + m) log n)
+    :return: the DistanceMatrix of the vertices
+    """
+    vertex_ids, offsets, targets, costs, reverse_offsets, sources, reverse_costs = snapshot.buffers()
+    potentials = None
+    if any(cost < 0 for cost in costs):
+        potentials = _bellman_ford(offsets, targets, costs)
+        costs = array('q', (costs[edge] + potentials[i] - potentials[targets[edge]]
+                            for i in range(len(vertex_ids)) for edge in range(offsets[i], offsets[i + 1])))
+        reverse_costs = array('q', (reverse_costs[edge] + potentials[sources[edge]] - potentials[i]
+                                    for i in range(len(vertex_ids))
+                                    for edge in range(reverse_offsets[i], reverse_offsets[i + 1])))
+        snapshot = CSRGraph(snapshot.number_of_vertices, vertex_ids, offsets, targets, costs, reverse_offsets,
+                            sources, reverse_costs)
+
+    k = len(vertices)
+    buffer, backing_file = _allocate(k * k, memmap_file)
+    if potentials is not None:
+        positions = {vertex: i for i, vertex in enumerate(vertex_ids)}
+        vertex_potentials = [potentials[positions[vertex]] for vertex in vertices]
+
+    if workers is None and k * (len(vertex_ids) + len(targets)) < PARALLEL_WORK:
+        # starting the processes (and writing the snapshot they share) would take longer
+        workers = 1
+    for i, row in enumerate(batch_distance_rows(snapshot, vertices, vertices, workers)):
+        for j, distance in enumerate(row):
+            if distance is None:
+                continue
+            if potentials is not None:
+                distance += vertex_potentials[j] - vertex_potentials[i]
+            buffer[i * k + j] = float(distance)
+
+    return DistanceMatrix(vertices, vertices, buffer, backing_file)
+
+
+def _bellman_ford(offsets, targets, costs):
+    """
+    Complexity - O(n m)
+    Bellman-Ford from a virtual vertex with a 0 cost edge to every vertex.
+    :return: the list of the distances from the virtual vertex (the potentials of Johnson's
+             algorithm), by vertex index
+    :raises ValueError: if the graph has a negative cost cycle
+    """
+    n = len(offsets) - 1
+    potentials = [0] * n
+    for _ in range(n):
+        changed = False
+        for i in range(n):
+            for edge in range(offsets[i], offsets[i + 1]):
+                new_potential = potentials[i] + costs[edge]
+                if new_potential < potentials[targets[edge]]:
+                    potentials[targets[edge]] = new_potential
+                    changed = True
+        if not changed:
+            return potentials
+    raise ValueError("The graph has a negative cost cycle")
+
+
+def _allocate(size, memmap_file):
+    """
+    Complexity - Theta(size)
+    Allocates a flat buffer of size floats, all infinity. The buffer is memory-mapped if
+    memmap_file is given or if it is larger than MEMMAP_THRESHOLD bytes (in a temporary file).
+    :return: a tuple (buffer, backing_file), backing_file being None for an in-memory buffer
+    """
+    if size == 0 or (memmap_file is None and 8 * size <= MEMMAP_THRESHOLD):
+        if numpy is not None:
+            return numpy.full(size, INFINITY), None
+        return array('d', [INFINITY]) * size, None
+
+    backing_file = open(memmap_file, "w+b") if memmap_file is not None else tempfile.TemporaryFile()
+    if numpy is not None:
+        buffer = numpy.memmap(backing_file, dtype=numpy.float64, mode="w+", shape=(size,))
+        buffer.fill(INFINITY)
+        return buffer, backing_file
+
+    backing_file.truncate(8 * size)
+    buffer = memoryview(mmap.mmap(backing_file.fileno(), 8 * size)).cast('d')
+    row = array('d', [INFINITY]) * min(size, 1 << 16)
+    for start in range(0, size, len(row)):
+        end = min(start + len(row), size)
+        buffer[start:end] = row[:end - start]
+    return buffer, backing_file
@@ -0,0 +1,261 @@
+import json
+
+from src.batch_queries import QueryPool, batch_shortest_paths
+from src.csr_graph import INT64_MAX, INT64_MIN, fits_int64
+
+# number of read-only commands collected before their answers are written, so that the output
+# keeps streaming on endless inputs
+BLOCK_SIZE = 4096
+# smallest number of path queries in a block worth sending to worker processes
+PARALLEL_THRESHOLD = 64
+
+
+def _path_result(path):
+    """
+    Complexity - Theta(1)
+    :param path: what Graph.backward_bfs returns
+    :return: the JSON result of a bfs command
+    """
+    return None if path is None else {"path": path, "length": len(path) - 1}
+
+
+def _cost_result(result):
+    """
+    Complexity - Theta(1)
+    :param result: what Graph.dijkstra returns
+    :return: the JSON result of a dijkstra command
+    """
+    return None if result is None else {"path": result[0], "cost": result[1]}
+
+
+# command name -> (number of integer arguments, names of the optional last word, function taking
+# the graph and the arguments and returning the JSON result)
+# The operations of the graph server (see graph_server.py) are these commands too.
+READ_COMMANDS = {
+    "vertices": (0, (), lambda graph: graph.number_of_vertices),
+    "edges": (0, (), lambda graph: graph.number_of_edges),
+    "is_vertex": (1, (), lambda graph, vertex: graph.is_vertex(vertex)),
+    "is_edge": (2, (), lambda graph, start, end: graph.is_vertex(start) and graph.is_edge(start, end)),
+    "cost": (2, (), lambda graph, start, end: graph.get_cost(start, end)),
+    "in_degree": (1, (), lambda graph, vertex: graph.in_degree(vertex)),
+    "out_degree": (1, (), lambda graph, vertex: graph.out_degree(vertex)),
+    "outbound": (1, (), lambda graph, vertex: list(graph.neighbors(vertex))),
+    "inbound": (1, (), lambda graph, vertex: list(graph.neighbors(vertex, reverse=True))),
+    "bfs": (2, ("bidirectional",),
+            lambda graph, start, end, method=None: _path_result(
+                graph.backward_bfs(start, end, bidirectional=method == "bidirectional"))),
+    "dijkstra": (2, ("bidirectional", "astar"),
+                 lambda graph, start, end, method="dijkstra": _cost_result(graph.dijkstra(start, end, method=method))),
+    "k_paths": (3, (), lambda graph, start, end, k: [_cost_result(result)
+                                                     for result in graph.k_shortest_paths(start, end, k)]),
+}
+
+WRITE_COMMANDS = {
+    "add_vertex": (1, (), lambda graph, vertex: graph.add_vertex(vertex)),
+    "remove_vertex": (1, (), lambda graph, vertex: graph.remove_vertex(vertex)),
+    "add_edge": (3, (), lambda graph, start, end, cost: graph.add_edge(start, end, cost)),
+    "remove_edge": (2, (), lambda graph, start, end: graph.is_vertex(start) and graph.remove_edge(start, end)),
+    "set_cost": (3, (), lambda graph, start, end, cost: graph.modify_cost((start, end), cost)),
+}
+
+# read commands that batch_shortest_paths can answer, with its method and the result conversion
+PARALLEL_COMMANDS = {"bfs": ("bfs", _path_result), "dijkstra": ("dijkstra", _cost_result)}
+
+
+# Check the arguments of a command (as an external function)
+def check_command(name, arguments):
+    """
+    Complexity - Theta(number of arguments)
+    Vertex ids and costs are checked to be 8-byte signed integers, as in binary files, so that
+    no command puts into the graph a value that snapshots cannot hold.
+    :param name: the name of a command of READ_COMMANDS or WRITE_COMMANDS
+    :param arguments: its arguments: integers, then the name of an option if the command has some
+    :return: None
+    :raises ValueError: if the command is unknown or its arguments are wrong
+    """
+    if name in READ_COMMANDS:
+        arity, options, _ = READ_COMMANDS[name]
+    elif name in WRITE_COMMANDS:
+        arity, options, _ = WRITE_COMMANDS[name]
+    else:
+        raise ValueError(f"Unknown command: {name}")
+
+    if options and len(arguments) == arity + 1:
+        option = arguments[-1]
+        if option not in options:
+            raise ValueError(f"Unknown option of {name}: {option}")
+        arguments = arguments[:-1]
+    if len(arguments) != arity or not all(fits_int64(argument) for argument in arguments):
+        raise ValueError(f"{name} takes {arity} integer arguments between {INT64_MIN} and {INT64_MAX}")
+
+
+def _parse(line):
+    """
+    Complexity - Theta(length of the line)
+    :param line: a command line, such as "dijkstra 1 5" or "add_edge 1 5 10"
+    :return: a tuple (name, arguments)
+    :raises ValueError: if the command is unknown or its arguments are wrong
+    """
+    words = line.split()
+    arguments = []
+    for word in words[1:]:
+        try:
+            arguments.append(int(word))
+        except ValueError:
+            arguments.append(word)
+    check_command(words[0], arguments)
+    return words[0], arguments
+
+
+def _execute(graph, commands, name, arguments):
+    """
+    Complexity - that of the command
+    :return: the JSON object answering the command (without its line number)
+    """
+    try:
+        return {"result": commands[name][2](graph, *arguments)}
+    except KeyError as error:
+        return {"error": f"Not in the graph: {error.args[0]!r}"}
+    except ValueError as error:
+        return {"error": str(error)}
+
+
+# Answer a stream of commands as JSON lines (as an external function)
+def run_batch(graph, lines, output, workers=1):
+    """
+    Complexity - that of the commands
+    Runs one command per line (blank lines and lines starting with # are skipped) and writes one
+    JSON object per command to output: {"line": ..., "result": ...}, or {"line": ..., "error": ...}
+    if the command failed. Answers are written in the order of the commands.
+    Read-only commands are collected in blocks (ended by a mutation, by BLOCK_SIZE commands or by
+    the end of the input) and every block is written at once. With more than one worker, the
+    plain bfs and dijkstra queries of a block with at least PARALLEL_THRESHOLD of them are
+    answered by batch_shortest_paths on a pool of processes (any of the shortest paths may then
+    be returned). The pool is kept from one block to the next until a mutation.
+    :param graph: the graph to query and modify
+    :param lines: an iterable of command lines (a file, or sys.stdin)
+    :param output: a text file to write the answers to
+    :param workers: the number of worker processes for path queries (None for one per CPU)
+    :return: the number of commands that failed
+    """
+    errors = 0
+    block = []
+    pool = _BatchPool(graph, workers)
+    try:
+        for line_number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            try:
+                name, arguments = _parse(line)
+            except ValueError as error:
+                block.append((line_number, None, None, {"error": str(error)}))
+            else:
+                if name in WRITE_COMMANDS:
+                    errors += _write_block(graph, block, output, pool)
+                    pool.close()
+                    block = [(line_number, name, arguments, _execute(graph, WRITE_COMMANDS, name, arguments))]
+                else:
+                    block.append((line_number, name, arguments, None))
+
+            if len(block) >= BLOCK_SIZE:
+                errors += _write_block(graph, block, output, pool)
+                block = []
+
+        errors += _write_block(graph, block, output, pool)
+    finally:
+        pool.close()
+    output.flush()
+    return errors
+
+
+class _BatchPool:
+    """
+    The QueryPool of a batch, started for the first block that needs it and kept until the
+    graph changes (see close). When the graph holds values that a snapshot cannot, path queries
+    are answered in this process until the graph changes.
+    """
+
+    def __init__(self, graph, workers):
+        """
+        Complexity - Theta(1)
+        :param graph: the graph of the batch
+        :param workers: the number of worker processes (None for one per CPU)
+        """
+        self.__graph = graph
+        self.__workers = workers
+        self.__pool = None
+        self.__unsupported = False
+
+    @property
+    def parallel(self):
+        """
+        Complexity - Theta(1)
+        :return: True if path queries may be sent to worker processes
+        """
+        return self.__workers != 1 and not self.__unsupported
+
+    def shortest_paths(self, queries, method):
+        """
+        Complexity - that of batch_shortest_paths, plus writing the snapshot once per mutation
+        :param queries: a list of (start_vertex, end_vertex) pairs
+        :param method: "dijkstra" or "bfs"
+        :return: the list of the answers of batch_shortest_paths
+        :raises ValueError: if a vertex or a cost of the graph is not an 8-byte signed integer
+        """
+        if self.__pool is None:
+            try:
+                self.__pool = QueryPool(self.__graph, self.__workers)
+            except ValueError:
+                self.__unsupported = True
+                raise
+        return list(batch_shortest_paths(self.__graph, queries, method, pool=self.__pool))
+
+    def close(self):
+        """
+        Complexity - Theta(1)
+        Stops the workers; the next shortest_paths takes a new snapshot of the graph.
+        :return: None
+        """
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool = None
+        self.__unsupported = False
+
+
+def _write_block(graph, block, output, pool):
+    """
+    Complexity - that of the commands of the block
+    Answers the read-only commands of a block that have no answer yet and writes every answer.
+    :param block: a list of (line_number, name, arguments, answer) tuples, answer being None
+                  for the commands still to run
+    :param pool: the _BatchPool of the batch
+    :return: the number of answers that are errors
+    """
+    if pool.parallel:
+        for command, (method, convert) in PARALLEL_COMMANDS.items():
+            pending = [i for i, (_, name, arguments, answer) in enumerate(block)
+                       if answer is None and name == command and len(arguments) == 2 and
+                       graph.is_vertex(arguments[0]) and graph.is_vertex(arguments[1])]
+            if len(pending) < PARALLEL_THRESHOLD:
+                continue
+            try:
+                results = pool.shortest_paths([tuple(block[i][2]) for i in pending], method)
+            except ValueError:
+                # the graph holds values a snapshot cannot (it was not built by commands): the
+                # queries are answered one by one below, each with its own answer or error
+                break
+            for i, result in zip(pending, results):
+                line_number, name, arguments, _ = block[i]
+                block[i] = line_number, name, arguments, {"result": convert(result)}
+
+    lines = []
+    errors = 0
+    for line_number, name, arguments, answer in block:
+        if answer is None:
+            answer = _execute(graph, READ_COMMANDS, name, arguments)
+        errors += "error" in answer
+        lines.append(json.dumps({"line": line_number, **answer}) + "\n")
+    output.writelines(lines)
+    return errors
@@ -0,0 +1,259 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from src.binary_graph import BINARY_EXTENSION, read_binary_graph, write_binary_graph
+from src.csr_graph import CSRGraph, check_int64_graph
+
+# the snapshot opened by each worker process (see _open_snapshot)
+_worker_snapshot = None
+
+
+# Answer many shortest path queries in parallel (as an external function)
+def batch_shortest_paths(graph, queries, method="dijkstra", workers=None, snapshot_file=None, pool=None):
+    """
+    Complexity - O(k (n + m) log n) work in total, k being the number of distinct sources
+                 (targets for "bfs"), spread over the workers
+    Answers a list of (start_vertex, end_vertex) queries with a pool of worker processes.
+    Dijkstra queries are grouped by start vertex and each group is answered from one shortest
+    path tree; BFS queries are grouped by end vertex and answered from one backward BFS tree.
+    The graph is not pickled for the workers: it is written once to a binary graph file (see
+    binary_graph.py), which every worker memory-maps, so they all share the same read-only pages.
+    Results are yielded in the order of the queries, as soon as their group is done.
+    :param graph: the graph (or CSRGraph snapshot) to query
+    :param queries: an iterable of (start_vertex, end_vertex) pairs
+    :param method: "dijkstra" for lowest cost walks, "bfs" for paths with the fewest edges
+    :param workers: the number of worker processes (None for one per CPU); with 1, the queries
+                    are answered in this process
+    :param snapshot_file: an up-to-date binary graph file of the graph to use instead of writing
+                          a temporary one
+    :param pool: a QueryPool of the graph (still up to date) to answer on, instead of starting
+                 worker processes for this call only (workers and snapshot_file are then ignored)
+    :return: an iterator with, for every query, what Graph.dijkstra (a tuple (path, cost)) or
+             Graph.backward_bfs (a path) would return for it, None when there is no path
+    :raises ValueError: if the method is unknown, or a vertex or a cost of the graph is not an
+                        8-byte signed integer (raised by the call, not by the iterator)
+    """
+    if method not in ("dijkstra", "bfs"):
+        raise ValueError(f"Unknown batch method: {method}")
+    if pool is None:
+        _check_snapshot_source(graph, snapshot_file)
+    return _batch_shortest_paths(graph, queries, method, workers, snapshot_file, pool)
+
+
+def _batch_shortest_paths(graph, queries, method, workers, snapshot_file, pool):
+    """
+    Complexity - see batch_shortest_paths
+    The generator behind batch_shortest_paths, once its arguments are checked.
+    :return: an iterator for the answers of the queries, in order
+    """
+    queries = list(queries)
+    # the side shared by the queries of a group: start vertex for dijkstra, end vertex for bfs
+    group_side = 0 if method == "dijkstra" else 1
+    groups = {}
+    for query in queries:
+        groups.setdefault(query[group_side], set()).add(query[1 - group_side])
+    answer_group = _dijkstra_group if method == "dijkstra" else _bfs_group
+
+    keys = list(groups)
+    answers = {}
+    groups = [(key, groups[key]) for key in keys]
+    if pool is not None:
+        answered = _answer_on(pool.executor, answer_group, groups)
+    else:
+        answered = _answer_groups(graph, answer_group, groups, workers, snapshot_file)
+    try:
+        for query in queries:
+            key = query[group_side]
+            # the groups are answered in the order in which the queries first use them
+            while key not in answers:
+                answers[keys[len(answers)]] = next(answered)
+            yield answers[key][query[1 - group_side]]
+    finally:
+        answered.close()
+
+
+# Compute distance rows from many sources in parallel (as an external function)
+def batch_distance_rows(graph, sources, targets=None, workers=None, snapshot_file=None):
+    """
+    Complexity - O(k (n + m) log n) work in total, k being the number of sources, spread over
+                 the workers
+    Runs Dijkstra's algorithm from every source on a pool of worker processes sharing a
+    memory-mapped snapshot of the graph (see batch_shortest_paths).
+    :param graph: the graph (or CSRGraph snapshot) to query
+    :param sources: an iterable of vertices
+    :param targets: the list of vertices to report the distances of (None for every vertex)
+    :param workers: the number of worker processes (None for one per CPU); with 1, the rows
+                    are computed in this process
+    :param snapshot_file: an up-to-date binary graph file of the graph to use instead of writing
+                          a temporary one
+    :return: an iterator with, for every source in order, the list of the distances from it to
+             the targets (None for the targets it does not reach)
+    :raises ValueError: if a vertex or a cost of the graph is not an 8-byte signed integer
+    """
+    _check_snapshot_source(graph, snapshot_file)
+    if targets is None:
+        targets = list(graph.parse_vertices())
+    tasks = [(source, targets) for source in sources]
+    return _answer_groups(graph, _distance_row, tasks, workers, snapshot_file)
+
+
+def _check_snapshot_source(graph, snapshot_file):
+    """
+    Complexity - Theta(n + m) for a Graph without a snapshot file, Theta(1) otherwise
+    The queries run on a snapshot of the graph (see CSRGraph), which only holds integers.
+    :return: None
+    :raises ValueError: if a vertex or a cost of the graph is not an 8-byte signed integer
+    """
+    if snapshot_file is None and not isinstance(graph, CSRGraph):
+        check_int64_graph(graph)
+
+
+def _answer_groups(graph, answer_group, groups, workers, snapshot_file):
+    """
+    Answers groups of queries, in this process if workers is 1, otherwise on a pool of workers
+    that memory-map a binary graph file of the graph.
+    :param groups: a list of (key, other_ends) pairs, passed to answer_group
+    :return: an iterator for the answers of the groups, in order
+    """
+    if workers == 1:
+        if snapshot_file is not None:
+            snapshot = read_binary_graph(snapshot_file)
+        else:
+            snapshot = graph if isinstance(graph, CSRGraph) else graph.freeze()
+        for key, other_ends in groups:
+            yield answer_group(snapshot, key, other_ends)
+        return
+
+    temporary_directory = None
+    if snapshot_file is None:
+        temporary_directory = tempfile.TemporaryDirectory()
+        snapshot_file = os.path.join(temporary_directory.name, "graph" + BINARY_EXTENSION)
+        write_binary_graph(graph, snapshot_file, checksum=False)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_open_snapshot,
+                                 initargs=(snapshot_file,)) as executor:
+            yield from _answer_on(executor, answer_group, groups)
+    finally:
+        if temporary_directory is not None:
+            temporary_directory.cleanup()
+
+
+def _answer_on(executor, answer_group, groups):
+    """
+    Answers groups of queries on a pool of workers that opened the snapshot.
+    :return: an iterator for the answers of the groups, in order
+    """
+    futures = [executor.submit(_answer_in_worker, answer_group, key, other_ends) for key, other_ends in groups]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+# Worker processes kept for many batches of queries on the same graph
+class QueryPool:
+    """
+    A pool of worker processes sharing a memory-mapped snapshot of a graph (see
+    batch_shortest_paths), for callers that answer several batches while the graph does not
+    change: the snapshot is written and the processes are started once, not once per batch.
+    The pool does not follow later changes of the graph; close it (or use it as a context
+    manager) and start a new one once the graph changed.
+    """
+
+    def __init__(self, graph, workers=None):
+        """
+        Complexity - Theta(n log n + m log m) for a Graph, Theta(n + m) for a CSRGraph
+        :param graph: the graph (or CSRGraph snapshot) to query
+        :param workers: the number of worker processes (None for one per CPU)
+        :raises ValueError: if a vertex or a cost of the graph is not an 8-byte signed integer
+        """
+        _check_snapshot_source(graph, None)
+        self.__directory = tempfile.TemporaryDirectory()
+        snapshot_file = os.path.join(self.__directory.name, "graph" + BINARY_EXTENSION)
+        try:
+            write_binary_graph(graph, snapshot_file, checksum=False)
+            self.__executor = ProcessPoolExecutor(max_workers=workers, initializer=_open_snapshot,
+                                                  initargs=(snapshot_file,))
+        except BaseException:
+            self.__directory.cleanup()
+            raise
+
+    @property
+    def executor(self):
+        """
+        Complexity - Theta(1)
+        :return: the ProcessPoolExecutor of the workers
+        """
+        return self.__executor
+
+    def close(self):
+        """
+        Complexity - Theta(1) plus the queries still running
+        Stops the workers and deletes the snapshot.
+        :return: None
+        """
+        self.__executor.shutdown(wait=True, cancel_futures=True)
+        self.__directory.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _open_snapshot(file_name):
+    """
+    Complexity - Theta(1)
+    Initializer of the worker processes: memory-maps the binary graph file.
+    :return: None
+    """
+    global _worker_snapshot
+    _worker_snapshot = read_binary_graph(file_name)
+
+
+def _answer_in_worker(answer_group, key, other_ends):
+    """
+    Answers a group of queries on the snapshot of the worker process.
+    :return: the answers of the group (see _dijkstra_group, _bfs_group and _distance_row)
+    """
+    return answer_group(_worker_snapshot, key, other_ends)
+
+
+def _dijkstra_group(snapshot, start_vertex, end_vertices):
+    """
+    Complexity - O((n + m) log n)
+    :return: a dict mapping every end vertex to (path, cost), or to None if there is no path
+    """
+    tree = snapshot.shortest_path_tree(start_vertex)
+    answers = {}
+    for end_vertex in end_vertices:
+        if tree is None or end_vertex not in tree:
+            answers[end_vertex] = None
+        else:
+            answers[end_vertex] = tree.path(end_vertex), tree.distance(end_vertex)
+    return answers
+
+
+def _bfs_group(snapshot, end_vertex, start_vertices):
+    """
+    Complexity - O(n + m)
+    :return: a dict mapping every start vertex to its path, or to None if there is no path
+    """
+    tree = snapshot.reverse_bfs_tree(end_vertex)
+    return {start_vertex: (tree.path(start_vertex) if tree is not None else None) for start_vertex in start_vertices}
+
+
+def _distance_row(snapshot, source, targets):
+    """
+    Complexity - O((n + m) log n)
+    :return: the list of the distances from source to the targets (None for unreached targets)
+    """
+    tree = snapshot.shortest_path_tree(source)
+    if tree is None:
+        return [None] * len(targets)
+    return [tree.distance(target) for target in targets]
@@ -0,0 +1,120 @@
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+
+from src.csr_graph import CSRGraph
+
+# Binary graph file layout (all integers little-endian):
+#   header: magic, format version, flags, number of vertices (as reported by the graph),
+#           number of stored vertex ids V, number of edges m, CRC-32 of the payload
+#   payload: the arrays of the CSR snapshot, each of 8-byte signed integers, in this order:
+#           vertex_ids[V], offsets[V + 1], targets[m], costs[m],
+#           reverse_offsets[V + 1], sources[m], reverse_costs[m]
+MAGIC = b"UBBG"
+VERSION = 1
+FLAG_CHECKSUM = 1
+HEADER = struct.Struct("<4sHHqqqI4x")
+BINARY_EXTENSION = ".bin"
+
+
+def is_binary_graph_file(file_name):
+    """
+    Complexity - Theta(1)
+    Checks whether a file starts with the magic bytes of the binary graph format.
+    :param file_name: the name of the file
+    :return: True if the file is a binary graph file, False otherwise
+    """
+    with open(file_name, "rb") as input_file:
+        return input_file.read(len(MAGIC)) == MAGIC
+
+
+# Write the graph to a binary file (as an external function)
+def write_binary_graph(graph, file_name, checksum=True):
+    """
+    Complexity - Theta(n log n + m log m) for a Graph, Theta(n + m) for a CSRGraph
+    Write the graph to a binary file, in CSR order.
+    :param graph: the graph (or CSRGraph snapshot) to be written
+    :param file_name: the name of the file
+    :param checksum: if True, store the CRC-32 of the payload in the header
+    :return: None
+    """
+    snapshot = graph if isinstance(graph, CSRGraph) else graph.freeze()
+    buffers = [_little_endian(buffer) for buffer in snapshot.buffers()]
+
+    crc = 0
+    if checksum:
+        for buffer in buffers:
+            crc = zlib.crc32(buffer, crc)
+
+    vertex_ids = buffers[0]
+    with open(file_name, "wb") as output_file:
+        output_file.write(HEADER.pack(MAGIC, VERSION, FLAG_CHECKSUM if checksum else 0,
+                                      snapshot.number_of_vertices, len(vertex_ids) // 8,
+                                      snapshot.number_of_edges, crc))
+        for buffer in buffers:
+            output_file.write(buffer)
+
+
+# Open a binary graph file as a read-only snapshot (as an external function)
+def read_binary_graph(file_name, verify=False):
+    """
+    Complexity - Theta(1), Theta(n + m) with verify
+    Memory-maps a binary graph file and wraps it in a CSRGraph, without copying or parsing the
+    arrays: pages are read on first access and shared by every process mapping the same file.
+    :param file_name: the name of the file
+    :param verify: if True, check the stored CRC-32 of the payload
+    :return: the CSRGraph snapshot
+    :raises ValueError: if the file is not a binary graph file of a supported version, is
+                        truncated, or fails the checksum
+    """
+    with open(file_name, "rb") as input_file:
+        mapping = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(mapping) < HEADER.size:
+        raise ValueError(f"{file_name} is not a binary graph file")
+    magic, version, flags, vertex_count, stored_vertices, edge_count, crc = HEADER.unpack_from(mapping)
+    if magic != MAGIC:
+        raise ValueError(f"{file_name} is not a binary graph file")
+    if version != VERSION:
+        raise ValueError(f"{file_name} has unsupported binary graph version {version}")
+
+    lengths = [stored_vertices, stored_vertices + 1, edge_count, edge_count,
+               stored_vertices + 1, edge_count, edge_count]
+    payload_size = 8 * sum(lengths)
+    if len(mapping) != HEADER.size + payload_size:
+        raise ValueError(f"{file_name} is truncated")
+
+    view = memoryview(mapping)
+    if verify and flags & FLAG_CHECKSUM and zlib.crc32(view[HEADER.size:]) != crc:
+        raise ValueError(f"{file_name} failed the checksum")
+
+    buffers = []
+    position = HEADER.size
+    for length in lengths:
+        buffers.append(_native(view[position:position + 8 * length]))
+        position += 8 * length
+
+    return CSRGraph(vertex_count, *buffers)
+
+
+def _little_endian(buffer):
+    """
+    :return: the bytes of an array of 8-byte integers, in little-endian order
+    """
+    if sys.byteorder == "big":
+        buffer = array('q', buffer)
+        buffer.byteswap()
+    return buffer.tobytes()
+
+
+def _native(view):
+    """
+    :return: the little-endian bytes as a sequence of integers, mapped in place where possible
+    """
+    if sys.byteorder == "big":
+        buffer = array('q', view.tobytes())
+        buffer.byteswap()
+        return buffer
+    return view.cast('q')
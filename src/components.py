@@ -0,0 +1,312 @@
+# how far a ComponentIndex can be trusted after the changes made since it was built
+EXACT = "exact"  # the components are exactly those of the graph
+SOUND = "sound"  # edges were removed: components may have split, but "no path" answers still hold
+INVALID = "invalid"  # an edge may have merged strongly connected components
+
+
+def strongly_connected_components(vertices, successors):
+    """
+    Complexity - Theta(n + m)
+    Tarjan's algorithm with an explicit stack instead of recursion, so deep graphs do not hit
+    the recursion limit.
+    :param vertices: an iterable of all the vertices
+    :param successors: a function that takes a vertex and returns an iterable of the targets of
+                       its outbound edges
+    :return: the list of the strongly connected components (lists of vertices), in reverse
+             topological order: every edge between two components goes to an earlier one
+    """
+    index = {}
+    low = {}
+    on_stack = set()
+    stack = []
+    components = []
+    for root in vertices:
+        if root in index:
+            continue
+
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors(root)))]
+        while work:
+            vertex, neighbors = work[-1]
+            for neighbor in neighbors:
+                if neighbor not in index:
+                    index[neighbor] = low[neighbor] = len(index)
+                    stack.append(neighbor)
+                    on_stack.add(neighbor)
+                    work.append((neighbor, iter(successors(neighbor))))
+                    break
+                if neighbor in on_stack and index[neighbor] < low[vertex]:
+                    low[vertex] = index[neighbor]
+            else:
+                work.pop()
+                if work and low[vertex] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[vertex]
+                if low[vertex] == index[vertex]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        component.append(member)
+                        if member == vertex:
+                            break
+                    components.append(component)
+
+    return components
+
+
+# Component ids of every vertex, kept up to date while the graph changes
+class ComponentIndex:
+    """
+    Strongly and weakly connected components of a graph (see Graph.component_index).
+
+    Strongly connected components are numbered in topological order, so every edge between two
+    of them goes from a lower id to a higher one; the condensation is the DAG of those edges.
+    Weakly connected components are kept in a union-find structure.
+
+    The graph calls the update methods below after every change. Added vertices and edges that
+    follow the topological order keep the index exact (edges are merged into the weak components).
+    Removals only make it sound, since components may split, and an edge against the
+    topological order invalidates the strong components. may_reach uses whatever is still
+    trustworthy and never rebuilds; every other query rebuilds what is no longer exact first.
+    """
+
+    def __init__(self, graph):
+        """
+        Complexity - Theta(n + m)
+        :param graph: the graph to index
+        """
+        self.__graph = graph
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Complexity - Theta(n + m)
+        Recomputes both kinds of components from the graph.
+        :return: None
+        """
+        self.__rebuild_strong()
+        self.__rebuild_weak()
+
+    def __rebuild_strong(self):
+        """
+        Complexity - Theta(n + m)
+        :return: None
+        """
+        graph = self.__graph
+        components = strongly_connected_components(graph.parse_vertices(), graph.parse_outbound)
+        components.reverse()
+        self.__strong_of = {vertex: component_id for component_id, component in enumerate(components)
+                            for vertex in component}
+        self.__strong_members = components
+        # for every component, the number of edges to each later component
+        condensation = [{} for _ in components]
+        strong_of = self.__strong_of
+        for start_vertex, end_vertex, _ in graph.get_edges_with_costs():
+            start_id, end_id = strong_of[start_vertex], strong_of[end_vertex]
+            if start_id != end_id:
+                condensation[start_id][end_id] = condensation[start_id].get(end_id, 0) + 1
+        self.__condensation = condensation
+        self.__strong_state = EXACT
+
+    def __rebuild_weak(self):
+        """
+        Complexity - Theta(n + m) amortized
+        :return: None
+        """
+        self.__weak_parent = {vertex: vertex for vertex in self.__graph.parse_vertices()}
+        self.__weak_size = {vertex: 1 for vertex in self.__weak_parent}
+        for start_vertex, end_vertex, _ in self.__graph.get_edges_with_costs():
+            self.__union(start_vertex, end_vertex)
+        self.__weak_state = EXACT
+
+    @property
+    def strong_state(self):
+        """
+        Complexity - Theta(1)
+        :return: EXACT, SOUND or INVALID, for the strongly connected components
+        """
+        return self.__strong_state
+
+    @property
+    def weak_state(self):
+        """
+        Complexity - Theta(1)
+        :return: EXACT or SOUND, for the weakly connected components
+        """
+        return self.__weak_state
+
+    def may_reach(self, start_vertex, end_vertex):
+        """
+        Complexity - O(log n), without rebuilding anything
+        :param start_vertex: a vertex of the graph
+        :param end_vertex: a vertex of the graph
+        :return: False if there is certainly no path from start_vertex to end_vertex, True if
+                 there may be one
+        """
+        if self.__find(start_vertex) != self.__find(end_vertex):
+            return False
+        if self.__strong_state != INVALID and self.__strong_of[start_vertex] > self.__strong_of[end_vertex]:
+            return False
+        return True
+
+    def strongly_connected_components(self):
+        """
+        Complexity - Theta(n), Theta(n + m) if the index has to be rebuilt
+        :return: the list of the strongly connected components (lists of vertices), in
+                 topological order
+        """
+        self.__ensure_strong()
+        return [list(component) for component in self.__strong_members]
+
+    def weakly_connected_components(self):
+        """
+        Complexity - Theta(n), Theta(n + m) if the index has to be rebuilt
+        :return: the list of the weakly connected components (lists of vertices)
+        """
+        self.__ensure_weak()
+        components = {}
+        for vertex in self.__weak_parent:
+            components.setdefault(self.__find(vertex), []).append(vertex)
+        return list(components.values())
+
+    def strong_component(self, vertex):
+        """
+        Complexity - Theta(1), Theta(n + m) if the index has to be rebuilt
+        :param vertex: a vertex of the graph
+        :return: the id of the strongly connected component of the vertex (ids follow the
+                 topological order of the condensation)
+        """
+        self.__ensure_strong()
+        return self.__strong_of[vertex]
+
+    def weak_component(self, vertex):
+        """
+        Complexity - O(log n), Theta(n + m) if the index has to be rebuilt
+        :param vertex: a vertex of the graph
+        :return: a representative vertex of the weakly connected component of the vertex
+        """
+        self.__ensure_weak()
+        return self.__find(vertex)
+
+    def condensation(self):
+        """
+        Complexity - Theta(number of components + edges between them), Theta(n + m) if the index
+                     has to be rebuilt
+        :return: the condensation DAG, as a dict mapping every strongly connected component id to
+                 the set of ids its edges lead to
+        """
+        self.__ensure_strong()
+        return {component_id: set(successors) for component_id, successors in enumerate(self.__condensation)}
+
+    # Update methods, called by the graph after it has changed (see Graph.add_observer)
+    def vertex_added(self, vertex):
+        """
+        Complexity - Theta(1)
+        :return: None
+        """
+        self.__strong_of[vertex] = len(self.__strong_members)
+        self.__strong_members.append([vertex])
+        self.__condensation.append({})
+        # a vertex added back after its removal may still link other vertices of its old weak
+        # component, so it stays in that component (which is sound, not exact)
+        if vertex not in self.__weak_parent:
+            self.__weak_parent[vertex] = vertex
+            self.__weak_size[vertex] = 1
+
+    def edge_added(self, start_vertex, end_vertex, cost):
+        """
+        Complexity - O(log n)
+        :return: None
+        """
+        self.__union(start_vertex, end_vertex)
+        if self.__strong_state == INVALID:
+            return
+        start_id, end_id = self.__strong_of[start_vertex], self.__strong_of[end_vertex]
+        if start_id < end_id:
+            successors = self.__condensation[start_id]
+            successors[end_id] = successors.get(end_id, 0) + 1
+        elif start_id > end_id:
+            self.__strong_state = INVALID
+
+    def edge_removed(self, start_vertex, end_vertex):
+        """
+        Complexity - Theta(1)
+        :return: None
+        """
+        self.__weak_state = SOUND
+        if self.__strong_state != EXACT:
+            return
+        start_id, end_id = self.__strong_of[start_vertex], self.__strong_of[end_vertex]
+        if start_id == end_id:
+            self.__strong_state = SOUND
+        else:
+            successors = self.__condensation[start_id]
+            successors[end_id] -= 1
+            if not successors[end_id]:
+                del successors[end_id]
+
+    def cost_changed(self, start_vertex, end_vertex, old_cost, new_cost):
+        """
+        Complexity - Theta(1)
+        Costs do not matter for reachability, so nothing changes.
+        :return: None
+        """
+
+    def vertex_removed(self, vertex):
+        """
+        Complexity - Theta(1)
+        :return: None
+        """
+        self.__weak_state = SOUND
+        if self.__strong_state == EXACT:
+            self.__strong_state = SOUND
+
+    def graph_cleared(self):
+        """
+        Complexity - Theta(1)
+        :return: None
+        """
+        self.rebuild()
+
+    def __ensure_strong(self):
+        """
+        Complexity - Theta(1), Theta(n + m) if the strong components are not exact
+        :return: None
+        """
+        if self.__strong_state != EXACT:
+            self.__rebuild_strong()
+
+    def __ensure_weak(self):
+        """
+        Complexity - Theta(1), Theta(n + m) if the weak components are not exact
+        :return: None
+        """
+        if self.__weak_state != EXACT:
+            self.__rebuild_weak()
+
+    def __find(self, vertex):
+        """
+        Complexity - O(log n)
+        :return: the representative of the weak component of the vertex
+        """
+        parent = self.__weak_parent
+        while parent[vertex] != vertex:
+            parent[vertex] = parent[parent[vertex]]
+            vertex = parent[vertex]
+        return vertex
+
+    def __union(self, first_vertex, second_vertex):
+        """
+        Complexity - O(log n)
+        Merges the weak components of two vertices (union by size).
+        :return: None
+        """
+        first_root, second_root = self.__find(first_vertex), self.__find(second_vertex)
+        if first_root == second_root:
+            return
+        if self.__weak_size[first_root] < self.__weak_size[second_root]:
+            first_root, second_root = second_root, first_root
+        self.__weak_parent[second_root] = first_root
+        self.__weak_size[first_root] += self.__weak_size[second_root]
@@ -0,0 +1,484 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+from src.shortest_path_tree import ShortestPathTree
+
+# range of the 8-byte signed integers that the arrays of a snapshot hold
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+
+def fits_int64(value):
+    """
+    Complexity - Theta(1)
+    :param value: a vertex id or a cost
+    :return: True if the value is an int that a snapshot (or a binary file) can store, False otherwise
+    """
+    return type(value) is int and INT64_MIN <= value <= INT64_MAX
+
+
+def check_int64_graph(graph):
+    """
+    Complexity - Theta(n + m)
+    Checks that a graph can be turned into a snapshot (see CSRGraph.from_graph).
+    :param graph: a Graph
+    :return: None
+    :raises ValueError: if a vertex or a cost of the graph is not an 8-byte signed integer
+    """
+    for vertex in graph.parse_vertices():
+        if not fits_int64(vertex):
+            raise ValueError(f"Snapshots only hold 8-byte signed integer vertices, not {vertex!r}")
+    for _, _, cost in graph.edges():
+        if not fits_int64(cost):
+            raise ValueError(f"Snapshots only hold 8-byte signed integer costs, not {cost!r}")
+
+
+# Immutable, array-backed snapshot of a graph (compressed sparse row)
+class CSRGraph:
+    """
+    Read-only view of a directed graph with integer vertices and integer costs.
+
+    Vertices are mapped to dense indices 0..V-1 (in increasing order of their ids).
+    The outbound edges of the vertex with index i are targets[offsets[i]:offsets[i + 1]],
+    with their costs aligned in costs[offsets[i]:offsets[i + 1]]. The inbound edges are
+    stored the same way in a reverse CSR (reverse_offsets, sources, reverse_costs).
+    Every row is sorted, so edge lookups are binary searches.
+
+    The snapshot is for memory and sharing, not speed: it takes 8 bytes per vertex id, offset,
+    target and cost (instead of Python objects in dicts and sets), it can be written to a binary
+    file and memory-mapped by many processes (see binary_graph.py and batch_queries.py), and
+    nothing can change it while it is read. Its searches run at the speed of those of Graph
+    (50 Dijkstra queries on 20k vertices and 100k edges take about the same time on both): in
+    pure Python, they are bound by the heap and the dictionaries, not by the adjacency layout.
+    Vertex ids are integers (bool values are not vertex ids, so True is not vertex 1).
+    """
+
+    def __init__(self, vertex_count, vertex_ids, offsets, targets, costs, reverse_offsets, sources,
+                 reverse_costs):
+        self.__vertex_count = vertex_count
+        self.__vertex_ids = vertex_ids
+        self.__offsets = offsets
+        self.__targets = targets
+        self.__costs = costs
+        self.__reverse_offsets = reverse_offsets
+        self.__sources = sources
+        self.__reverse_costs = reverse_costs
+        # the ids are sorted and unique, so they are exactly 0..V-1 if the ends match
+        self.__identity = len(vertex_ids) == 0 or (vertex_ids[0] == 0 and vertex_ids[-1] == len(vertex_ids) - 1)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Complexity - Theta(n log n + m log m)
+        Builds a CSR snapshot of a graph.
+        :param graph: the graph to take the snapshot of
+        :return: the CSRGraph snapshot
+        :raises ValueError: if a vertex or a cost is not an 8-byte signed integer
+        """
+        try:
+            return cls.__from_graph(graph)
+        except (TypeError, OverflowError):
+            check_int64_graph(graph)  # raises ValueError naming the value
+            raise
+
+    @classmethod
+    def __from_graph(cls, graph):
+        """
+        Complexity - Theta(n log n + m log m)
+        :return: the CSRGraph snapshot of the graph
+        """
+        vertex_ids = array('q', sorted(graph.parse_vertices()))
+        index = {vertex: i for i, vertex in enumerate(vertex_ids)}
+
+        offsets = array('q', [0])
+        targets = array('q')
+        costs = array('q')
+        in_counts = [0] * len(vertex_ids)
+        for vertex in vertex_ids:
+            row = sorted((index[neighbor], cost) for neighbor, cost in graph.neighbors(vertex))
+            for target, cost in row:
+                targets.append(target)
+                costs.append(cost)
+                in_counts[target] += 1
+            offsets.append(len(targets))
+
+        reverse_offsets, sources, reverse_costs = cls.__reverse(offsets, targets, costs, in_counts)
+        return cls(graph.number_of_vertices, vertex_ids, offsets, targets, costs, reverse_offsets, sources,
+                   reverse_costs)
+
+    @staticmethod
+    def __reverse(offsets, targets, costs, in_counts):
+        """
+        Complexity - Theta(n + m)
+        Builds the reverse CSR with a counting sort on the edge targets.
+        Sources are visited in increasing order, so every reverse row comes out sorted.
+        :return: a tuple (reverse_offsets, sources, reverse_costs)
+        """
+        reverse_offsets = array('q', [0])
+        for count in in_counts:
+            reverse_offsets.append(reverse_offsets[-1] + count)
+
+        sources = array('q', bytes(8 * len(targets)))
+        reverse_costs = array('q', bytes(8 * len(targets)))
+        position = list(reverse_offsets[:-1])
+        for source in range(len(offsets) - 1):
+            for edge in range(offsets[source], offsets[source + 1]):
+                target = targets[edge]
+                sources[position[target]] = source
+                reverse_costs[position[target]] = costs[edge]
+                position[target] += 1
+
+        return reverse_offsets, sources, reverse_costs
+
+    def to_graph(self):
+        """
+        Complexity - Theta(n + m)
+        Builds a mutable Graph with the same vertices and edges as the snapshot.
+        :return: the new graph
+        """
+        from src.graph import Graph
+
+        graph = Graph()
+        for vertex in self.__vertex_ids:
+            graph.add_vertex(vertex)
+        graph.add_edges(self.get_edges_with_costs())
+        graph.vertice_count = self.__vertex_count
+        return graph
+
+    def buffers(self):
+        """
+        Complexity - Theta(1)
+        :return: a tuple (vertex_ids, offsets, targets, costs, reverse_offsets, sources, reverse_costs)
+                 of the arrays backing the snapshot
+        """
+        return (self.__vertex_ids, self.__offsets, self.__targets, self.__costs, self.__reverse_offsets,
+                self.__sources, self.__reverse_costs)
+
+    def __index_of(self, vertex):
+        """
+        Complexity - O(log n)
+        Translates a vertex id into its dense index.
+        :param vertex: the vertex id
+        :return: the index of the vertex
+        :raises KeyError: if the vertex is not in the graph
+        """
+        vertex_ids = self.__vertex_ids
+        if isinstance(vertex, bool):
+            raise KeyError(vertex)
+        if self.__identity:
+            if isinstance(vertex, int) and 0 <= vertex < len(vertex_ids):
+                return vertex
+            raise KeyError(vertex)
+
+        i = bisect_left(vertex_ids, vertex)
+        if i == len(vertex_ids) or vertex_ids[i] != vertex:
+            raise KeyError(vertex)
+        return i
+
+    def __edge_position(self, start_index, end_index):
+        """
+        Complexity - O(log deg)
+        :return: the position of the edge in the targets array, or -1 if there is no such edge
+        """
+        low, high = self.__offsets[start_index], self.__offsets[start_index + 1]
+        position = bisect_left(self.__targets, end_index, low, high)
+        if position < high and self.__targets[position] == end_index:
+            return position
+        return -1
+
+    @property
+    def number_of_vertices(self):
+        """
+        Complexity - Theta(1)
+        :return: the number of vertices in the graph
+        """
+        return max(self.__vertex_count, len(self.__vertex_ids))
+
+    @property
+    def number_of_edges(self):
+        """
+        Complexity - Theta(1)
+        :return: the number of edges in the graph
+        """
+        return len(self.__targets)
+
+    def parse_vertices(self):
+        """
+        Complexity - Theta(1)
+        :return: an iterator for the vertices, in increasing order
+        """
+        return iter(self.__vertex_ids)
+
+    def is_vertex(self, vertex):
+        """
+        Complexity - O(log n)
+        :param vertex: the vertex to check
+        :return: True if the vertex is in the graph, False otherwise
+        """
+        try:
+            self.__index_of(vertex)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def is_edge(self, start_vertex, end_vertex):
+        """
+        Complexity - O(log n + log deg)
+        :param start_vertex: start vertex
+        :param end_vertex: end vertex
+        :return: true if there is an edge from start_vertex to end_vertex, false otherwise
+        """
+        start_index = self.__index_of(start_vertex)
+        if not self.is_vertex(end_vertex):
+            return False
+        return self.__edge_position(start_index, self.__index_of(end_vertex)) != -1
+
+    def in_degree(self, vertex):
+        """
+        Complexity - O(log n)
+        :param vertex: vertex to get the in degree of
+        :return: in degree of the vertex
+        """
+        i = self.__index_of(vertex)
+        return self.__reverse_offsets[i + 1] - self.__reverse_offsets[i]
+
+    def out_degree(self, vertex):
+        """
+        Complexity - O(log n)
+        :param vertex: vertex to get the out degree of
+        :return: out degree of the vertex
+        """
+        i = self.__index_of(vertex)
+        return self.__offsets[i + 1] - self.__offsets[i]
+
+    def parse_outbound(self, vertex):
+        """
+        Complexity - Theta(deg)
+        :param vertex: vertex to get the outbound edges of
+        :return: an iterator for the targets of the outbound edges of the vertex
+        """
+        i = self.__index_of(vertex)
+        vertex_ids = self.__vertex_ids
+        for edge in range(self.__offsets[i], self.__offsets[i + 1]):
+            yield vertex_ids[self.__targets[edge]]
+
+    def parse_inbound(self, vertex):
+        """
+        Complexity - Theta(deg)
+        :param vertex: vertex to get the inbound edges of
+        :return: an iterator for the sources of the inbound edges of the vertex
+        """
+        i = self.__index_of(vertex)
+        vertex_ids = self.__vertex_ids
+        for edge in range(self.__reverse_offsets[i], self.__reverse_offsets[i + 1]):
+            yield vertex_ids[self.__sources[edge]]
+
+    def neighbors(self, vertex, reverse=False):
+        """
+        Complexity - Theta(deg)
+        :param vertex: a vertex of the graph
+        :param reverse: False for the outbound edges of the vertex, True for its inbound edges
+        :return: an iterator for the (neighbor, cost) pairs of the edges of the vertex
+        :raises KeyError: if the vertex is not in the graph
+        """
+        i = self.__index_of(vertex)
+        vertex_ids = self.__vertex_ids
+        if reverse:
+            offsets, neighbors, costs = self.__reverse_offsets, self.__sources, self.__reverse_costs
+        else:
+            offsets, neighbors, costs = self.__offsets, self.__targets, self.__costs
+        return ((vertex_ids[neighbors[edge]], costs[edge]) for edge in range(offsets[i], offsets[i + 1]))
+
+    def get_cost(self, start_vertex, end_vertex):
+        """
+        Complexity - O(log n + log deg)
+        :param start_vertex: the start vertex
+        :param end_vertex: the end vertex
+        :return: the cost of the edge from start_vertex to end_vertex
+        :raises KeyError: if there is no such edge
+        """
+        position = self.__edge_position(self.__index_of(start_vertex), self.__index_of(end_vertex))
+        if position == -1:
+            raise KeyError((start_vertex, end_vertex))
+        return self.__costs[position]
+
+    def get_edges_list(self):
+        """
+        Complexity - Theta(m)
+        :return: an iterator for the (start, end) pairs of all edges in the graph
+        """
+        vertex_ids = self.__vertex_ids
+        targets = self.__targets
+        for i, vertex in enumerate(vertex_ids):
+            for edge in range(self.__offsets[i], self.__offsets[i + 1]):
+                yield vertex, vertex_ids[targets[edge]]
+
+    def get_edges_with_costs(self):
+        """
+        Complexity - Theta(m)
+        :return: an iterator for the (start, end, cost) triples of all edges in the graph
+        """
+        vertex_ids = self.__vertex_ids
+        targets = self.__targets
+        costs = self.__costs
+        for i, vertex in enumerate(vertex_ids):
+            for edge in range(self.__offsets[i], self.__offsets[i + 1]):
+                yield vertex, vertex_ids[targets[edge]], costs[edge]
+
+    def backward_bfs(self, start_vertex, end_vertex):
+        """
+        Complexity - O(n + m)
+        Finds the path with the fewest edges from start_vertex to end_vertex with a BFS
+        over the inbound edges, starting at end_vertex.
+        :param start_vertex: the starting vertex
+        :param end_vertex: the ending vertex
+        :return: the list of vertices on the path, or None if there is no path
+        """
+        if not self.is_vertex(start_vertex) or not self.is_vertex(end_vertex):
+            return None
+
+        start_index = self.__index_of(start_vertex)
+        end_index = self.__index_of(end_vertex)
+        reverse_offsets = self.__reverse_offsets
+        sources = self.__sources
+
+        next_dict = {end_index: -1}
+        queue = deque([end_index])
+        while queue and start_index not in next_dict:
+            current = queue.popleft()
+            for edge in range(reverse_offsets[current], reverse_offsets[current + 1]):
+                neighbor = sources[edge]
+                if neighbor not in next_dict:
+                    next_dict[neighbor] = current
+                    queue.append(neighbor)
+
+        if start_index not in next_dict:
+            return None
+
+        path = []
+        current = start_index
+        while current != -1:
+            path.append(self.__vertex_ids[current])
+            current = next_dict[current]
+        return path
+
+    def reverse_bfs_tree(self, root):
+        """
+        Complexity - O(n + m)
+        Runs a BFS over the inbound edges from root to every vertex that can reach it.
+        :param root: the vertex the paths lead to
+        :return: a reverse ShortestPathTree (distances are numbers of edges), or None if root is
+                 not in the graph
+        """
+        if not self.is_vertex(root):
+            return None
+
+        root_index = self.__index_of(root)
+        reverse_offsets = self.__reverse_offsets
+        sources = self.__sources
+
+        dist_dict = {root_index: 0}
+        next_dict = {root_index: -1}
+        queue = deque([root_index])
+        while queue:
+            current = queue.popleft()
+            for edge in range(reverse_offsets[current], reverse_offsets[current + 1]):
+                neighbor = sources[edge]
+                if neighbor not in dist_dict:
+                    dist_dict[neighbor] = dist_dict[current] + 1
+                    next_dict[neighbor] = current
+                    queue.append(neighbor)
+
+        vertex_ids = self.__vertex_ids
+        distances = {vertex_ids[i]: length for i, length in dist_dict.items()}
+        parents = {vertex_ids[i]: (vertex_ids[child] if child != -1 else None) for i, child in next_dict.items()}
+        return ShortestPathTree(root, distances, parents, reverse=True)
+
+    def dijkstra(self, start_vertex, end_vertex):
+        """
+        Complexity - O((n + m) log n)
+        Finds the lowest cost walk between two vertices using Dijkstra's algorithm.
+        :param start_vertex: the starting vertex
+        :param end_vertex: the ending vertex
+        :return: a tuple (path, cost) where path is the list of vertices in the lowest cost walk
+                 and cost is the total cost of the walk. Returns None if no path exists.
+        """
+        if not self.is_vertex(start_vertex) or not self.is_vertex(end_vertex):
+            return None
+
+        start_index = self.__index_of(start_vertex)
+        end_index = self.__index_of(end_vertex)
+        offsets = self.__offsets
+        targets = self.__targets
+        costs = self.__costs
+
+        dist_dict = {start_index: 0}
+        prev_dict = {start_index: -1}
+        settled = set()
+        priority_queue = [(0, start_index)]
+        while priority_queue:
+            current_cost, current = heapq.heappop(priority_queue)
+            if current in settled:
+                continue
+            if current == end_index:
+                break
+            settled.add(current)
+
+            for edge in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[edge]
+                new_cost = current_cost + costs[edge]
+                if neighbor not in dist_dict or new_cost < dist_dict[neighbor]:
+                    dist_dict[neighbor] = new_cost
+                    prev_dict[neighbor] = current
+                    heapq.heappush(priority_queue, (new_cost, neighbor))
+
+        if end_index not in dist_dict:
+            return None
+
+        path = []
+        current = end_index
+        while current != -1:
+            path.append(self.__vertex_ids[current])
+            current = prev_dict[current]
+        path.reverse()
+        return path, dist_dict[end_index]
+
+    def shortest_path_tree(self, source):
+        """
+        Complexity - O((n + m) log n)
+        Runs Dijkstra's algorithm from source to every reachable vertex.
+        :param source: the starting vertex
+        :return: a ShortestPathTree rooted at source, or None if source is not in the graph
+        """
+        if not self.is_vertex(source):
+            return None
+
+        source_index = self.__index_of(source)
+        offsets = self.__offsets
+        targets = self.__targets
+        costs = self.__costs
+
+        dist_dict = {source_index: 0}
+        prev_dict = {source_index: -1}
+        settled = set()
+        priority_queue = [(0, source_index)]
+        while priority_queue:
+            current_cost, current = heapq.heappop(priority_queue)
+            if current in settled:
+                continue
+            settled.add(current)
+
+            for edge in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[edge]
+                new_cost = current_cost + costs[edge]
+                if neighbor not in dist_dict or new_cost < dist_dict[neighbor]:
+                    dist_dict[neighbor] = new_cost
+                    prev_dict[neighbor] = current
+                    heapq.heappush(priority_queue, (new_cost, neighbor))
+
+        vertex_ids = self.__vertex_ids
+        distances = {vertex_ids[i]: cost for i, cost in dist_dict.items()}
+        parents = {vertex_ids[i]: (vertex_ids[parent] if parent != -1 else None) for i, parent in prev_dict.items()}
+        return ShortestPathTree(source, distances, parents)
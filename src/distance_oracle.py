@@ -0,0 +1,445 @@
+import heapq
+import math
+import struct
+import time
+from array import array
+
+from src.binary_graph import _little_endian, _native
+
+# Distance oracle file layout (all integers little-endian):
+#   header: magic, format version, flags, number of vertices V, number of out label entries,
+#           number of in label entries
+#   payload: arrays of 8-byte signed integers, in this order: vertex_ids[V] (in rank order),
+#           out_offsets[V + 1], out_hubs[...], out_distances[...],
+#           in_offsets[V + 1], in_hubs[...], in_distances[...]
+MAGIC = b"UBBL"
+VERSION = 1
+FLAG_WEIGHTED = 1
+HEADER = struct.Struct("<4sHHqqq")
+# appended to the name of a graph file to get the name of its oracle file
+ORACLE_EXTENSION = ".labels"
+INFINITY = float('inf')
+
+
+def oracle_file_name(graph_file_name):
+    """
+    Complexity - Theta(1)
+    :param graph_file_name: the name of a graph file
+    :return: the name of the distance oracle file kept next to it
+    """
+    return graph_file_name + ORACLE_EXTENSION
+
+
+def _same_distance(first, second):
+    """
+    Complexity - Theta(1)
+    :return: True if the two distances are equal, up to rounding errors for float costs
+    """
+    if first == second:
+        return True
+    return (isinstance(first, float) or isinstance(second, float)) and math.isclose(first, second)
+
+
+# Precomputed distance labels answering distance queries without a search
+class DistanceOracle:
+    """
+    Pruned landmark labeling (2-hop labels) of a directed graph.
+
+    Vertices are ranked by degree and, in that order, each one runs a Dijkstra forward and one
+    backward that stop wherever the labels built so far already give the distance. Every vertex
+    ends up with an out label (hubs it reaches, with distances) and an in label (hubs reaching it)
+    such that every shortest path has a hub in both labels, so the distance from s to t is the
+    smallest out_label(s)[h] + in_label(t)[h] over the common hubs h. Labels hold a few entries
+    per vertex on small-world graphs, so a query costs microseconds.
+
+    With weighted=False every edge counts as 1, which answers backward_bfs-style queries.
+
+    The oracle observes its graph (see Graph.build_distance_oracle): a new vertex, a new edge or a
+    lower cost is patched into the labels by resuming the pruned searches of the affected hubs.
+    Removals and higher costs can make labels too short, so they mark the oracle out of date and
+    call the listeners added with add_invalidation_listener; queries on an out of date oracle
+    rebuild it first if auto_rebuild is set, and raise ValueError otherwise.
+    """
+
+    def __init__(self, graph=None, weighted=True, auto_rebuild=False):
+        """
+        Complexity - see build
+        :param graph: the graph to index (None for an oracle loaded from a file, see load)
+        :param weighted: if False, every edge counts as 1 (distances are numbers of edges)
+        :param auto_rebuild: if True, a query on an out of date oracle rebuilds it first
+        """
+        self.__graph = graph
+        self.__weighted = weighted
+        self.__auto_rebuild = auto_rebuild
+        self.__listeners = []
+        self.__valid = False
+        self.__build_seconds = 0.0
+        self.__rank = {}
+        self.__ids = []
+        self.__out_labels = []
+        self.__in_labels = []
+        self.__out_edges = []
+        self.__in_edges = []
+        if graph is not None:
+            self.build()
+
+    def build(self):
+        """
+        Complexity - O(n (n + m) log n) in the worst case, much less on graphs with hubs
+        (Re)computes the labels from the graph.
+        :return: None
+        :raises ValueError: if the oracle has no graph
+        """
+        if self.__graph is None:
+            raise ValueError("The distance oracle has no graph to build from")
+
+        start_time = time.perf_counter()
+        graph = self.__graph
+        ids = sorted(graph.parse_vertices(), key=lambda vertex: -(graph.in_degree(vertex) + 1) * (graph.out_degree(vertex) + 1))
+        self.__ids = ids
+        self.__rank = {vertex: rank for rank, vertex in enumerate(ids)}
+        self.__out_labels = [{} for _ in ids]
+        self.__in_labels = [{} for _ in ids]
+        self.__out_edges = [[] for _ in ids]
+        self.__in_edges = [[] for _ in ids]
+        for start_vertex, end_vertex, cost in graph.get_edges_with_costs():
+            self.__add_adjacency(self.__rank[start_vertex], self.__rank[end_vertex], cost)
+
+        for hub in range(len(ids)):
+            self.__pruned_search(hub, hub, 0, forward=True)
+            self.__pruned_search(hub, hub, 0, forward=False)
+
+        self.__valid = True
+        self.__build_seconds = time.perf_counter() - start_time
+
+    @classmethod
+    def load(cls, file_name, graph=None, auto_rebuild=False):
+        """
+        Complexity - Theta(n + size of the labels)
+        Loads the labels saved by save. With a graph, the oracle observes it from then on (the
+        labels must match the graph).
+        :param file_name: the name of the file
+        :param graph: the graph the labels were built from, to follow its changes and to answer
+                      path queries (None for distance queries only)
+        :param auto_rebuild: if True, a query on an out of date oracle rebuilds it first
+        :return: the DistanceOracle
+        :raises ValueError: if the file is not a distance oracle file of a supported version, or
+                            is truncated
+        """
+        with open(file_name, "rb") as input_file:
+            data = input_file.read()
+
+        if len(data) < HEADER.size:
+            raise ValueError(f"{file_name} is not a distance oracle file")
+        magic, version, flags, vertex_count, out_count, in_count = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{file_name} is not a distance oracle file")
+        if version != VERSION:
+            raise ValueError(f"{file_name} has unsupported distance oracle version {version}")
+        lengths = [vertex_count, vertex_count + 1, out_count, out_count, vertex_count + 1, in_count, in_count]
+        if len(data) != HEADER.size + 8 * sum(lengths):
+            raise ValueError(f"{file_name} is truncated")
+
+        view = memoryview(data)
+        buffers = []
+        position = HEADER.size
+        for length in lengths:
+            buffers.append(_native(view[position:position + 8 * length]))
+            position += 8 * length
+        ids, out_offsets, out_hubs, out_distances, in_offsets, in_hubs, in_distances = buffers
+
+        oracle = cls(None, weighted=bool(flags & FLAG_WEIGHTED), auto_rebuild=auto_rebuild)
+        oracle.__ids = list(ids)
+        oracle.__rank = {vertex: rank for rank, vertex in enumerate(oracle.__ids)}
+        oracle.__out_labels = [dict(zip(out_hubs[out_offsets[i]:out_offsets[i + 1]],
+                                        out_distances[out_offsets[i]:out_offsets[i + 1]])) for i in range(vertex_count)]
+        oracle.__in_labels = [dict(zip(in_hubs[in_offsets[i]:in_offsets[i + 1]],
+                                       in_distances[in_offsets[i]:in_offsets[i + 1]])) for i in range(vertex_count)]
+        oracle.__valid = True
+        if graph is not None:
+            oracle.__graph = graph
+            oracle.__out_edges = [[] for _ in oracle.__ids]
+            oracle.__in_edges = [[] for _ in oracle.__ids]
+            for start_vertex, end_vertex, cost in graph.get_edges_with_costs():
+                oracle.__add_adjacency(oracle.__rank[start_vertex], oracle.__rank[end_vertex], cost)
+            graph.add_observer(oracle)
+        return oracle
+
+    def save(self, file_name):
+        """
+        Complexity - Theta(n + size of the labels)
+        Writes the labels to a file (oracle_file_name gives the conventional name next to the
+        graph file), to be loaded with load.
+        :param file_name: the name of the file
+        :return: None
+        :raises ValueError: if the oracle is out of date
+        """
+        self.__check_valid()
+        buffers = [array('q', self.__ids)]
+        for labels in (self.__out_labels, self.__in_labels):
+            offsets = array('q', [0])
+            hubs = array('q')
+            distances = array('q')
+            for label in labels:
+                hubs.extend(label.keys())
+                distances.extend(label.values())
+                offsets.append(len(hubs))
+            buffers.extend((offsets, hubs, distances))
+
+        with open(file_name, "wb") as output_file:
+            output_file.write(HEADER.pack(MAGIC, VERSION, FLAG_WEIGHTED if self.__weighted else 0, len(self.__ids),
+                                          len(buffers[2]), len(buffers[5])))
+            for buffer in buffers:
+                output_file.write(_little_endian(buffer))
+
+    @property
+    def valid(self):
+        """
+        Complexity - Theta(1)
+        :return: True if the labels match the graph, False if they are out of date
+        """
+        return self.__valid
+
+    def add_invalidation_listener(self, listener):
+        """
+        Complexity - Theta(1)
+        :param listener: a function called with the oracle whenever it goes out of date
+        :return: None
+        """
+        self.__listeners.append(listener)
+
+    def report(self):
+        """
+        Complexity - Theta(n)
+        :return: a dict with the number of vertices, the number of label entries, the average
+                 label size, an estimate of the label size in bytes once saved, the time of the
+                 last build in seconds and whether the oracle is up to date
+        """
+        entries = sum(map(len, self.__out_labels)) + sum(map(len, self.__in_labels))
+        vertices = len(self.__ids)
+        return {
+            "vertices": vertices,
+            "label_entries": entries,
+            "average_label_size": entries / (2 * vertices) if vertices else 0.0,
+            "bytes": HEADER.size + 8 * (3 * vertices + 2 + 2 * entries),
+            "build_seconds": self.__build_seconds,
+            "valid": self.__valid,
+        }
+
+    def distance(self, start_vertex, end_vertex):
+        """
+        Complexity - O(size of the labels of the two vertices)
+        :param start_vertex: the starting vertex
+        :param end_vertex: the ending vertex
+        :return: the cost of the lowest cost walk (the number of edges of the shortest path, if
+                 not weighted), or None if there is no path or a vertex is not in the graph
+        :raises ValueError: if the oracle is out of date and does not rebuild itself
+        """
+        self.__check_valid()
+        start_rank = self.__rank.get(start_vertex)
+        end_rank = self.__rank.get(end_vertex)
+        if start_rank is None or end_rank is None:
+            return None
+        distance = self.__query(start_rank, end_rank)
+        return None if distance == INFINITY else distance
+
+    def path(self, start_vertex, end_vertex):
+        """
+        Complexity - O((n + m) * size of the labels), O(length of the path * degree * size of the
+        labels) when no detour is needed
+        Searches, depth first from start_vertex, the edges that keep the remaining distance given
+        by the labels. Vertices are entered once, so zero-cost cycles and self-loops cannot trap it.
+        :param start_vertex: the starting vertex
+        :param end_vertex: the ending vertex
+        :return: a tuple (path, cost) as Graph.dijkstra returns it, or None if there is no path
+        :raises ValueError: if the oracle is out of date and does not rebuild itself, has no graph,
+                            or its labels do not lead to end_vertex
+        """
+        if self.__graph is None:
+            raise ValueError("The distance oracle has no graph to follow paths in")
+        total = self.distance(start_vertex, end_vertex)
+        if total is None:
+            return None
+
+        end_rank = self.__rank[end_vertex]
+        start_rank = self.__rank[start_vertex]
+        out_edges = self.__out_edges
+        query = self.__query
+        # the walk so far, as (rank, distance left from it, iterator over its untried edges)
+        stack = [(start_rank, total, iter(out_edges[start_rank]))]
+        visited = {start_rank}
+        while stack:
+            current, remaining, neighbors = stack[-1]
+            if current == end_rank:
+                break
+            for neighbor, cost in neighbors:
+                if neighbor in visited:
+                    continue
+                neighbor_remaining = query(neighbor, end_rank)
+                if _same_distance(cost + neighbor_remaining, remaining):
+                    visited.add(neighbor)
+                    stack.append((neighbor, neighbor_remaining, iter(out_edges[neighbor])))
+                    break
+            else:
+                stack.pop()
+
+        if not stack:
+            raise ValueError("The labels of the distance oracle do not lead to the end vertex")
+        ids = self.__ids
+        return [ids[rank] for rank, _, _ in stack], total
+
+    # Update methods, called by the graph after it has changed (see Graph.add_observer)
+    def vertex_added(self, vertex):
+        """
+        Complexity - Theta(1)
+        The new vertex gets the lowest rank and is its own hub.
+        :return: None
+        """
+        if vertex in self.__rank:
+            self.__invalidate()
+            return
+        self.__rank[vertex] = len(self.__ids)
+        self.__ids.append(vertex)
+        self.__out_labels.append({self.__rank[vertex]: 0})
+        self.__in_labels.append({self.__rank[vertex]: 0})
+        self.__out_edges.append([])
+        self.__in_edges.append([])
+
+    def edge_added(self, start_vertex, end_vertex, cost):
+        """
+        Complexity - O(resumed searches of the hubs of the two vertices)
+        Resumes the pruned search of every hub reaching start_vertex from end_vertex, and of every
+        hub reached from end_vertex backwards from start_vertex (dynamic pruned landmark labeling).
+        :return: None
+        """
+        if not self.__valid:
+            return
+        start_rank, end_rank = self.__rank[start_vertex], self.__rank[end_vertex]
+        self.__add_adjacency(start_rank, end_rank, cost)
+        self.__resume(start_rank, end_rank, cost if self.__weighted else 1)
+
+    def edge_removed(self, start_vertex, end_vertex):
+        """
+        Complexity - Theta(1)
+        :return: None
+        """
+        self.__invalidate()
+
+    def cost_changed(self, start_vertex, end_vertex, old_cost, new_cost):
+        """
+        Complexity - as edge_added for a lower cost, Theta(1) otherwise
+        :return: None
+        """
+        if not self.__weighted or not self.__valid:
+            return
+        start_rank, end_rank = self.__rank[start_vertex], self.__rank[end_vertex]
+        edges = self.__out_edges[start_rank]
+        edges[:] = [(target, new_cost if target == end_rank else cost) for target, cost in edges]
+        edges = self.__in_edges[end_rank]
+        edges[:] = [(source, new_cost if source == start_rank else cost) for source, cost in edges]
+        if new_cost < old_cost:
+            self.__resume(start_rank, end_rank, new_cost)
+        elif new_cost > old_cost:
+            self.__invalidate()
+
+    def vertex_removed(self, vertex):
+        """
+        Complexity - Theta(1)
+        :return: None
+        """
+        self.__invalidate()
+
+    def graph_cleared(self):
+        """
+        Complexity - Theta(1)
+        :return: None
+        """
+        self.__invalidate()
+
+    def __invalidate(self):
+        """
+        Complexity - Theta(number of listeners)
+        :return: None
+        """
+        if self.__valid:
+            self.__valid = False
+            for listener in self.__listeners:
+                listener(self)
+
+    def __check_valid(self):
+        """
+        Complexity - Theta(1), see build if the oracle rebuilds itself
+        :return: None
+        :raises ValueError: if the oracle is out of date and does not rebuild itself
+        """
+        if not self.__valid:
+            if not self.__auto_rebuild or self.__graph is None:
+                raise ValueError("The distance oracle is out of date")
+            self.build()
+
+    def __add_adjacency(self, start_rank, end_rank, cost):
+        """
+        Complexity - Theta(1)
+        :return: None
+        """
+        if not self.__weighted:
+            cost = 1
+        self.__out_edges[start_rank].append((end_rank, cost))
+        self.__in_edges[end_rank].append((start_rank, cost))
+
+    def __query(self, start_rank, end_rank):
+        """
+        Complexity - O(size of the smaller label)
+        :return: the distance given by the labels, infinity if they share no hub
+        """
+        out_label = self.__out_labels[start_rank]
+        in_label = self.__in_labels[end_rank]
+        if len(out_label) > len(in_label):
+            out_label, in_label = in_label, out_label
+        best = INFINITY
+        for hub, distance in out_label.items():
+            other = in_label.get(hub)
+            if other is not None and distance + other < best:
+                best = distance + other
+        return best
+
+    def __pruned_search(self, hub, start_rank, start_distance, forward):
+        """
+        Complexity - O(k log k), k being the number of vertices whose labels get the hub
+        Dijkstra from start_rank (at start_distance from the hub) that records the hub in the
+        labels of the vertices it reaches, and does not go past the vertices whose distance the
+        labels already give.
+        :param forward: True to follow outbound edges and fill in labels, False to follow inbound
+                        edges and fill out labels
+        :return: None
+        """
+        edges = self.__out_edges if forward else self.__in_edges
+        labels = self.__in_labels if forward else self.__out_labels
+        query = self.__query
+        dist_dict = {start_rank: start_distance}
+        priority_queue = [(start_distance, start_rank)]
+        while priority_queue:
+            current_distance, current = heapq.heappop(priority_queue)
+            if current_distance > dist_dict[current]:
+                continue
+            known = query(hub, current) if forward else query(current, hub)
+            if known <= current_distance:
+                continue
+            labels[current][hub] = current_distance
+
+            for neighbor, cost in edges[current]:
+                new_distance = current_distance + cost
+                if neighbor not in dist_dict or new_distance < dist_dict[neighbor]:
+                    dist_dict[neighbor] = new_distance
+                    heapq.heappush(priority_queue, (new_distance, neighbor))
+
+    def __resume(self, start_rank, end_rank, cost):
+        """
+        Complexity - O(resumed searches of the hubs of the two vertices)
+        Patches the labels after the edge start -> end got cheaper (or was added).
+        :return: None
+        """
+        for hub, distance in list(self.__in_labels[start_rank].items()):
+            self.__pruned_search(hub, end_rank, distance + cost, forward=True)
+        for hub, distance in list(self.__out_labels[end_rank].items()):
+            self.__pruned_search(hub, start_rank, distance + cost, forward=False)
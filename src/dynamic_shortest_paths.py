@@ -0,0 +1,258 @@
+import heapq
+
+from src.shortest_path_tree import ShortestPathTree
+
+
+# Single-source shortest paths kept up to date while the graph changes
+class DynamicShortestPaths:
+    """
+    Distances and predecessors from a source vertex, repaired in place after every change of
+    the graph instead of being recomputed (see Graph.subscribe_shortest_paths).
+
+    A cheaper edge (added, or with a lowered cost) is relaxed and the improvement is propagated
+    with Dijkstra's algorithm from its end vertex only. A tree edge that is removed or made more
+    expensive invalidates the subtree below it: only the vertices of that subtree are searched
+    again, starting from their cheapest inbound edges from the rest of the tree
+    (Ramalingam-Reps). Changes to edges outside the tree that do not make anything cheaper cost
+    Theta(1). Costs must be non-negative.
+    """
+
+    def __init__(self, graph, source):
+        """
+        Complexity - O((n + m) log n)
+        Runs Dijkstra's algorithm from source to every reachable vertex.
+        :param graph: the graph to follow (it calls the update methods below after every change)
+        :param source: a vertex of the graph
+        """
+        self.__graph = graph
+        self.__source = source
+        self.__distances = {source: 0}
+        self.__parents = {source: None}
+        # the reverse of __parents, so that the subtree of a vertex can be found without a search
+        self.__children = {}
+        self.__propagate([(0, source)])
+
+    @property
+    def source(self):
+        """
+        Complexity - Theta(1)
+        :return: the vertex the paths start from
+        """
+        return self.__source
+
+    def __len__(self):
+        """
+        Complexity - Theta(1)
+        :return: the number of vertices reachable from the source
+        """
+        return len(self.__distances)
+
+    def __contains__(self, vertex):
+        """
+        Complexity - Theta(1)
+        :return: True if the vertex is reachable from the source, False otherwise
+        """
+        return vertex in self.__distances
+
+    def reached_vertices(self):
+        """
+        Complexity - Theta(1)
+        :return: an iterator for the vertices reachable from the source
+        """
+        return iter(self.__distances)
+
+    def distance(self, vertex):
+        """
+        Complexity - Theta(1)
+        :param vertex: the vertex to get the distance of
+        :return: the cost of the lowest cost walk from the source to the vertex, or None if the
+                 vertex is not reachable
+        """
+        return self.__distances.get(vertex)
+
+    def parent(self, vertex):
+        """
+        Complexity - Theta(1)
+        :param vertex: a reachable vertex
+        :return: the predecessor of the vertex on a lowest cost walk, or None for the source
+        """
+        return self.__parents[vertex]
+
+    def path(self, vertex):
+        """
+        Complexity - Theta(length of the path)
+        :param vertex: the vertex at the end of the path
+        :return: the list of vertices on a lowest cost walk from the source, or None if the vertex
+                 is not reachable
+        """
+        if vertex not in self.__distances:
+            return None
+
+        path = []
+        current_vertex = vertex
+        while current_vertex is not None:
+            path.append(current_vertex)
+            current_vertex = self.__parents[current_vertex]
+        path.reverse()
+        return path
+
+    def snapshot(self):
+        """
+        Complexity - Theta(n)
+        :return: a ShortestPathTree with the current distances, which later changes do not affect
+        """
+        return ShortestPathTree(self.__source, dict(self.__distances), dict(self.__parents))
+
+    # Update methods, called by the graph after it has changed (see Graph.add_observer)
+    def vertex_added(self, vertex):
+        """
+        Complexity - Theta(1)
+        A new vertex has no edges yet, so nothing changes.
+        :return: None
+        """
+
+    def edge_added(self, start_vertex, end_vertex, cost):
+        """
+        Complexity - O(k log k), k being the number of vertices that get cheaper
+        :return: None
+        """
+        self.__relax(start_vertex, end_vertex, cost)
+
+    def edge_removed(self, start_vertex, end_vertex):
+        """
+        Complexity - Theta(1) if the edge is not in the tree, otherwise O(k log k + inbound edges
+                     of the k vertices in the subtree below it)
+        :return: None
+        """
+        if end_vertex in self.__distances and self.__parents[end_vertex] == start_vertex:
+            self.__repair(self.__detach_subtree(end_vertex))
+
+    def cost_changed(self, start_vertex, end_vertex, old_cost, new_cost):
+        """
+        Complexity - as edge_added for a lower cost, as edge_removed for a higher one
+        :return: None
+        """
+        if new_cost < old_cost:
+            self.__relax(start_vertex, end_vertex, new_cost)
+        elif new_cost > old_cost:
+            self.edge_removed(start_vertex, end_vertex)
+
+    def vertex_removed(self, vertex):
+        """
+        Complexity - as edge_removed for the tree edge into the vertex
+        Forgets every distance for good if the vertex is the source.
+        :return: None
+        """
+        if vertex == self.__source:
+            self.graph_cleared()
+        elif vertex in self.__distances:
+            self.__repair(self.__detach_subtree(vertex))
+
+    def graph_cleared(self):
+        """
+        Complexity - Theta(1)
+        Forgets every distance for good: the source is gone, and later changes are ignored.
+        :return: None
+        """
+        self.__distances = {}
+        self.__parents = {}
+        self.__children = {}
+
+    def __relax(self, start_vertex, end_vertex, cost):
+        """
+        Complexity - O(k log k), k being the number of vertices that get cheaper
+        :return: None
+        """
+        # with no distances left (source removed), start_vertex is never found, so nothing changes
+        if start_vertex not in self.__distances:
+            return
+        new_cost = self.__distances[start_vertex] + cost
+        if end_vertex not in self.__distances or new_cost < self.__distances[end_vertex]:
+            self.__distances[end_vertex] = new_cost
+            self.__set_parent(end_vertex, start_vertex)
+            self.__propagate([(new_cost, end_vertex)])
+
+    def __propagate(self, priority_queue):
+        """
+        Complexity - O(k log k), k being the number of vertices that get cheaper
+        Dijkstra's algorithm from the queued vertices, whose distances are already recorded.
+        Only the vertices that get cheaper are expanded.
+        :param priority_queue: a list of (distance, vertex) pairs
+        :return: None
+        """
+        graph = self.__graph
+        distances = self.__distances
+        heapq.heapify(priority_queue)
+        while priority_queue:
+            current_cost, current_vertex = heapq.heappop(priority_queue)
+            if current_cost > distances[current_vertex]:
+                continue  # outdated entry, the vertex got cheaper since
+
+            for neighbor, cost in graph.neighbors(current_vertex):
+                new_cost = current_cost + cost
+                if neighbor not in distances or new_cost < distances[neighbor]:
+                    distances[neighbor] = new_cost
+                    self.__set_parent(neighbor, current_vertex)
+                    heapq.heappush(priority_queue, (new_cost, neighbor))
+
+    def __detach_subtree(self, root):
+        """
+        Complexity - Theta(size of the subtree)
+        Forgets the distances of root and of every vertex whose path goes through it.
+        :return: the list of vertices of the subtree
+        """
+        parent = self.__parents[root]
+        if parent is not None:
+            self.__children[parent].discard(root)
+
+        subtree = [root]
+        for vertex in subtree:
+            subtree.extend(self.__children.pop(vertex, ()))
+        for vertex in subtree:
+            del self.__distances[vertex]
+            del self.__parents[vertex]
+        return subtree
+
+    def __repair(self, subtree):
+        """
+        Complexity - O(k log k + inbound edges of the k vertices)
+        Finds new distances for the detached vertices, starting from their cheapest inbound edges
+        from the vertices that kept theirs.
+        :param subtree: the detached vertices
+        :return: None
+        """
+        graph = self.__graph
+        distances = self.__distances
+        # every start is chosen before any distance is recorded, so only vertices outside the
+        # subtree are taken as starts
+        starts = []
+        for vertex in subtree:
+            if not graph.is_vertex(vertex):
+                continue
+            best_cost, best_parent = None, None
+            for neighbor, cost in graph.neighbors(vertex, reverse=True):
+                if neighbor in distances:
+                    new_cost = distances[neighbor] + cost
+                    if best_cost is None or new_cost < best_cost:
+                        best_cost, best_parent = new_cost, neighbor
+            if best_cost is not None:
+                starts.append((best_cost, vertex, best_parent))
+
+        priority_queue = []
+        for best_cost, vertex, best_parent in starts:
+            distances[vertex] = best_cost
+            self.__set_parent(vertex, best_parent)
+            priority_queue.append((best_cost, vertex))
+
+        self.__propagate(priority_queue)
+
+    def __set_parent(self, vertex, parent):
+        """
+        Complexity - Theta(1)
+        :return: None
+        """
+        old_parent = self.__parents.get(vertex)
+        if old_parent is not None:
+            self.__children[old_parent].discard(vertex)
+        self.__parents[vertex] = parent
+        self.__children.setdefault(parent, set()).add(vertex)
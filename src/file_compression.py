@@ -0,0 +1,52 @@
+import bz2
+import gzip
+import lzma
+
+try:
+    from compression import zstd  # standard library from Python 3.14
+except ImportError:
+    zstd = None
+
+
+def compression_of(file_name):
+    """
+    Complexity - Theta(1)
+    :param file_name: the name of the file
+    :return: "gzip", "bz2", "xz" or "zstd" depending on the extension of the file, None if the
+             file is not compressed
+    """
+    if file_name.endswith(".gz"):
+        return "gzip"
+    if file_name.endswith(".bz2"):
+        return "bz2"
+    if file_name.endswith((".xz", ".lzma")):
+        return "xz"
+    if file_name.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def wrap_file(file_object, file_name, mode):
+    """
+    Complexity - Theta(1)
+    Wraps an open binary file so that data is (de)compressed on the fly according to the
+    extension of file_name. Closing the wrapper does not close file_object.
+    :param file_object: the underlying file, opened in binary mode
+    :param file_name: the name used to choose the compression
+    :param mode: "rb" or "wb"
+    :return: a binary file object reading or writing uncompressed data
+    :raises ValueError: if the file needs zstd and this Python has no zstd module
+    """
+    compression = compression_of(file_name)
+    if compression == "gzip":
+        # the name is not stored in the header, so temporary names do not leak into the file
+        return gzip.GzipFile(filename="", fileobj=file_object, mode=mode)
+    if compression == "bz2":
+        return bz2.BZ2File(file_object, mode=mode)
+    if compression == "xz":
+        return lzma.LZMAFile(file_object, mode=mode)
+    if compression == "zstd":
+        if zstd is None:
+            raise ValueError(f"{file_name} needs zstd, which is only available from Python 3.14")
+        return zstd.ZstdFile(file_object, mode=mode)
+    return file_object
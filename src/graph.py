@@ -1,20 +1,107 @@
-import copy
 import heapq
+import sys
+from collections import OrderedDict
+
+from src.components import ComponentIndex
+from src.csr_graph import CSRGraph
+from src.distance_oracle import DistanceOracle
+from src.dynamic_shortest_paths import DynamicShortestPaths
+from src.graph_views import EdgeView, NeighborView, VertexView
+from src.instrumentation import METRICS, CountingQueue, timed
+from src.priority_queues import check_queue, make_queue
+from src.shortest_path_tree import ShortestPathTree
+
+class _EmptyTargets(dict):
+    """
+    The type of _NO_TARGETS: an empty dict that cannot be modified, and that copy.deepcopy and
+    pickle keep as the same shared object (it is saved by its name), so lean graphs can be copied
+    and pickled.
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        return "_NO_TARGETS"
+
+    def __read_only(self, *args, **kwargs):
+        raise TypeError("The shared empty adjacency cannot be modified")
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = __read_only
+
+
+class _EmptySources(frozenset):
+    """
+    The type of _NO_SOURCES: an empty frozenset that copy.deepcopy and pickle keep as the same
+    shared object.
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        return "_NO_SOURCES"
+
+
+# adjacency shared by every vertex without outbound (inbound) edges of a lean graph, replaced by a
+# container of its own on its first edge
+_NO_TARGETS = _EmptyTargets()
+_NO_SOURCES = _EmptySources()
+
+
+def _copy_adjacency(adjacency):
+    """
+    Complexity - Theta(size of the adjacency)
+    :param adjacency: the outbound dict, the inbound set, a shared empty adjacency or None
+    :return: a private copy of the adjacency (shared empty adjacency and None are kept as they are)
+    """
+    if adjacency is None or adjacency is _NO_TARGETS or adjacency is _NO_SOURCES:
+        return adjacency
+    return adjacency.copy()
 
 
 class Graph:
-    def __init__(self, number_of_vertices=0):
-        self.__inbound_edges = {}
-        self.__outbound_edges = {}
-        self.__costs = {}
-        self.__vertices = set()
+    # how many shortest path trees (one per source) are kept by shortest_path_tree()
+    SHORTEST_PATH_CACHE_SIZE = 16
+    # the BFS engine (see __hop_search) expands a level bottom-up once the frontier has more than
+    # 1 / BOTTOM_UP_EDGE_RATIO of the unexplored edges, and top-down again once it has fewer than
+    # 1 / TOP_DOWN_VERTEX_RATIO of the vertices
+    BOTTOM_UP_EDGE_RATIO = 14
+    TOP_DOWN_VERTEX_RATIO = 24
+
+    __slots__ = ("__index", "__ids", "__free_indices", "__inbound_edges", "__outbound_edges", "__lean",
+                 "__edge_count", "__modifications", "__shortest_path_trees", "__observers", "__component_index",
+                 "__value_checks", "__shared", "__owned_indices", "vertice_count")
+
+    def __init__(self, number_of_vertices=0, lean=False):
+        # Vertices are interned: each vertex id gets a dense index when it is added (the indices
+        # of removed vertices are reused), and all adjacency is stored by index. The outbound
+        # edges of the vertex with index i are __outbound_edges[i], a dict mapping the index of
+        # every target to the cost of the edge; __inbound_edges[i] is the set of the indices of
+        # its sources. Vertex ids are only looked up at the API boundary.
+        # A lean graph (lean=True) saves memory: __inbound_edges is None until a query needs the
+        # inbound edges (see __inbound), and vertices without outbound (inbound) edges share one
+        # empty, read-only adjacency (_NO_TARGETS, _NO_SOURCES) instead of holding their own.
+        self.__index = {}
+        self.__ids = []
+        self.__free_indices = []
+        self.__lean = lean
+        self.__inbound_edges = None if lean else []
+        self.__outbound_edges = []
         self.__edge_count = 0
+        # number of changes of the structure (vertices or edges added or removed), in a list shared
+        # with the views of the graph so that they notice changes during iteration (see graph_views.py)
+        self.__modifications = [0]
+        self.__shortest_path_trees = OrderedDict()
+        # objects told about every change, and the check_values methods of those that have one
+        # (see add_observer)
+        self.__observers = []
+        self.__value_checks = []
+        # the ComponentIndex among the observers, once it has been asked for (see component_index)
+        self.__component_index = None
+        # copy-on-write state (see copy_graph): while shared, the five containers above are also
+        # used by other graphs; once detached, only the adjacency of the indices in
+        # __owned_indices is private (None means that all of it is)
+        self.__shared = False
+        self.__owned_indices = None
         self.vertice_count = number_of_vertices
 
-        for i in range(number_of_vertices):
-            self.__inbound_edges[i] = set()
-            self.__outbound_edges[i] = set()
-
     # get the number of vertices (and edges)
     @property
     def number_of_vertices(self):
@@ -22,7 +109,7 @@ class Graph:
         Complexity - Theta(1)
         :return: the number of vertices in the graph
         """
-        return self.vertice_count if self.vertice_count > len(self.__vertices) else len(self.__vertices)
+        return self.vertice_count if self.vertice_count > len(self.__index) else len(self.__index)
 
     @property
     def number_of_edges(self):
@@ -32,16 +119,108 @@ class Graph:
         """
         return self.__edge_count
 
+    @property
+    def lean(self):
+        """
+        Complexity - Theta(1)
+        :return: True if the graph uses the memory-lean storage (see __init__), False otherwise
+        """
+        return self.__lean
+
+    def memory_usage(self):
+        """
+        Complexity - Theta(n + m)
+        Measures (with sys.getsizeof) the memory held by the graph, broken down by structure.
+        Containers still shared with a copy-on-write copy are counted for each graph; vertex ids
+        and costs are counted once per object, except for the small ints that Python caches.
+        :return: a dict mapping "index", "ids", "free_indices", "outbound_edges", "inbound_edges"
+                 and "values" to their size in bytes, and "total" and "per_vertex" to the sum of
+                 them and its share per vertex
+        """
+        def adjacency_size(adjacency):
+            if adjacency is None:
+                return 0
+            size = sys.getsizeof(adjacency)
+            shared_empty = None
+            for entry in adjacency:
+                if entry is _NO_TARGETS or entry is _NO_SOURCES:
+                    # one object for every vertex without edges
+                    shared_empty = entry
+                elif entry is not None:
+                    size += sys.getsizeof(entry)
+            return size + (0 if shared_empty is None else sys.getsizeof(shared_empty))
+
+        seen = set()
+
+        def value_size(value):
+            if (isinstance(value, int) and -5 <= value <= 256) or id(value) in seen:
+                return 0
+            seen.add(id(value))
+            return sys.getsizeof(value)
+
+        values = sum(value_size(vertex) for vertex in self.__index)
+        for targets in self.__outbound_edges:
+            if targets:
+                values += sum(value_size(cost) for cost in targets.values())
+
+        usage = {
+            "index": sys.getsizeof(self.__index),
+            "ids": sys.getsizeof(self.__ids),
+            "free_indices": sys.getsizeof(self.__free_indices),
+            "outbound_edges": adjacency_size(self.__outbound_edges),
+            "inbound_edges": adjacency_size(self.__inbound_edges),
+            "values": values,
+        }
+        usage["total"] = sum(usage.values())
+        usage["per_vertex"] = usage["total"] / len(self.__index) if self.__index else 0.0
+        return usage
+
     # parse (iterate) the set of vertices
     def parse_vertices(self):
         """
-        Complexity - Theta(n)
-        https://wiki.python.org/moin/TimeComplexity
-            - the time complexity of set() is O(n)
-            - the time complexity of accessing an element is in a dict is O(1)
-        :return: an iterator for the set of vertices
+        Complexity - Theta(1)
+        :return: a live view of the vertices (see vertices)
         """
-        return set(self.__vertices)
+        return self.vertices()
+
+    def vertices(self):
+        """
+        Complexity - Theta(1)
+        :return: a read-only VertexView of the vertices, which supports iteration, len and in
+                 without copying and always shows the current graph. Iterating it while
+                 vertices or edges are added or removed raises RuntimeError.
+        """
+        return VertexView(self.__view_state, self.__modifications)
+
+    def edges(self):
+        """
+        Complexity - Theta(1)
+        :return: a read-only EdgeView of the (start_vertex, end_vertex, cost) triples of the
+                 edges, live like the view returned by vertices
+        """
+        return EdgeView(self.__view_state, self.__modifications)
+
+    def neighbors(self, vertex, reverse=False):
+        """
+        Complexity - Theta(1)
+        :param vertex: a vertex of the graph
+        :param reverse: False for the outbound edges of the vertex, True for its inbound edges
+        :return: a read-only NeighborView of the (neighbor, cost) pairs of the edges of the vertex,
+                 live like the view returned by vertices
+        :raises KeyError: if the vertex is not in the graph
+        """
+        if vertex not in self.__index:
+            raise KeyError(vertex)
+        return NeighborView(self.__view_state, self.__modifications, vertex, reverse)
+
+    def __view_state(self, inbound=False):
+        """
+        Complexity - Theta(1), see __inbound if the inbound edges are needed
+        :param inbound: True if the inbound edges are needed (None is returned for them otherwise)
+        :return: the current containers of the graph, for its views (see graph_views.py)
+        """
+        return (self.__index, self.__ids, self.__outbound_edges, self.__inbound() if inbound else None,
+                self.__edge_count)
 
     # given two vertices, find out whether there is an edge from the first one to the second one
     def is_edge(self, start_vertex, end_vertex):
@@ -52,8 +231,10 @@ class Graph:
         :param start_vertex: start vertex
         :param end_vertex: end vertex
         :return: true if there is an edge from start_vertex to end_vertex, false otherwise
+        :raises KeyError: if start_vertex is not in the graph
         """
-        return end_vertex in self.__outbound_edges[start_vertex]
+        end_index = self.__index.get(end_vertex)
+        return end_index is not None and end_index in self.__outbound_edges[self.__index[start_vertex]]
 
     # get the in degree and the out degree of a specified vertex
     def in_degree(self, vertex):
@@ -64,7 +245,7 @@ class Graph:
         :param vertex: vertex to get the in degree of
         :return: in degree of the vertex
         """
-        return len(self.__inbound_edges[vertex])
+        return len(self.__inbound()[self.__index[vertex]])
 
     def out_degree(self, vertex):
         """
@@ -74,7 +255,7 @@ class Graph:
         :param vertex: vertex to get the out degree of
         :return: out degree of the vertex
         """
-        return len(self.__outbound_edges[vertex])
+        return len(self.__outbound_edges[self.__index[vertex]])
 
     # parse (iterate) the set of outbound edges of a specified vertex (that is, provide an iterator).
     # For each outbound edge, the iterator shall provide the Edge_id of the current edge (or the target vertex, if no Edge_id is used).
@@ -86,8 +267,9 @@ class Graph:
         :param vertex: vertex to get the outbound edges of
         :return: an iterator for the set of outbound edges of the vertex
         """
-        for vertex in self.__outbound_edges[vertex]:
-            yield vertex
+        ids = self.__ids
+        for target in self.__outbound_edges[self.__index[vertex]]:
+            yield ids[target]
 
     # parse the set of inbound edges of a specified vertex (as above)
     def parse_inbound(self, vertex):
@@ -98,8 +280,9 @@ class Graph:
         :param vertex: vertex to get the inbound edges of
         :return: an iterator for the set of inbound edges of the vertex
         """
-        for vertex in self.__inbound_edges[vertex]:
-            yield vertex
+        ids = self.__ids
+        for source in self.__inbound()[self.__index[vertex]]:
+            yield ids[source]
 
     # retrieve or modify the information (the integer) attached to a specified edge
     def modify_cost(self, edge, new_cost):
@@ -110,8 +293,21 @@ class Graph:
         :param edge: the edge to modify the cost of
         :param new_cost: the new cost of the edge
         :return: None
+        :raises KeyError: if the edge is not in the graph
+        :raises ValueError: if an observer refuses the values (see add_observer)
         """
-        self.__costs[edge] = new_cost
+        start_vertex, end_vertex = edge
+        old_cost = self.get_cost(start_vertex, end_vertex)
+        for check in self.__value_checks:
+            check(new_cost)
+        if self.__shared:
+            self.__detach()
+        start_index = self.__index[start_vertex]
+        self.__own(start_index)
+        self.__outbound_edges[start_index][self.__index[end_vertex]] = new_cost
+        self.__shortest_path_trees.clear()
+        for observer in self.__observers:
+            observer.cost_changed(start_vertex, end_vertex, old_cost, new_cost)
 
     # The graph shall be modifiable: it shall be possible to add and remove an edge, and to add and remove a vertex.
     # Think about what should happen with the properties of existing edges and with the identification of remaining
@@ -127,27 +323,94 @@ class Graph:
         :param end_vertex: the end vertex
         :param cost: the cost of the edge
         :return: None
+        :raises ValueError: if an observer refuses the values (see add_observer)
         """
-        if start_vertex not in self.__vertices:
-            self.__vertices.add(start_vertex)
-            self.__inbound_edges[start_vertex] = set()
-            self.__outbound_edges[start_vertex] = set()
+        for check in self.__value_checks:
+            check(start_vertex, end_vertex, cost)
+        if self.__shared:
+            self.__detach()
+
+        start_index = self.__index.get(start_vertex)
+        if start_index is None:
+            start_index = self.__create_vertex(start_vertex)
 
-        if end_vertex not in self.__vertices:
-            self.__vertices.add(end_vertex)
-            self.__inbound_edges[end_vertex] = set()
-            self.__outbound_edges[end_vertex] = set()
+        end_index = self.__index.get(end_vertex)
+        if end_index is None:
+            end_index = self.__create_vertex(end_vertex)
 
-        if self.is_edge(start_vertex, end_vertex):
+        if end_index in self.__outbound_edges[start_index]:
             return False
 
-        self.__outbound_edges[start_vertex].add(end_vertex)
-        self.__inbound_edges[end_vertex].add(start_vertex)
-        self.__costs[(start_vertex, end_vertex)] = cost
+        self.__own(start_index)
+        self.__own(end_index)
+        self.__link(start_index, end_index, cost)
         self.__edge_count += 1
+        self.__modifications[0] += 1
+        self.__shortest_path_trees.clear()
+        for observer in self.__observers:
+            observer.edge_added(start_vertex, end_vertex, cost)
 
         return True
 
+    def add_edges(self, edges):
+        """
+        Complexity - Theta(k), k being the number of given edges
+        Adds edges in bulk, without going through add_edge for each of them. Edges that are
+        already in the graph are skipped (their cost is not changed).
+        :param edges: an iterable of (start_vertex, end_vertex, cost) triples
+        :return: the number of edges that were added
+        :raises ValueError: if an observer refuses the values (see add_observer)
+        """
+        if self.__shared:
+            self.__detach()
+
+        index = self.__index
+        inbound_edges = self.__inbound_edges
+        outbound_edges = self.__outbound_edges
+        owned_indices = self.__owned_indices
+        observers = self.__observers
+        value_checks = self.__value_checks
+        added = 0
+
+        # the edges added before a check (or an observer) raises stay added and counted
+        try:
+            for start_vertex, end_vertex, cost in edges:
+                for check in value_checks:
+                    check(start_vertex, end_vertex, cost)
+                start_index = index.get(start_vertex)
+                if start_index is None:
+                    start_index = self.__create_vertex(start_vertex)
+                end_index = index.get(end_vertex)
+                if end_index is None:
+                    end_index = self.__create_vertex(end_vertex)
+                if owned_indices is not None:
+                    self.__own(start_index)
+                    self.__own(end_index)
+
+                targets = outbound_edges[start_index]
+                if end_index in targets:
+                    continue
+                if targets is _NO_TARGETS:
+                    targets = outbound_edges[start_index] = {}
+                targets[end_index] = cost
+                if observers:
+                    # an observer may have asked for the inbound edges of a lean graph
+                    inbound_edges = self.__inbound_edges
+                if inbound_edges is not None:
+                    sources = inbound_edges[end_index]
+                    if sources is _NO_SOURCES:
+                        sources = inbound_edges[end_index] = set()
+                    sources.add(start_index)
+                added += 1
+                for observer in observers:
+                    observer.edge_added(start_vertex, end_vertex, cost)
+        finally:
+            self.__edge_count += added
+            if added:
+                self.__modifications[0] += 1
+                self.__shortest_path_trees.clear()
+        return added
+
     def remove_edge(self, start_vertex, end_vertex):
         """
         Complexity - Theta(1)
@@ -158,10 +421,20 @@ class Graph:
         if not self.is_edge(start_vertex, end_vertex):
             return False
 
-        self.__outbound_edges[start_vertex].remove(end_vertex)
-        self.__inbound_edges[end_vertex].remove(start_vertex)
-        self.__costs.pop((start_vertex, end_vertex))
+        if self.__shared:
+            self.__detach()
+        start_index = self.__index[start_vertex]
+        end_index = self.__index[end_vertex]
+        self.__own(start_index)
+        self.__own(end_index)
+        del self.__outbound_edges[start_index][end_index]
+        if self.__inbound_edges is not None:
+            self.__inbound_edges[end_index].remove(start_index)
         self.__edge_count -= 1
+        self.__modifications[0] += 1
+        self.__shortest_path_trees.clear()
+        for observer in self.__observers:
+            observer.edge_removed(start_vertex, end_vertex)
 
         return True
 
@@ -171,42 +444,290 @@ class Graph:
         Adds a vertex to the graph
         :param vertex: the vertex to add
         :return: True if the vertex was added, False otherwise
+        :raises ValueError: if an observer refuses the values (see add_observer)
         """
-        if vertex not in self.__vertices:
-            self.__vertices.add(vertex)
+        if vertex not in self.__index:
+            for check in self.__value_checks:
+                check(vertex)
+            if self.__shared:
+                self.__detach()
+            self.__create_vertex(vertex)
             return True
         return False
 
+    def remove_edges(self, edges):
+        """
+        Complexity - Theta(k), k being the number of given edges
+        Removes edges in bulk. Edges that are not in the graph are skipped.
+        :param edges: an iterable of (start_vertex, end_vertex) pairs
+        :return: the number of edges that were removed
+        """
+        if self.__shared:
+            self.__detach()
+
+        index = self.__index
+        inbound_edges = self.__inbound_edges
+        outbound_edges = self.__outbound_edges
+        observers = self.__observers
+        removed = 0
+
+        for start_vertex, end_vertex in edges:
+            start_index = index.get(start_vertex)
+            end_index = index.get(end_vertex)
+            if start_index is None or end_index not in outbound_edges[start_index]:
+                continue
+            self.__own(start_index)
+            self.__own(end_index)
+            del outbound_edges[start_index][end_index]
+            if observers:
+                # an observer may have asked for the inbound edges of a lean graph
+                inbound_edges = self.__inbound_edges
+            if inbound_edges is not None:
+                inbound_edges[end_index].remove(start_index)
+            removed += 1
+            for observer in observers:
+                observer.edge_removed(start_vertex, end_vertex)
+
+        self.__edge_count -= removed
+        if removed:
+            self.__modifications[0] += 1
+            self.__shortest_path_trees.clear()
+        return removed
+
     def remove_vertex(self, vertex_to_remove):
         """
-        Complexity - Theta(n)
-        Removes a vertex from the graph
+        Complexity - Theta(deg(vertex_to_remove))
+        Removes a vertex from the graph, together with its inbound and outbound edges
         :param vertex_to_remove: the vertex to remove
         :return: True if the vertex was removed, False otherwise
         """
-        if vertex_to_remove not in self.__vertices:
+        if vertex_to_remove not in self.__index:
             return False
 
-        for vertex in self.parse_vertices():
-            self.remove_edge(vertex, vertex_to_remove)
-            self.remove_edge(vertex_to_remove, vertex)
+        if self.__shared:
+            self.__detach()
+        self.__delete_vertex(vertex_to_remove)
+        self.__shortest_path_trees.clear()
+
+        return True
+
+    def remove_vertices(self, vertices):
+        """
+        Complexity - Theta(k + sum of the degrees of the removed vertices), k being the number of
+        given vertices
+        Removes vertices in bulk, together with their edges. Vertices that are not in the graph
+        are skipped.
+        :param vertices: an iterable of vertices
+        :return: the number of vertices that were removed
+        """
+        if self.__shared:
+            self.__detach()
+
+        removed = 0
+        for vertex in vertices:
+            if vertex in self.__index:
+                self.__delete_vertex(vertex)
+                removed += 1
+
+        if removed:
+            self.__shortest_path_trees.clear()
+        return removed
 
-        self.__outbound_edges.pop(vertex_to_remove)
-        self.__inbound_edges.pop(vertex_to_remove)
-        self.__vertices.remove(vertex_to_remove)
+    def __delete_vertex(self, vertex_to_remove):
+        """
+        Complexity - Theta(deg(vertex_to_remove))
+        Removes a vertex and its edges, visiting only its actual neighbours, and frees its index.
+        Must be called after __detach.
+        :param vertex_to_remove: a vertex of the graph
+        :return: None
+        """
+        inbound_edges = self.__inbound()
+        outbound_edges = self.__outbound_edges
+
+        removed_index = self.__index.pop(vertex_to_remove)
+        targets = outbound_edges[removed_index]
+        sources = inbound_edges[removed_index]
+        for target in targets:
+            if target != removed_index:
+                self.__own(target)
+                inbound_edges[target].remove(removed_index)
+        for source in sources:
+            if source != removed_index:
+                self.__own(source)
+                del outbound_edges[source][removed_index]
+
+        self.__edge_count -= len(targets) + len(sources) - (removed_index in targets)
+        outbound_edges[removed_index] = None
+        inbound_edges[removed_index] = None
+        self.__ids[removed_index] = None
+        self.__free_indices.append(removed_index)
+        if self.__owned_indices is not None:
+            self.__owned_indices.discard(removed_index)
         self.vertice_count -= 1
+        self.__modifications[0] += 1
 
-        return True
+        for observer in self.__observers:
+            observer.vertex_removed(vertex_to_remove)
 
     # The graph shall be copyable, that is, it should be possible to make an exact copy of a graph,
     # so that the original can be then modified independently of its copy. Think about the desirable
     # behaviour of an Edge_property attached to the original graph, when a copy is made.
-    def copy_graph(self):
+    @timed("copy_graph")
+    def copy_graph(self, copy_on_write=True):
+        """
+        Complexity - Theta(1) with copy_on_write, Theta(n + m) otherwise
+        Copies the graph without going through copy.deepcopy. Vertices and costs are shared
+        as-is (they are immutable values), only the containers are copied.
+        With copy_on_write, the copy starts out sharing every container with the original. The
+        first change to either graph gives it its own top-level containers, and the adjacency of
+        each vertex is only copied once one of its edges changes, so a what-if edit costs memory
+        in proportion to what it touches.
+        Otherwise all containers are rebuilt right away.
+        :param copy_on_write: share the containers until they are modified
+        :return: a copy of the graph, which can be modified independently of the original
+        """
+        graph_copy = Graph.__new__(Graph)
+        if copy_on_write:
+            self.__shared = True
+            self.__owned_indices = set()
+            graph_copy.__index = self.__index
+            graph_copy.__ids = self.__ids
+            graph_copy.__free_indices = self.__free_indices
+            graph_copy.__inbound_edges = self.__inbound_edges
+            graph_copy.__outbound_edges = self.__outbound_edges
+            graph_copy.__shared = True
+            graph_copy.__owned_indices = set()
+        else:
+            graph_copy.__index = dict(self.__index)
+            graph_copy.__ids = list(self.__ids)
+            graph_copy.__free_indices = list(self.__free_indices)
+            graph_copy.__inbound_edges = (None if self.__inbound_edges is None else
+                                          [_copy_adjacency(sources) for sources in self.__inbound_edges])
+            graph_copy.__outbound_edges = [_copy_adjacency(targets) for targets in self.__outbound_edges]
+            graph_copy.__shared = False
+            graph_copy.__owned_indices = None
+
+        graph_copy.__lean = self.__lean
+        graph_copy.__edge_count = self.__edge_count
+        graph_copy.__modifications = [0]
+        graph_copy.__shortest_path_trees = OrderedDict()
+        graph_copy.__observers = []
+        graph_copy.__value_checks = []
+        graph_copy.__component_index = None
+        graph_copy.vertice_count = self.vertice_count
+        return graph_copy
+
+    def __detach(self):
         """
         Complexity - Theta(n)
-        :return: a deep copy of the graph
+        Gives a copy-on-write graph its own top-level containers. The adjacency of each vertex
+        stays shared until __own is called for its index.
+        :return: None
+        """
+        self.__index = dict(self.__index)
+        self.__ids = list(self.__ids)
+        self.__free_indices = list(self.__free_indices)
+        if self.__inbound_edges is not None:
+            self.__inbound_edges = list(self.__inbound_edges)
+        self.__outbound_edges = list(self.__outbound_edges)
+        self.__owned_indices = set()
+        self.__shared = False
+
+    def __own(self, vertex_index):
         """
-        return copy.deepcopy(self)
+        Complexity - Theta(1) amortized, Theta(deg) on the first call for a vertex after a copy
+        Makes the adjacency of a vertex private to this graph, so it can be modified.
+        Must be called after __detach.
+        :param vertex_index: the index of the vertex whose edges are about to change
+        :return: None
+        """
+        owned_indices = self.__owned_indices
+        if owned_indices is None or vertex_index in owned_indices:
+            return
+        if self.__inbound_edges is not None:
+            self.__inbound_edges[vertex_index] = _copy_adjacency(self.__inbound_edges[vertex_index])
+        self.__outbound_edges[vertex_index] = _copy_adjacency(self.__outbound_edges[vertex_index])
+        owned_indices.add(vertex_index)
+
+    def __link(self, start_index, end_index, cost):
+        """
+        Complexity - Theta(1)
+        Stores a new edge in the adjacency, giving a lean vertex its own adjacency on its first edge.
+        Must be called after __own for both indices.
+        :return: None
+        """
+        targets = self.__outbound_edges[start_index]
+        if targets is _NO_TARGETS:
+            targets = self.__outbound_edges[start_index] = {}
+        targets[end_index] = cost
+        inbound_edges = self.__inbound_edges
+        if inbound_edges is not None:
+            sources = inbound_edges[end_index]
+            if sources is _NO_SOURCES:
+                sources = inbound_edges[end_index] = set()
+            sources.add(start_index)
+
+    def __inbound(self):
+        """
+        Complexity - Theta(1), Theta(n + m) the first time for a lean graph
+        Builds the inbound adjacency of a lean graph from its outbound adjacency, the first time
+        it is needed; it is then kept up to date like that of any graph.
+        :return: the inbound adjacency (see __init__)
+        """
+        inbound_edges = self.__inbound_edges
+        if inbound_edges is None:
+            inbound_edges = [None if targets is None else _NO_SOURCES for targets in self.__outbound_edges]
+            for start_index, targets in enumerate(self.__outbound_edges):
+                if not targets:
+                    continue
+                for end_index in targets:
+                    sources = inbound_edges[end_index]
+                    if sources is _NO_SOURCES:
+                        sources = inbound_edges[end_index] = set()
+                    sources.add(start_index)
+            self.__inbound_edges = inbound_edges
+        return inbound_edges
+
+    def __create_vertex(self, vertex):
+        """
+        Complexity - Theta(1) amortized
+        Interns a new vertex: gives it a free index (or a new one) and empty adjacency.
+        Must be called after __detach.
+        :param vertex: a vertex that is not in the graph
+        :return: the index of the vertex
+        """
+        sources, targets = (_NO_SOURCES, _NO_TARGETS) if self.__lean else (set(), {})
+        inbound_edges = self.__inbound_edges
+        if self.__free_indices:
+            vertex_index = self.__free_indices.pop()
+            self.__ids[vertex_index] = vertex
+            if inbound_edges is not None:
+                inbound_edges[vertex_index] = sources
+            self.__outbound_edges[vertex_index] = targets
+        else:
+            vertex_index = len(self.__ids)
+            self.__ids.append(vertex)
+            if inbound_edges is not None:
+                inbound_edges.append(sources)
+            self.__outbound_edges.append(targets)
+
+        self.__index[vertex] = vertex_index
+        if self.__owned_indices is not None:
+            self.__owned_indices.add(vertex_index)
+        self.__modifications[0] += 1
+        for observer in self.__observers:
+            observer.vertex_added(vertex)
+        return vertex_index
+
+    def freeze(self):
+        """
+        Complexity - Theta(n log n + m log m)
+        Builds an immutable, array-backed (CSR) snapshot of the graph. The snapshot answers the
+        same read queries (degrees, edges, costs, backward_bfs, dijkstra) without hashing tuples
+        and uses a fraction of the memory, but does not see later changes to the graph.
+        :return: a CSRGraph snapshot of the graph
+        """
+        return CSRGraph.from_graph(self)
 
     def get_cost(self, start_vertex, end_vertex):
         """
@@ -215,16 +736,28 @@ class Graph:
         :param start_vertex: the start vertex
         :param end_vertex: the end vertex
         :return: the cost of the edge from start_vertex to end_vertex
+        :raises KeyError: if there is no such edge
         """
-        return self.__costs[(start_vertex, end_vertex)]
+        try:
+            return self.__outbound_edges[self.__index[start_vertex]][self.__index[end_vertex]]
+        except KeyError:
+            raise KeyError((start_vertex, end_vertex)) from None
 
     def get_edges_list(self):
         """
-        Complexity - Theta(n)
+        Complexity - Theta(m)
         Returns a list of all edges in the graph
-        :return: a list of all edges in the graph
+        :return: a list of the (start, end) pairs of all edges in the graph
+        """
+        return [(start_vertex, end_vertex) for start_vertex, end_vertex, _ in self.get_edges_with_costs()]
+
+    def get_edges_with_costs(self):
         """
-        return self.__costs.keys()
+        Complexity - Theta(n + m)
+        Iterates the edges together with their costs, without a get_cost lookup per edge
+        :return: an iterator for the (start, end, cost) triples of all edges in the graph (see edges)
+        """
+        return iter(self.edges())
 
     def is_vertex(self, vertex):
         """
@@ -233,7 +766,7 @@ class Graph:
         :param vertex: the vertex to check
         :return: True if the vertex is in the graph, False otherwise
         """
-        return vertex in self.__vertices
+        return vertex in self.__index
 
     def clear_graph(self):
         """
@@ -241,121 +774,444 @@ class Graph:
         Clears the graph
         :return: None
         """
-        self.__inbound_edges.clear()
-        self.__outbound_edges.clear()
-        self.__vertices.clear()
-        self.__costs.clear()
+        # new containers instead of clear(), which would also empty the copy-on-write copies
+        self.__index = {}
+        self.__ids = []
+        self.__free_indices = []
+        self.__inbound_edges = None if self.__lean else []
+        self.__outbound_edges = []
+        self.__shared = False
+        self.__owned_indices = None
         self.__edge_count = 0
+        self.__modifications[0] += 1
+        self.__shortest_path_trees.clear()
+        for observer in self.__observers:
+            observer.graph_cleared()
+
+    def add_observer(self, observer):
+        """
+        Complexity - Theta(1)
+        Registers an object to be told about every later change of the graph, right after it is
+        made. The observer must have the methods vertex_added(vertex), vertex_removed(vertex),
+        edge_added(start_vertex, end_vertex, cost), edge_removed(start_vertex, end_vertex),
+        cost_changed(start_vertex, end_vertex, old_cost, new_cost) and graph_cleared().
+        Removing a vertex only reports the vertex, not each of its edges. Copies of the graph start
+        without observers.
+        An observer may also have a method check_values(*values), which gets the new vertices and
+        costs of every addition and cost change before it is made and raises ValueError to
+        refuse it (the graph is then left unchanged).
+        :param observer: the object to notify
+        :return: None
+        """
+        self.__observers.append(observer)
+        check = getattr(observer, "check_values", None)
+        if check is not None:
+            self.__value_checks.append(check)
+
+    def remove_observer(self, observer):
+        """
+        Complexity - O(number of observers)
+        :param observer: an object registered with add_observer
+        :return: True if the observer was removed, False if it was not registered
+        """
+        if observer not in self.__observers:
+            return False
+        self.__observers.remove(observer)
+        check = getattr(observer, "check_values", None)
+        if check is not None:
+            self.__value_checks.remove(check)
+        if observer is self.__component_index:
+            self.__component_index = None
+        return True
+
+    def component_index(self):
+        """
+        Complexity - Theta(n + m) the first time, Theta(1) afterwards
+        Builds the index of the strongly and weakly connected components of the graph on the first
+        call. From then on, every change of the graph updates it, and path queries between
+        vertices that it shows cannot reach each other return None without a search.
+        :return: the ComponentIndex of the graph
+        """
+        if self.__component_index is None:
+            self.__component_index = ComponentIndex(self)
+            self.add_observer(self.__component_index)
+        return self.__component_index
+
+    def strongly_connected_components(self):
+        """
+        Complexity - Theta(n + m) if the component index is not up to date, Theta(n) otherwise
+        :return: the list of the strongly connected components (lists of vertices), in
+                 topological order
+        """
+        return self.component_index().strongly_connected_components()
+
+    def weakly_connected_components(self):
+        """
+        Complexity - Theta(n + m) if the component index is not up to date, Theta(n) otherwise
+        :return: the list of the weakly connected components (lists of vertices)
+        """
+        return self.component_index().weakly_connected_components()
+
+    def build_distance_oracle(self, weighted=True, auto_rebuild=False):
+        """
+        Complexity - see DistanceOracle.build
+        Precomputes distance labels, after which distance queries take microseconds instead of a
+        search. Every later change of the graph is reported to the oracle: additions and lower
+        costs patch the labels, while removals and higher costs put them out of date.
+        Costs must be non-negative.
+        :param weighted: if False, every edge counts as 1 (distances are numbers of edges)
+        :param auto_rebuild: if True, a query on an out of date oracle rebuilds it first, otherwise
+                             it raises ValueError
+        :return: the DistanceOracle of the graph (stop its updates with remove_observer)
+        """
+        oracle = DistanceOracle(self, weighted, auto_rebuild)
+        self.add_observer(oracle)
+        return oracle
+
+    def __unreachable(self, start_vertex, end_vertex):
+        """
+        Complexity - O(log n)
+        :return: True if the component index shows that there is no path from start_vertex to
+                 end_vertex, False if there is no index or it cannot tell
+        """
+        return self.__component_index is not None and not self.__component_index.may_reach(start_vertex, end_vertex)
+
+    def subscribe_shortest_paths(self, source):
+        """
+        Complexity - O((n + m) log n)
+        Computes the lowest cost walks from source to every reachable vertex and keeps them up to
+        date: every later change of the graph repairs only the part of the result it affects,
+        instead of a new search from scratch. The subscription stops changing once source is
+        removed or the graph is cleared.
+        Costs must be non-negative.
+        :param source: the starting vertex
+        :return: a DynamicShortestPaths rooted at source, or None if source is not in the graph
+        """
+        if not self.is_vertex(source):
+            return None
+
+        subscription = DynamicShortestPaths(self, source)
+        self.add_observer(subscription)
+        return subscription
+
+    def unsubscribe_shortest_paths(self, subscription):
+        """
+        Complexity - O(number of observers)
+        Stops updating a DynamicShortestPaths returned by subscribe_shortest_paths.
+        :param subscription: the subscription to end
+        :return: True if the subscription was ended, False if it was not active
+        """
+        return self.remove_observer(subscription)
+
+    def shortest_path_tree(self, source):
+        """
+        Complexity - O((n + m) log n) on a cache miss, Theta(1) on a hit
+        Runs Dijkstra's algorithm from source to every reachable vertex. The result is cached per
+        source (the least recently used trees are evicted first) until the edges or costs of the
+        graph change.
+        :param source: the starting vertex
+        :return: a ShortestPathTree rooted at source, or None if source is not in the graph
+        """
+        if not self.is_vertex(source):
+            return None
 
-    def backward_bfs(self, start_vertex, end_vertex):
+        if source in self.__shortest_path_trees:
+            self.__shortest_path_trees.move_to_end(source)
+            return self.__shortest_path_trees[source]
+
+        outbound_edges = self.__outbound_edges
+        source_index = self.__index[source]
+        dist_dict = {source_index: 0}
+        prev_dict = {source_index: None}
+        settled = set()
+        priority_queue = [(0, source_index)]
+        while priority_queue:
+            current_cost, current = heapq.heappop(priority_queue)
+            if current in settled:
+                continue
+            settled.add(current)
+
+            for neighbor, cost in outbound_edges[current].items():
+                new_cost = current_cost + cost
+                if neighbor not in dist_dict or new_cost < dist_dict[neighbor]:
+                    dist_dict[neighbor] = new_cost
+                    prev_dict[neighbor] = current
+                    heapq.heappush(priority_queue, (new_cost, neighbor))
+
+        ids = self.__ids
+        distances = {ids[i]: cost for i, cost in dist_dict.items()}
+        parents = {ids[i]: (ids[parent] if parent is not None else None) for i, parent in prev_dict.items()}
+        tree = ShortestPathTree(source, distances, parents)
+        self.__shortest_path_trees[source] = tree
+        if len(self.__shortest_path_trees) > self.SHORTEST_PATH_CACHE_SIZE:
+            self.__shortest_path_trees.popitem(last=False)
+        return tree
+
+    def backward_bfs(self, start_vertex, end_vertex, bidirectional=False):
+        """
+        Complexity - O(n + m)
+        Finds the path with the fewest edges between two vertices using a BFS over the inbound
+        edges, starting from end_vertex. The search stops as soon as it discovers start_vertex.
+        :param start_vertex: the starting vertex
+        :param end_vertex: the ending vertex
+        :param bidirectional: if True, also search forward from start_vertex and stop where the two
+                              searches meet
+        :return: the list of vertices on the path, or None if no path exists
+        """
         # Check if both start and end vertices exist in the graph
         if not self.is_vertex(start_vertex) or not self.is_vertex(end_vertex):
             return None  # Return None if either vertex is not in the graph
 
-        # Initialize the queue with the end vertex (for backward BFS)
-        queue = [end_vertex]
-        # Dictionary to store distances from the end vertex
-        dist_dict = {end_vertex: 0}
-        # Dictionary to store the predecessor of each vertex in the path
-        next_dict = {end_vertex: None}
-
-        # Perform BFS
-        while queue:
-            # Dequeue the first vertex in the queue
-            current_vertex = queue.pop(0)
-            # Get the current distance from the end vertex
-            current_distance = dist_dict[current_vertex]
-
-            # Iterate through all inbound neighbors of the current vertex
-            for neighbor in self.__inbound_edges[current_vertex]:
-                # If the neighbor has not been visited
-                if neighbor not in dist_dict:
-                    # Update the distance to the neighbor
-                    dist_dict[neighbor] = current_distance + 1
-                    # Set the current vertex as the predecessor of the neighbor
-                    next_dict[neighbor] = current_vertex
-                    # Enqueue the neighbor for further exploration
-                    queue.append(neighbor)
+        # Vertices in components that cannot reach each other have no path between them
+        if self.__unreachable(start_vertex, end_vertex):
+            return None
+
+        # The search runs on the indices of the vertices
+        start_index = self.__index[start_vertex]
+        end_index = self.__index[end_vertex]
+
+        if bidirectional:
+            return self.__bidirectional_bfs(start_index, end_index)
+
+        # next_dict maps every discovered vertex to the next vertex on its path to end_vertex
+        _, next_dict = self.__hop_search(end_index, False, {start_index})
 
         # If the start vertex is not reachable from the end vertex, return None
-        if start_vertex not in dist_dict:
+        if start_index not in next_dict:
             return None
 
         # Reconstruct the path from start_vertex to end_vertex
         path = []
-        current_vertex = start_vertex
+        current_vertex = start_index
         while current_vertex is not None:
             # Add the current vertex to the path
-            path.append(current_vertex)
+            path.append(self.__ids[current_vertex])
             # Move to the next vertex in the path
             current_vertex = next_dict[current_vertex]
 
         # Return the path (in forward order from start_vertex to end_vertex)
         return path
 
-    def dijkstra(self, start_vertex, end_vertex):
+    def hop_distances(self, vertex, targets=None, reverse=True):
+        """
+        Complexity - O(n + m)
+        Counts the edges of the shortest paths between vertex and many other vertices with a
+        single BFS, which stops once every target has been discovered.
+        :param vertex: the vertex the paths end at (or start from, if reverse is False)
+        :param targets: an iterable of the vertices to measure (None means every vertex)
+        :param reverse: True for the paths from the targets to vertex (over inbound edges, as
+                        backward_bfs), False for the paths from vertex to the targets
+        :return: a dict mapping every target that has such a path to its number of edges (vertex
+                 itself, if it is a target, to 0); targets that are not in the graph are left out
+        """
+        if not self.is_vertex(vertex):
+            return {}
+
+        index = self.__index
+        target_indices = None
+        if targets is not None:
+            target_indices = {index[target] for target in targets if target in index}
+            if not target_indices:
+                return {}
+
+        distances, _ = self.__hop_search(index[vertex], not reverse, target_indices)
+        ids = self.__ids
+        if target_indices is None:
+            return {ids[vertex_index]: distance for vertex_index, distance in distances.items()}
+        return {ids[vertex_index]: distances[vertex_index] for vertex_index in target_indices
+                if vertex_index in distances}
+
+    def __hop_search(self, root, forward, targets=None):
+        """
+        Complexity - O(n + m)
+        Direction-optimizing BFS from root, one level at a time (Beamer et al.). A level is
+        expanded top-down (every frontier vertex scans its edges) while the frontier is small,
+        and bottom-up (every vertex not yet discovered scans its edges in the other direction for
+        one in the frontier, and stops at the first) once the frontier has more edges than
+        1 / BOTTOM_UP_EDGE_RATIO of the edges left unexplored. It goes back to top-down when the
+        frontier has fewer than 1 / TOP_DOWN_VERTEX_RATIO of the vertices. On low diameter graphs
+        the few huge middle levels are then found without scanning most of their edges.
+        :param root: the index of the starting vertex
+        :param forward: True to follow outbound edges, False to follow inbound edges
+        :param targets: a set of indices; the search stops as soon as all of them are discovered
+                        (None means never)
+        :return: a tuple (distances, links) of dicts mapping every discovered index to its number
+                 of edges from root and to the index it was discovered from (None for root)
+        """
+        # the inbound edges of a lean graph are only built if a level is expanded over them
+        scanned_edges = self.__outbound_edges if forward else self.__inbound()
+        other_edges = None if forward else self.__outbound_edges
+        distances = {root: 0}
+        links = {root: None}
+        remaining = None
+        if targets is not None:
+            remaining = set(targets)
+            remaining.discard(root)
+
+        frontier = [root]
+        level = 0
+        unexplored_edges = self.__edge_count
+        vertex_count = len(self.__index)
+        unvisited = None
+        bottom_up = False
+        settled = scanned = 0
+        largest_frontier = 1
+        while frontier and remaining != set():
+            frontier_edges = sum(len(scanned_edges[vertex]) for vertex in frontier)
+            unexplored_edges -= frontier_edges
+            if not bottom_up:
+                bottom_up = frontier_edges * self.BOTTOM_UP_EDGE_RATIO > unexplored_edges
+            elif len(frontier) * self.TOP_DOWN_VERTEX_RATIO < vertex_count:
+                bottom_up = False
+
+            next_frontier = []
+            if bottom_up:
+                if other_edges is None:
+                    other_edges = self.__inbound()
+                if unvisited is None:
+                    ids = self.__ids
+                    unvisited = [vertex for vertex in range(len(ids)) if ids[vertex] is not None]
+                unvisited = [vertex for vertex in unvisited if vertex not in distances]
+                for vertex in unvisited:
+                    for neighbor in other_edges[vertex]:
+                        if distances.get(neighbor) == level:
+                            distances[vertex] = level + 1
+                            links[vertex] = neighbor
+                            next_frontier.append(vertex)
+                            break
+                    else:
+                        continue
+                    if remaining and vertex in remaining:
+                        remaining.discard(vertex)
+                        if not remaining:
+                            break
+            else:
+                for vertex in frontier:
+                    for neighbor in scanned_edges[vertex]:
+                        if neighbor not in distances:
+                            distances[neighbor] = level + 1
+                            links[neighbor] = vertex
+                            next_frontier.append(neighbor)
+                            if remaining and neighbor in remaining:
+                                remaining.discard(neighbor)
+                                if not remaining:
+                                    break
+                    if remaining == set():
+                        break
+
+            settled += len(frontier)
+            scanned += frontier_edges
+            if len(next_frontier) > largest_frontier:
+                largest_frontier = len(next_frontier)
+            frontier = next_frontier
+            level += 1
+
+        if METRICS.enabled:
+            METRICS.record_search("forward_bfs" if forward else "backward_bfs", settled, scanned,
+                                  len(distances), settled, largest_frontier)
+        return distances, links
+
+    def dijkstra(self, start_vertex, end_vertex, method="dijkstra", heuristic=None, queue="heap"):
         """
         Finds the lowest cost walk between two vertices using Dijkstra's algorithm.
         :param start_vertex: the starting vertex
         :param end_vertex: the ending vertex
+        :param method: "dijkstra" for a single search from start_vertex, "bidirectional" for two
+                       searches (forward from start_vertex, backward from end_vertex) that meet in
+                       the middle, or "astar" for a search guided by heuristic
+        :param heuristic: for "astar", a function that takes a vertex and returns a lower bound of
+                          the cost from it to end_vertex (None means 0 everywhere)
+        :param queue: for "dijkstra", the priority queue of the frontier: "heap" (binary heap with
+                      lazy deletion), "indexed" (d-ary heap with decrease-key), "bucket" (radix
+                      heap, for non-negative integer costs) or a function that returns a new queue
+                      (see priority_queues.py)
         :return: a tuple (path, cost) where path is the list of vertices in the lowest cost walk
                  and cost is the total cost of the walk. Returns None if no path exists.
+        :raises ValueError: if the method or the queue is unknown
         """
+        if method not in ("dijkstra", "bidirectional", "astar"):
+            raise ValueError(f"Unknown shortest path method: {method}")
+        check_queue(queue)
+
         # Check if both start and end vertices exist in the graph
         if not self.is_vertex(start_vertex) or not self.is_vertex(end_vertex):
             return None  # Return None if either vertex is not in the graph
 
-        # Priority queue to store (current_cost, current_vertex)
-        # The queue ensures that the vertex with the smallest cost is processed first
-        priority_queue = [(0, start_vertex)]
+        # Vertices in components that cannot reach each other have no path between them
+        if self.__unreachable(start_vertex, end_vertex):
+            return None
+
+        # The search runs on the indices of the vertices
+        start_index = self.__index[start_vertex]
+        end_index = self.__index[end_vertex]
+
+        if method == "bidirectional":
+            return self.__bidirectional_dijkstra(start_index, end_index)
+        if method == "astar":
+            return self.__a_star(start_index, end_index, heuristic)
 
-        # Dictionary to store the minimum cost to reach each vertex
-        # Initialize all vertices with infinity cost, except the start vertex which has a cost of 0
-        dist_dict = {vertex: float('inf') for vertex in self.__vertices}
-        dist_dict[start_vertex] = 0
+        # Priority queue of the frontier, ordered by the cost to reach each vertex
+        priority_queue = make_queue(queue)
+        if METRICS.enabled:
+            priority_queue = CountingQueue(priority_queue)
+        priority_queue.push(start_index, 0)
+
+        # Dictionary to store the minimum cost found so far to reach each vertex
+        # Only the vertices reached by the search get an entry
+        dist_dict = {start_index: 0}
 
         # Dictionary to store the predecessor of each vertex
         # This is used to reconstruct the path after the algorithm finishes
-        prev_dict = {start_vertex: None}
+        prev_dict = {start_index: None}
+
+        # Vertices whose minimum cost is final; outdated queue entries for them are skipped
+        settled = set()
+
+        outbound_edges = self.__outbound_edges
 
         # Process the priority queue until it is empty
         while priority_queue:
             # Extract the vertex with the smallest cost from the queue
-            current_cost, current_vertex = heapq.heappop(priority_queue)
+            current_cost, current_vertex = priority_queue.pop()
+            if current_vertex in settled:
+                continue
 
             # If the current vertex is the end vertex, we can stop early
-            if current_vertex == end_vertex:
+            if current_vertex == end_index:
                 break
+            settled.add(current_vertex)
 
-            # Iterate through all neighbors of the current vertex
-            for neighbor in self.parse_outbound(current_vertex):
-                # Get the cost of the edge from the current vertex to the neighbor
-                cost = self.get_cost(current_vertex, neighbor)
+            # Iterate through all neighbors of the current vertex, with the costs of the edges
+            for neighbor, cost in outbound_edges[current_vertex].items():
+                if neighbor in settled:
+                    continue
 
                 # Calculate the new cost to reach the neighbor
                 new_cost = current_cost + cost
 
                 # If the new cost is smaller than the previously recorded cost for the neighbor
-                if new_cost < dist_dict[neighbor]:
-                    # Update the minimum cost to reach the neighbor
+                if neighbor not in dist_dict or new_cost < dist_dict[neighbor]:
+                    # Update the minimum cost and the predecessor of the neighbor
                     dist_dict[neighbor] = new_cost
-
-                    # Update the predecessor of the neighbor to the current vertex
                     prev_dict[neighbor] = current_vertex
 
                     # Add the neighbor to the priority queue with the updated cost
-                    heapq.heappush(priority_queue, (new_cost, neighbor))
+                    priority_queue.push(neighbor, new_cost)
 
-        # If the end vertex is unreachable (its cost is still infinity), return None
-        if dist_dict[end_vertex] == float('inf'):
+        if METRICS.enabled:
+            METRICS.record_search("dijkstra", len(settled), sum(len(outbound_edges[vertex]) for vertex in settled),
+                                  priority_queue.pushes, priority_queue.pops, priority_queue.max_size)
+
+        # If the end vertex was never reached, there is no path
+        if end_index not in dist_dict:
             return None
 
         # Reconstruct the path from the start vertex to the end vertex
         path = []
-        current_vertex = end_vertex
+        current_vertex = end_index
         while current_vertex is not None:
             # Add the current vertex to the path
-            path.append(current_vertex)
+            path.append(self.__ids[current_vertex])
 
             # Move to the predecessor of the current vertex
             current_vertex = prev_dict[current_vertex]
@@ -364,4 +1220,379 @@ class Graph:
         path.reverse()
 
         # Return the reconstructed path and the total cost of the walk
-        return path, dist_dict[end_vertex]
+        return path, dist_dict[end_index]
+
+    def k_shortest_paths(self, start_vertex, end_vertex, k=None):
+        """
+        Complexity - O(k * L * (n + m) log n) in the worst case, L being the length of the paths
+        Yields the loopless paths from start_vertex to end_vertex in order of increasing cost
+        (Yen's algorithm), lazily: the alternatives to a path are only searched for when the next
+        path is asked for. The graph is never copied: the edges and vertices that a spur search
+        must avoid are masked. One reverse search from end_vertex is reused by all spur searches,
+        both as an exact A* heuristic and, where its shortest path avoids the mask, as the spur
+        path itself. Costs must be non-negative, and the graph must not be changed while the
+        paths are generated.
+        :param start_vertex: the starting vertex
+        :param end_vertex: the ending vertex
+        :param k: the largest number of paths to yield (None for all of them)
+        :return: a generator of (path, cost) tuples, as returned by dijkstra (nothing is yielded
+                 if either vertex is not in the graph or there is no path)
+        :raises ValueError: if k is negative
+        :raises RuntimeError: (while iterating) if vertices or edges are added or removed
+        """
+        if k is not None and k < 0:
+            raise ValueError(f"The number of paths cannot be negative: {k}")
+        return self.__yen(start_vertex, end_vertex, k)
+
+    def __yen(self, start_vertex, end_vertex, k):
+        """
+        Complexity - see k_shortest_paths
+        Yen's algorithm with Lawler's rule: a candidate only gets spur searches from the vertex
+        where it deviated from its parent path on, the earlier ones were made for the parent.
+        :return: a generator of (path, cost) tuples
+        """
+        if k == 0 or not self.is_vertex(start_vertex) or not self.is_vertex(end_vertex):
+            return
+        if self.__unreachable(start_vertex, end_vertex):
+            return
+
+        modifications = self.__modifications
+        expected = modifications[0]
+        start_index = self.__index[start_vertex]
+        end_index = self.__index[end_vertex]
+        # distances to end_index (a lower bound of the cost left, whatever is masked) and the
+        # successor of every vertex on a shortest path towards it
+        remaining, next_dict = self.__reverse_dijkstra(end_index)
+        if start_index not in remaining:
+            return
+
+        # candidate paths, as (cost, order of discovery, list of indices, deviation position)
+        candidates = [(remaining[start_index], 0, self.__tree_path(start_index, next_dict), 0)]
+        discovered = {tuple(candidates[0][2])}
+        # the yielded paths, as a trie of indices: the children of the node of a prefix are the
+        # vertices that follow it in some yielded path, i.e. the edges to mask after that prefix
+        yielded_paths = {}
+        ids = self.__ids
+        outbound_edges = self.__outbound_edges
+        yielded = 0
+        while candidates:
+            cost, _, path, deviation = heapq.heappop(candidates)
+            node = yielded_paths
+            for vertex_index in path:
+                node = node.setdefault(vertex_index, {})
+            yield [ids[vertex_index] for vertex_index in path], cost
+            yielded += 1
+            if yielded == k:
+                return
+            if modifications[0] != expected:
+                raise RuntimeError("The graph changed during iteration")
+
+            node = yielded_paths
+            root_cost = 0
+            root_vertices = set()
+            for i in range(len(path) - 1):
+                spur_index = path[i]
+                node = node[spur_index]
+                if i >= deviation:
+                    spur = self.__spur_path(spur_index, end_index, root_vertices, node, remaining, next_dict)
+                    if spur is not None:
+                        spur_path, spur_cost = spur
+                        candidate = path[:i] + spur_path
+                        key = tuple(candidate)
+                        if key not in discovered:
+                            discovered.add(key)
+                            heapq.heappush(candidates, (root_cost + spur_cost, len(discovered), candidate, i))
+                root_vertices.add(spur_index)
+                root_cost += outbound_edges[spur_index][path[i + 1]]
+
+    def __reverse_dijkstra(self, end_index):
+        """
+        Complexity - O((n + m) log n)
+        Dijkstra's algorithm from end_index over the inbound edges.
+        :return: a tuple (dist_dict, next_dict) mapping every vertex that can reach end_index to
+                 the cost of a shortest path to it and to its successor on that path
+        """
+        inbound_edges = self.__inbound()
+        outbound_edges = self.__outbound_edges
+        dist_dict = {end_index: 0}
+        next_dict = {end_index: None}
+        settled = set()
+        priority_queue = [(0, end_index)]
+        while priority_queue:
+            current_cost, current_vertex = heapq.heappop(priority_queue)
+            if current_vertex in settled:
+                continue
+            settled.add(current_vertex)
+
+            for neighbor in inbound_edges[current_vertex]:
+                new_cost = current_cost + outbound_edges[neighbor][current_vertex]
+                if neighbor not in dist_dict or new_cost < dist_dict[neighbor]:
+                    dist_dict[neighbor] = new_cost
+                    next_dict[neighbor] = current_vertex
+                    heapq.heappush(priority_queue, (new_cost, neighbor))
+        return dist_dict, next_dict
+
+    @staticmethod
+    def __tree_path(vertex_index, next_dict):
+        """
+        Complexity - Theta(length of the path)
+        :return: the list of indices on the path from vertex_index to the root of next_dict
+        """
+        path = []
+        while vertex_index is not None:
+            path.append(vertex_index)
+            vertex_index = next_dict[vertex_index]
+        return path
+
+    def __spur_path(self, spur_index, end_index, masked_vertices, masked_targets, remaining, next_dict):
+        """
+        Complexity - O((n + m) log n), O(deg(spur_index) + length of the path) if the reverse tree
+        holds the path
+        Finds the cheapest path from spur_index to end_index that avoids masked_vertices and does
+        not start with an edge to one of masked_targets, with A* guided by remaining. Masking
+        edges keeps remaining a consistent lower bound, so every vertex is settled once and
+        vertices that cannot reach end_index at all are never queued. Moreover remaining is exact
+        along the reverse tree: once the search takes a vertex whose tree path avoids the masked
+        vertices, following that path is optimal and the search stops there.
+        A search over inbound edges from end_index advances one vertex per settled vertex: if it
+        runs out before meeting the spur vertex or the A* search, the mask cuts end_index off and
+        the A* search stops without exploring all that spur_index reaches.
+        :return: a tuple (list of indices on the path, cost), or None if no such path exists
+        """
+        # whether the tree path of a vertex avoids the masked vertices (and the spur vertex)
+        clear_dict = {end_index: True}
+
+        def clear(vertex_index):
+            walk = []
+            while vertex_index not in clear_dict:
+                if vertex_index == spur_index or vertex_index in masked_vertices:
+                    result = False
+                    break
+                walk.append(vertex_index)
+                vertex_index = next_dict[vertex_index]
+            else:
+                result = clear_dict[vertex_index]
+            for walked_vertex in walk:
+                clear_dict[walked_vertex] = result
+            return result
+
+        outbound_edges = self.__outbound_edges
+        inbound_edges = self.__inbound()
+        dist_dict = {spur_index: 0}
+        prev_dict = {spur_index: None}
+        settled = set()
+        priority_queue = [(remaining[spur_index], 0, spur_index)]
+        # vertices that reach end_index without going through the mask, and those of them whose
+        # sources are still to be looked at (None once a path is known to exist)
+        backward_reached = {end_index}
+        backward_stack = [end_index]
+        result = None
+        while priority_queue:
+            _, current_cost, current_vertex = heapq.heappop(priority_queue)
+            if current_vertex in settled:
+                continue
+            if current_vertex != spur_index and clear(current_vertex):
+                path = self.__tree_path(current_vertex, prev_dict)
+                path.reverse()
+                path += self.__tree_path(next_dict[current_vertex], next_dict)
+                result = path, current_cost + remaining[current_vertex]
+                break
+            settled.add(current_vertex)
+
+            for neighbor, cost in outbound_edges[current_vertex].items():
+                if (neighbor in settled or neighbor in masked_vertices or neighbor not in remaining or
+                        (current_vertex == spur_index and neighbor in masked_targets)):
+                    continue
+                new_cost = current_cost + cost
+                if neighbor not in dist_dict or new_cost < dist_dict[neighbor]:
+                    dist_dict[neighbor] = new_cost
+                    prev_dict[neighbor] = current_vertex
+                    heapq.heappush(priority_queue, (new_cost + remaining[neighbor], new_cost, neighbor))
+
+            if backward_stack is not None and current_vertex in backward_reached:
+                backward_stack = None
+            if backward_stack is not None:
+                vertex_index = backward_stack.pop()
+                for source in inbound_edges[vertex_index]:
+                    if source in backward_reached or source in masked_vertices or (
+                            source == spur_index and vertex_index in masked_targets):
+                        continue
+                    if source in settled:
+                        backward_stack = None
+                        break
+                    backward_reached.add(source)
+                    backward_stack.append(source)
+                if backward_stack is not None and not backward_stack:
+                    break
+
+        if METRICS.enabled:
+            METRICS.count("k_shortest_paths_spur_searches")
+            METRICS.count("k_shortest_paths_vertices_settled", len(settled))
+        return result
+
+    def __bidirectional_bfs(self, start_index, end_index):
+        """
+        Complexity - O(n + m)
+        Expands, one whole level at a time, the smaller of the forward frontier (from start_index,
+        over outbound edges) and the backward frontier (from end_index, over inbound edges).
+        The first level that discovers a vertex already seen by the other side holds a shortest path.
+        :return: the list of vertices on the path, or None if no path exists
+        """
+        if start_index == end_index:
+            return [self.__ids[start_index]]
+
+        forward_dist = {start_index: 0}
+        backward_dist = {end_index: 0}
+        prev_dict = {start_index: None}
+        next_dict = {end_index: None}
+        forward_frontier = [start_index]
+        backward_frontier = [end_index]
+
+        while forward_frontier and backward_frontier:
+            if len(forward_frontier) <= len(backward_frontier):
+                frontier, edges, dist, links = forward_frontier, self.__outbound_edges, forward_dist, prev_dict
+                other_dist = backward_dist
+            else:
+                frontier, edges, dist, links = backward_frontier, self.__inbound(), backward_dist, next_dict
+                other_dist = forward_dist
+
+            best_length, meeting_vertex = None, None
+            next_frontier = []
+            for current_vertex in frontier:
+                for neighbor in edges[current_vertex]:
+                    if neighbor in dist:
+                        continue
+                    dist[neighbor] = dist[current_vertex] + 1
+                    links[neighbor] = current_vertex
+                    next_frontier.append(neighbor)
+                    if neighbor in other_dist:
+                        length = dist[neighbor] + other_dist[neighbor]
+                        if best_length is None or length < best_length:
+                            best_length, meeting_vertex = length, neighbor
+
+            if meeting_vertex is not None:
+                return self.__join_paths(meeting_vertex, prev_dict, next_dict)
+
+            if frontier is forward_frontier:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
+
+        return None
+
+    def __bidirectional_dijkstra(self, start_index, end_index):
+        """
+        Complexity - O((n + m) log n)
+        Alternates a forward Dijkstra from start_index with a backward one from end_index and
+        stops once the two queue minimums together reach the cheapest connection seen so far.
+        :return: a tuple (path, cost), or None if no path exists
+        """
+        forward_dist = {start_index: 0}
+        backward_dist = {end_index: 0}
+        prev_dict = {start_index: None}
+        next_dict = {end_index: None}
+        forward_settled = set()
+        backward_settled = set()
+        forward_queue = [(0, start_index)]
+        backward_queue = [(0, end_index)]
+
+        best_cost = 0 if start_index == end_index else None
+        meeting_vertex = start_index if start_index == end_index else None
+
+        while forward_queue and backward_queue:
+            if best_cost is not None and forward_queue[0][0] + backward_queue[0][0] >= best_cost:
+                break
+
+            # expand the side with the smaller queue
+            if len(forward_queue) <= len(backward_queue):
+                queue, settled, dist, other_dist, links = forward_queue, forward_settled, forward_dist, backward_dist, prev_dict
+                forward = True
+            else:
+                queue, settled, dist, other_dist, links = backward_queue, backward_settled, backward_dist, forward_dist, next_dict
+                forward = False
+
+            current_cost, current_vertex = heapq.heappop(queue)
+            if current_vertex in settled:
+                continue
+            settled.add(current_vertex)
+
+            if forward:
+                neighbors = self.__outbound_edges[current_vertex].items()
+            else:
+                outbound_edges = self.__outbound_edges
+                neighbors = [(neighbor, outbound_edges[neighbor][current_vertex])
+                             for neighbor in self.__inbound()[current_vertex]]
+            for neighbor, cost in neighbors:
+                new_cost = current_cost + cost
+                if neighbor not in dist or new_cost < dist[neighbor]:
+                    dist[neighbor] = new_cost
+                    links[neighbor] = current_vertex
+                    heapq.heappush(queue, (new_cost, neighbor))
+                if neighbor in other_dist:
+                    total_cost = dist[neighbor] + other_dist[neighbor]
+                    if best_cost is None or total_cost < best_cost:
+                        best_cost, meeting_vertex = total_cost, neighbor
+
+        if meeting_vertex is None:
+            return None
+
+        return self.__join_paths(meeting_vertex, prev_dict, next_dict), best_cost
+
+    def __a_star(self, start_index, end_index, heuristic):
+        """
+        Complexity - O((n + m) log n) for a consistent heuristic
+        Dijkstra's algorithm ordered by cost so far plus heuristic(vertex). Vertices are reopened
+        when a cheaper walk reaches them, so an admissible heuristic is enough for an optimal result.
+        :return: a tuple (path, cost), or None if no path exists
+        """
+        ids = self.__ids
+        if heuristic is None:
+            def estimate(vertex_index):
+                return 0
+        else:
+            def estimate(vertex_index):
+                return heuristic(ids[vertex_index])
+
+        dist_dict = {start_index: 0}
+        prev_dict = {start_index: None}
+        priority_queue = [(estimate(start_index), 0, start_index)]
+        while priority_queue:
+            _, current_cost, current_vertex = heapq.heappop(priority_queue)
+            if current_cost > dist_dict[current_vertex]:
+                continue  # stale entry, the vertex was reached more cheaply since
+            if current_vertex == end_index:
+                break
+
+            for neighbor, cost in self.__outbound_edges[current_vertex].items():
+                new_cost = current_cost + cost
+                if neighbor not in dist_dict or new_cost < dist_dict[neighbor]:
+                    dist_dict[neighbor] = new_cost
+                    prev_dict[neighbor] = current_vertex
+                    heapq.heappush(priority_queue, (new_cost + estimate(neighbor), new_cost, neighbor))
+
+        if end_index not in dist_dict:
+            return None
+
+        return self.__join_paths(end_index, prev_dict, {end_index: None}), dist_dict[end_index]
+
+    def __join_paths(self, meeting_vertex, prev_dict, next_dict):
+        """
+        Complexity - Theta(length of the path)
+        Joins the forward path (start -> meeting_vertex) and the backward path (meeting_vertex -> end)
+        and translates the indices on it back to vertices
+        :return: the list of vertices on the joined path
+        """
+        path = []
+        current_vertex = meeting_vertex
+        while current_vertex is not None:
+            path.append(current_vertex)
+            current_vertex = prev_dict[current_vertex]
+        path.reverse()
+
+        current_vertex = next_dict[meeting_vertex]
+        while current_vertex is not None:
+            path.append(current_vertex)
+            current_vertex = next_dict[current_vertex]
+
+        ids = self.__ids
+        return [ids[vertex_index] for vertex_index in path]
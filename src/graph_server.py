@@ -0,0 +1,347 @@
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from src.batch_cli import READ_COMMANDS, WRITE_COMMANDS, check_command
+from src.instrumentation import METRICS
+
+# largest number of queued mutations applied together before a new snapshot is published
+MAX_WRITE_BATCH = 1024
+# number of recent latencies kept per operation for the percentiles of latency_stats
+LATENCY_WINDOW = 1024
+# longest request line accepted from a client, in bytes
+MAX_LINE = 1 << 20
+
+
+def _error_message(error):
+    """
+    Complexity - Theta(1)
+    :return: the message sent to the client for an exception raised by an operation
+    """
+    if isinstance(error, KeyError):
+        return f"Not in the graph: {error.args[0]!r}"
+    # some exceptions (MemoryError, for one) have no message
+    return str(error) or type(error).__name__
+
+
+# Local query server over a graph
+class GraphServer:
+    """
+    Serves a graph to other processes over TCP (on loopback by default) or a Unix socket, with
+    asyncio and nothing outside the standard library.
+
+    The protocol is JSON lines. Every request is an object {"id": ..., "op": ..., "args": [...]}
+    and gets an object {"id": ..., "epoch": ..., "result": ...}, or {"id": ..., "error": ...}.
+    The requests of a connection are handled concurrently, so answers may come back in another
+    order; the id (any JSON value) tells them apart. The operations are the commands of batch
+    runs (READ_COMMANDS and WRITE_COMMANDS of batch_cli.py), with the same arguments and results,
+    and "stats" returns latency_stats().
+
+    Queries never see the Graph itself: they run on a worker thread pool against the current
+    snapshot, a copy-on-write copy of the Graph (see Graph.copy_graph) that nothing modifies.
+    Mutations are queued to a single writer, which applies every mutation waiting in the queue
+    (up to MAX_WRITE_BATCH) to the Graph, then publishes a new snapshot with the next epoch number
+    and answers the batch. Taking a snapshot costs Theta(1); the next batch then copies the
+    top-level containers of the Graph (Theta(n)) and the adjacency of the vertices it changes.
+    A query therefore sees either all or none of a batch, and the epoch of its answer tells which
+    snapshot it read. Only the writer touches the Graph while the server runs, and every batch
+    that reached the Graph is published, even if some of its mutations failed.
+    Vertex ids and costs are integers in the range of 8-byte signed integers, as in binary files.
+    """
+
+    def __init__(self, graph, workers=None, max_write_batch=MAX_WRITE_BATCH):
+        """
+        Complexity - Theta(1)
+        :param graph: the graph to serve
+        :param workers: the number of threads answering queries (None for the default of
+                        ThreadPoolExecutor)
+        :param max_write_batch: the largest number of mutations applied before a new snapshot
+        """
+        self.__graph = graph
+        self.__snapshot = graph.copy_graph()
+        self.__epoch = 0
+        self.__max_write_batch = max_write_batch
+        self.__readers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="graph-reader")
+        self.__writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="graph-writer")
+        self.__write_queue = None
+        self.__writer_task = None
+        self.__server = None
+        # the writer of every open connection, with the task answering it
+        self.__connections = {}
+        # operation -> [count, total seconds, largest seconds, recent latencies]
+        self.__latencies = {}
+
+    @property
+    def epoch(self):
+        """
+        Complexity - Theta(1)
+        :return: the number of write batches published so far
+        """
+        return self.__epoch
+
+    async def start(self, host="127.0.0.1", port=0, path=None):
+        """
+        Complexity - Theta(1)
+        Starts listening and the writer task (on the running event loop).
+        :param host: the address to listen on for TCP
+        :param port: the TCP port (0 for any free port, see address)
+        :param path: the path of a Unix socket to listen on instead of TCP
+        :return: None
+        """
+        self.__write_queue = asyncio.Queue()
+        self.__writer_task = asyncio.create_task(self.__write_loop())
+        if path is not None:
+            self.__server = await asyncio.start_unix_server(self.__handle_client, path, limit=MAX_LINE)
+        else:
+            self.__server = await asyncio.start_server(self.__handle_client, host, port, limit=MAX_LINE)
+
+    @property
+    def address(self):
+        """
+        Complexity - Theta(1)
+        :return: the address the server listens on: (host, port) for TCP, the path for a Unix socket
+        """
+        return self.__server.sockets[0].getsockname()
+
+    async def serve_forever(self):
+        """
+        Complexity - Theta(1)
+        Serves until the task is cancelled, then closes the server.
+        :return: None
+        """
+        try:
+            await self.__server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """
+        Complexity - Theta(1) plus the pending mutations
+        Stops listening, lets the writer apply the mutations already queued and stops the threads.
+        :return: None
+        """
+        if self.__server is not None:
+            self.__server.close()
+            await self.__server.wait_closed()
+            self.__server = None
+        # closing the connections ends their handlers (they read the end of the stream)
+        handlers = list(self.__connections.values())
+        for writer in list(self.__connections):
+            writer.close()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        if self.__writer_task is not None:
+            await self.__write_queue.join()
+            self.__writer_task.cancel()
+            self.__writer_task = None
+        self.__readers.shutdown(wait=True)
+        self.__writer.shutdown(wait=True)
+
+    def latency_stats(self):
+        """
+        Complexity - Theta(number of operations * LATENCY_WINDOW log LATENCY_WINDOW)
+        :return: a dict mapping every operation served so far to a dict with its number of
+                 requests ("count"), their mean and largest latency and the median and 99th
+                 percentile of the last LATENCY_WINDOW latencies, in seconds
+        """
+        stats = {}
+        for operation, (count, total, largest, recent) in self.__latencies.items():
+            ordered = sorted(recent)
+            stats[operation] = {
+                "count": count,
+                "mean": total / count,
+                "max": largest,
+                "p50": ordered[len(ordered) // 2],
+                "p99": ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)],
+            }
+        return stats
+
+    async def __handle_client(self, reader, writer):
+        """
+        Complexity - that of the requests of the connection
+        Answers the requests of one connection until the client closes it.
+        :return: None
+        """
+        write_lock = asyncio.Lock()
+        tasks = set()
+        self.__connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break  # line over MAX_LINE, or connection reset
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self.__answer(line, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            del self.__connections[writer]
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def __answer(self, line, writer, write_lock):
+        """
+        Complexity - that of the request
+        Answers one request line and writes the answer.
+        :return: None
+        """
+        start_time = time.perf_counter()
+        request_id = None
+        operation = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("A request must be a JSON object")
+            request_id = request.get("id")
+            operation = request.get("op")
+            arguments = request.get("args", [])
+            if not isinstance(arguments, list):
+                raise ValueError("args must be a list")
+            answer = json.dumps({"id": request_id, **await self.__run(operation, arguments)})
+        except Exception as error:
+            # whatever failed, the client gets an answer for its id instead of waiting for ever
+            answer = json.dumps({"id": request_id, "error": _error_message(error)})
+
+        async with write_lock:
+            writer.write((answer + "\n").encode())
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+        if isinstance(operation, str) and (operation in READ_COMMANDS or operation in WRITE_COMMANDS):
+            self.__record_latency(operation, time.perf_counter() - start_time)
+
+    async def __run(self, operation, arguments):
+        """
+        Complexity - that of the operation
+        :return: a dict with the "epoch" and the "result", or with the "error"
+        :raises ValueError: if the operation is unknown or its arguments are wrong (see
+                            batch_cli.check_command)
+        """
+        if operation == "stats":
+            return {"epoch": self.__epoch, "result": self.latency_stats()}
+        # checked here, so that no mutation reaches the Graph with a value the binary formats
+        # (and the observers writing them, see journal.py) cannot store
+        check_command(operation, arguments)
+
+        if operation in WRITE_COMMANDS:
+            function = WRITE_COMMANDS[operation][2]
+            done = asyncio.get_running_loop().create_future()
+            await self.__write_queue.put((function, arguments, done))
+            return await done
+
+        function = READ_COMMANDS[operation][2]
+        # the snapshot and its epoch are read together, before any await
+        snapshot, epoch = self.__snapshot, self.__epoch
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.__readers, _call, function, snapshot,
+                                                                      arguments)
+        except Exception as error:
+            # as for mutations, whatever a read raised is its answer
+            return {"epoch": epoch, "error": _error_message(error)}
+        return {"epoch": epoch, "result": result}
+
+    async def __write_loop(self):
+        """
+        Complexity - that of the mutations, plus Theta(n) per batch (see the class)
+        The single writer: takes every mutation waiting in the queue (up to the batch size),
+        applies them in the writer thread and publishes the new snapshot.
+        :return: None (runs until cancelled)
+        """
+        loop = asyncio.get_running_loop()
+        queue = self.__write_queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.__max_write_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            try:
+                answers, snapshot = await loop.run_in_executor(self.__writer, self.__apply, batch)
+                self.__snapshot = snapshot
+                self.__epoch += 1
+                for (_, _, done), answer in zip(batch, answers):
+                    if not done.done():
+                        done.set_result({"epoch": self.__epoch, **answer})
+            except Exception as error:
+                for _, _, done in batch:
+                    if not done.done():
+                        done.set_result({"epoch": self.__epoch, "error": str(error)})
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def __apply(self, batch):
+        """
+        Complexity - that of the mutations
+        Runs in the writer thread.
+        :param batch: a list of (function, arguments, future) mutations
+        :return: a tuple (answers, snapshot): a dict with the "result" or the "error" of every
+                 mutation, and the snapshot of the graph after all of them
+        """
+        answers = []
+        for function, arguments, _ in batch:
+            try:
+                answers.append({"result": _call(function, self.__graph, arguments)})
+            except Exception as error:
+                # whatever a mutation (or an observer of the graph) raised, the changes made so
+                # far are published with the others, so readers never fall behind the graph
+                answers.append({"error": _error_message(error)})
+        return answers, self.__graph.copy_graph()
+
+    def __record_latency(self, operation, seconds):
+        """
+        Complexity - Theta(1)
+        :return: None
+        """
+        latency = self.__latencies.get(operation)
+        if latency is None:
+            latency = self.__latencies[operation] = [0, 0.0, 0.0, deque(maxlen=LATENCY_WINDOW)]
+        latency[0] += 1
+        latency[1] += seconds
+        latency[2] = max(latency[2], seconds)
+        latency[3].append(seconds)
+        if METRICS.enabled:
+            METRICS.add_time(f"server_{operation}", seconds)
+
+
+def _call(function, target, arguments):
+    """
+    Complexity - that of the function
+    :return: function(target, *arguments)
+    """
+    return function(target, *arguments)
+
+
+# Serve a graph until interrupted (as an external function)
+def run_server(graph, host="127.0.0.1", port=0, path=None, workers=None, on_start=None):
+    """
+    Complexity - runs until interrupted
+    :param graph: the graph to serve
+    :param host: the address to listen on for TCP (loopback by default)
+    :param port: the TCP port (0 for any free port)
+    :param path: the path of a Unix socket to listen on instead of TCP
+    :param workers: the number of threads answering queries
+    :param on_start: optional function called with the GraphServer once it listens
+    :return: None
+    """
+    async def serve():
+        server = GraphServer(graph, workers)
+        await server.start(host, port, path)
+        if on_start is not None:
+            on_start(server)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,199 @@
+from collections.abc import Set
+
+# Live, read-only views of the vertices and edges of a Graph (see Graph.vertices, Graph.edges and
+# Graph.neighbors). A view copies nothing: every use reads the current containers of the graph,
+# so it always shows the graph as it is. Like dict views, views are sets: they compare equal to
+# sets with the same elements and the set operators (&, |, -, ^) give new sets. Adding or
+# removing vertices or edges while a view is being iterated makes the iteration raise
+# RuntimeError (changing a cost does not).
+#
+# Every view gets from its graph:
+#   state         - a function returning (index, ids, outbound_edges, inbound_edges, edge_count),
+#                   the current containers of the graph (see Graph.__init__); inbound_edges is
+#                   None unless the function is called with True (lean graphs build it lazily)
+#   modifications - a one element list counting the changes of the structure of the graph
+
+
+def _check_unchanged(modifications, expected):
+    """
+    Complexity - Theta(1)
+    :param modifications: the change counter of the graph
+    :param expected: its value when the iteration started
+    :return: None
+    :raises RuntimeError: if the graph changed since
+    """
+    if modifications[0] != expected:
+        raise RuntimeError("The graph changed during iteration")
+
+
+class _GraphView(Set):
+    """
+    Base of the views: the set operators build plain sets, as for dict views.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        return set(iterable)
+
+
+class VertexView(_GraphView):
+    """
+    The vertices of a graph.
+    """
+
+    __slots__ = ("__state", "__modifications")
+
+    def __init__(self, state, modifications):
+        self.__state = state
+        self.__modifications = modifications
+
+    def __len__(self):
+        """
+        Complexity - Theta(1)
+        :return: the number of vertices
+        """
+        return len(self.__state()[0])
+
+    def __contains__(self, vertex):
+        """
+        Complexity - Theta(1)
+        :return: True if the vertex is in the graph, False otherwise
+        """
+        return vertex in self.__state()[0]
+
+    def __iter__(self):
+        """
+        Complexity - Theta(n) for the whole iteration
+        :return: an iterator for the vertices
+        :raises RuntimeError: (while iterating) if vertices or edges are added or removed
+        """
+        modifications = self.__modifications
+        expected = modifications[0]
+        for vertex in self.__state()[0]:
+            _check_unchanged(modifications, expected)
+            yield vertex
+        _check_unchanged(modifications, expected)
+
+
+class EdgeView(_GraphView):
+    """
+    The edges of a graph, as (start_vertex, end_vertex, cost) triples.
+    """
+
+    __slots__ = ("__state", "__modifications")
+
+    def __init__(self, state, modifications):
+        self.__state = state
+        self.__modifications = modifications
+
+    def __len__(self):
+        """
+        Complexity - Theta(1)
+        :return: the number of edges
+        """
+        return self.__state()[4]
+
+    def __contains__(self, edge):
+        """
+        Complexity - Theta(1)
+        :param edge: a (start_vertex, end_vertex, cost) triple
+        :return: True if the graph has the edge, with that cost, False otherwise
+        """
+        if not isinstance(edge, tuple) or len(edge) != 3:
+            return False
+        start_vertex, end_vertex, cost = edge
+        index, _, outbound_edges, _, _ = self.__state()
+        start_index, end_index = index.get(start_vertex), index.get(end_vertex)
+        if start_index is None or end_index is None:
+            return False
+        targets = outbound_edges[start_index]
+        return end_index in targets and targets[end_index] == cost
+
+    def __iter__(self):
+        """
+        Complexity - Theta(n + m) for the whole iteration
+        :return: an iterator for the (start_vertex, end_vertex, cost) triples
+        :raises RuntimeError: (while iterating) if vertices or edges are added or removed
+        """
+        modifications = self.__modifications
+        expected = modifications[0]
+        _, ids, outbound_edges, _, _ = self.__state()
+        for start_index, targets in enumerate(outbound_edges):
+            if targets is None:
+                continue
+            start_vertex = ids[start_index]
+            for end_index, cost in targets.items():
+                _check_unchanged(modifications, expected)
+                yield start_vertex, ids[end_index], cost
+        _check_unchanged(modifications, expected)
+
+
+class NeighborView(_GraphView):
+    """
+    The neighbours of a vertex together with the costs of the edges to them (or from them), as
+    (neighbor, cost) pairs, so that no get_cost lookup is needed per edge.
+    """
+
+    __slots__ = ("__state", "__modifications", "__vertex", "__reverse")
+
+    def __init__(self, state, modifications, vertex, reverse):
+        """
+        :param vertex: a vertex of the graph
+        :param reverse: False for the outbound edges of the vertex, True for its inbound edges
+        """
+        self.__state = state
+        self.__modifications = modifications
+        self.__vertex = vertex
+        self.__reverse = reverse
+
+    def __len__(self):
+        """
+        Complexity - Theta(1)
+        :return: the out degree (or the in degree, if reversed) of the vertex
+        :raises KeyError: if the vertex is no longer in the graph
+        """
+        index, _, outbound_edges, inbound_edges, _ = self.__state(self.__reverse)
+        edges = inbound_edges if self.__reverse else outbound_edges
+        return len(edges[index[self.__vertex]])
+
+    def __contains__(self, pair):
+        """
+        Complexity - Theta(1)
+        :param pair: a (neighbor, cost) pair
+        :return: True if there is an edge with that cost between the vertex and the neighbour (in
+                 the direction of the view), False otherwise
+        """
+        if not isinstance(pair, tuple) or len(pair) != 2:
+            return False
+        neighbor, cost = pair
+        index, _, outbound_edges, _, _ = self.__state()
+        vertex_index, neighbor_index = index.get(self.__vertex), index.get(neighbor)
+        if vertex_index is None or neighbor_index is None:
+            return False
+        if self.__reverse:
+            vertex_index, neighbor_index = neighbor_index, vertex_index
+        targets = outbound_edges[vertex_index]
+        return neighbor_index in targets and targets[neighbor_index] == cost
+
+    def __iter__(self):
+        """
+        Complexity - Theta(degree) for the whole iteration
+        :return: an iterator for the (neighbor, cost) pairs
+        :raises KeyError: if the vertex is no longer in the graph
+        :raises RuntimeError: (while iterating) if vertices or edges are added or removed
+        """
+        modifications = self.__modifications
+        expected = modifications[0]
+        index, ids, outbound_edges, inbound_edges, _ = self.__state(self.__reverse)
+        vertex_index = index[self.__vertex]
+        if self.__reverse:
+            for source in inbound_edges[vertex_index]:
+                _check_unchanged(modifications, expected)
+                yield ids[source], outbound_edges[source][vertex_index]
+        else:
+            for target, cost in outbound_edges[vertex_index].items():
+                _check_unchanged(modifications, expected)
+                yield ids[target], cost
+        _check_unchanged(modifications, expected)
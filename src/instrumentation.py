@@ -0,0 +1,227 @@
+import functools
+import json
+import time
+from contextlib import contextmanager
+
+# prefix of the metric names in the Prometheus text format
+PROMETHEUS_PREFIX = "ubb_graphs"
+
+
+# Counters and timers of the graph operations
+class Metrics:
+    """
+    Counters (summed), maxima and timers (number of calls and total seconds) by name.
+
+    Nothing is recorded while enabled is False: the instrumented operations check the flag once
+    per call and only then wrap their queues or read the clock, so the disabled cost is one
+    attribute lookup per operation. Use the instrumentation context manager (or set enabled) to
+    turn recording on.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.__counters = {}
+        self.__maxima = {}
+        self.__timers = {}
+
+    def reset(self):
+        """
+        Complexity - Theta(1)
+        Forgets everything recorded so far.
+        :return: None
+        """
+        self.__counters = {}
+        self.__maxima = {}
+        self.__timers = {}
+
+    def count(self, name, amount=1):
+        """
+        Complexity - Theta(1)
+        :param name: the name of the counter
+        :param amount: the amount to add to it
+        :return: None
+        """
+        self.__counters[name] = self.__counters.get(name, 0) + amount
+
+    def maximum(self, name, value):
+        """
+        Complexity - Theta(1)
+        :param name: the name of the maximum
+        :param value: a value that replaces the maximum if it is larger
+        :return: None
+        """
+        if value > self.__maxima.get(name, value - 1):
+            self.__maxima[name] = value
+
+    def add_time(self, name, seconds):
+        """
+        Complexity - Theta(1)
+        :param name: the name of the timer
+        :param seconds: the duration of one call
+        :return: None
+        """
+        timer = self.__timers.setdefault(name, [0, 0.0])
+        timer[0] += 1
+        timer[1] += seconds
+
+    @contextmanager
+    def timer(self, name):
+        """
+        Complexity - Theta(1)
+        Times the body of a with statement (if the metrics are enabled).
+        :param name: the name of the timer
+        """
+        if not self.enabled:
+            yield
+            return
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start_time)
+
+    def record_search(self, name, settled, edges, pushes, pops, max_size):
+        """
+        Complexity - Theta(1)
+        Records one finished search.
+        :param name: the name of the search, which prefixes its counters
+        :param settled: the number of vertices whose edges the search went through
+        :param edges: the number of edges it went through
+        :param pushes: the number of entries added to its frontier
+        :param pops: the number of entries taken from its frontier
+        :param max_size: the largest size of its frontier
+        :return: None
+        """
+        self.count(f"{name}_searches")
+        self.count(f"{name}_vertices_settled", settled)
+        self.count(f"{name}_edges_relaxed", edges)
+        self.count(f"{name}_queue_pushes", pushes)
+        self.count(f"{name}_queue_pops", pops)
+        self.maximum(f"{name}_queue_max_size", max_size)
+
+    def as_dict(self):
+        """
+        Complexity - Theta(number of metrics)
+        :return: a dict with the "counters", the "maxima" and the "timers" (each a dict with the
+                 number of "calls" and the total "seconds")
+        """
+        return {
+            "counters": dict(self.__counters),
+            "maxima": dict(self.__maxima),
+            "timers": {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in self.__timers.items()},
+        }
+
+    def to_json(self, indent=None):
+        """
+        Complexity - Theta(number of metrics)
+        :param indent: passed to json.dumps
+        :return: the metrics as a JSON document (see as_dict)
+        """
+        return json.dumps(self.as_dict(), indent=indent, sort_keys=True)
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        """
+        Complexity - Theta(number of metrics)
+        :param prefix: the prefix of every metric name
+        :return: the metrics in the Prometheus text exposition format: counters end in _total,
+                 maxima are gauges and every timer is a summary (_count and _sum in seconds)
+        """
+        lines = []
+        for name, value in sorted(self.__counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in sorted(self.__maxima.items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        for name, (calls, seconds) in sorted(self.__timers.items()):
+            lines.append(f"# TYPE {prefix}_{name}_seconds summary")
+            lines.append(f"{prefix}_{name}_seconds_count {calls}")
+            lines.append(f"{prefix}_{name}_seconds_sum {seconds!r}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+# the metrics every instrumented operation records into
+METRICS = Metrics()
+
+
+# Enable the metrics for a block of code (as an external function)
+@contextmanager
+def instrumentation(reset=True):
+    """
+    Complexity - Theta(1)
+    Enables METRICS in the body of a with statement, then puts the flag back as it was.
+    :param reset: if True, forgets what was recorded before
+    :return: a context manager giving METRICS
+    """
+    if reset:
+        METRICS.reset()
+    was_enabled = METRICS.enabled
+    METRICS.enabled = True
+    try:
+        yield METRICS
+    finally:
+        METRICS.enabled = was_enabled
+
+
+# Time every call of a function (as an external function)
+def timed(name):
+    """
+    Complexity - Theta(1)
+    :param name: the name of the timer
+    :return: a decorator that records the duration of every call in METRICS (while enabled)
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return function(*args, **kwargs)
+            start_time = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                METRICS.add_time(name, time.perf_counter() - start_time)
+        return wrapper
+    return decorator
+
+
+# Wrapper counting the operations of a frontier queue
+class CountingQueue:
+    """
+    Counts the pushes and pops of a priority queue (see priority_queues.py) and the largest
+    number of entries it held.
+    """
+
+    def __init__(self, queue):
+        """
+        :param queue: the queue to wrap, with its current entries counted as pushed
+        """
+        self.__queue = queue
+        self.pushes = len(queue)
+        self.pops = 0
+        self.max_size = len(queue)
+
+    def __len__(self):
+        """
+        Complexity - Theta(1)
+        :return: the number of entries in the wrapped queue
+        """
+        return len(self.__queue)
+
+    def push(self, vertex, priority):
+        """
+        Complexity - as the push of the wrapped queue
+        :return: None
+        """
+        self.__queue.push(vertex, priority)
+        self.pushes += 1
+        if len(self.__queue) > self.max_size:
+            self.max_size = len(self.__queue)
+
+    def pop(self):
+        """
+        Complexity - as the pop of the wrapped queue
+        :return: a (priority, vertex) pair with the lowest priority
+        """
+        self.pops += 1
+        return self.__queue.pop()
+
@@ -0,0 +1,421 @@
+import os
+import re
+import struct
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from src.binary_graph import BINARY_EXTENSION, read_binary_graph
+from src.csr_graph import fits_int64
+from src.graph import Graph
+from src.write_graph import write_graph
+
+# Journal directory layout: generation g has a snapshot "snapshot-g.bin" (a binary graph file,
+# see binary_graph.py) and a journal "journal-g.log" of the mutations made after it. A journal
+# may exist without its snapshot (the journal is rotated when a journal is opened and when a
+# checkpoint starts); the graph is then the latest snapshot followed by every later journal.
+#
+# Journal file layout (all integers little-endian):
+#   header: magic, format version, generation
+#   records: operation code, its integer arguments (8 bytes each), CRC-32 of both
+# A record cut short or failing its CRC (a crash in the middle of a write) ends the journal.
+# Version 2 added the VERTEX_COUNT record, which sets Graph.vertice_count: every journal starts
+# with one, and one follows every change after which the counter is not what replaying gives.
+MAGIC = b"UBBJ"
+VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+HEADER = struct.Struct("<4sHxxq")
+CRC = struct.Struct("<I")
+SNAPSHOT_NAME = "snapshot-{}" + BINARY_EXTENSION
+JOURNAL_NAME = "journal-{}.log"
+FILE_PATTERN = re.compile(r"(snapshot|journal)-(\d+)\.(bin|log)$")
+
+ADD_VERTEX, REMOVE_VERTEX, ADD_EDGE, REMOVE_EDGE, SET_COST, CLEAR, VERTEX_COUNT = range(7)
+# operation code -> struct of the record (before the CRC)
+RECORDS = {
+    ADD_VERTEX: struct.Struct("<Bq"),
+    REMOVE_VERTEX: struct.Struct("<Bq"),
+    ADD_EDGE: struct.Struct("<Bqqq"),
+    REMOVE_EDGE: struct.Struct("<Bqq"),
+    SET_COST: struct.Struct("<Bqqq"),
+    CLEAR: struct.Struct("<B"),
+    VERTEX_COUNT: struct.Struct("<Bq"),
+}
+
+# default number of records, and of seconds, between two fsyncs of the journal
+SYNC_RECORDS = 1024
+SYNC_SECONDS = 1.0
+
+
+# Write-ahead journal of the changes of a graph
+class MutationJournal:
+    """
+    Makes a graph durable by appending every change to a journal instead of rewriting the graph
+    file: persistence costs a few bytes per change, whatever the size of the graph.
+
+    The journal observes the graph (see Graph.add_observer). Every vertex or edge added or
+    removed, every cost change and every clear is encoded as a small binary record and buffered;
+    the buffer is written and fsynced once it holds sync_records records, by a timer at most
+    sync_seconds after its first record, and by sync. A crash loses at most the changes since the
+    last sync. The vertex count of the graph (Graph.vertice_count, which can exceed the number of
+    stored vertices) is journaled too, so a replayed graph reports the same number_of_vertices.
+
+    checkpoint compacts the journal: it takes a copy-on-write copy of the graph (Theta(1)), starts
+    a new journal generation, and writes the copy as a snapshot on a background thread, after
+    which the older snapshots and journals are deleted. open replays the latest snapshot and the
+    journals after it.
+
+    Vertices and costs must be 8-byte signed integers, as in the binary graph format: the journal
+    refuses other values before they reach the graph (see check_values).
+    """
+
+    def __init__(self, graph, directory, generation, sync_records=SYNC_RECORDS, sync_seconds=SYNC_SECONDS):
+        """
+        Use open to get a journal.
+        """
+        self.__graph = graph
+        self.__directory = directory
+        self.__generation = generation
+        self.__sync_records = sync_records
+        self.__sync_seconds = sync_seconds
+        self.__buffer = bytearray()
+        self.__pending = 0
+        # the vertice_count of the graph once the journal so far is replayed
+        self.__vertex_count = None
+        # held while the buffer or the file is used, which the sync timer does from its own thread
+        self.__lock = threading.RLock()
+        self.__timer = None
+        self.__file = None
+        self.__journal_bytes = 0
+        self.__checkpoints = ThreadPoolExecutor(max_workers=1, thread_name_prefix="graph-checkpoint")
+        self.__checkpoint = None
+        self.__open_generation(generation)
+        graph.add_observer(self)
+
+    @classmethod
+    def open(cls, directory, graph=None, sync_records=SYNC_RECORDS, sync_seconds=SYNC_SECONDS):
+        """
+        Complexity - Theta(n + m + number of journaled changes)
+        Opens the journal directory: rebuilds the graph from the latest snapshot and the journals
+        after it, or, if the directory holds no journal, starts one for graph (written as the
+        first snapshot). From then on every change of the graph is journaled.
+        :param directory: the journal directory (created if needed)
+        :param graph: the graph to start a new journal with (None for an empty graph); must be
+                      None if the directory already holds a journal
+        :param sync_records: the number of records written between two fsyncs
+        :param sync_seconds: the longest time a change waits in the buffer before it is fsynced
+        :return: the MutationJournal (its graph property gives the graph)
+        :raises ValueError: if the directory holds a journal and a graph is given, or a journal
+                            file is not valid
+        """
+        os.makedirs(directory, exist_ok=True)
+        snapshots, journals = _generations(directory)
+        if not snapshots and not journals:
+            if graph is None:
+                graph = Graph()
+            write_graph(graph, os.path.join(directory, SNAPSHOT_NAME.format(0)), atomic=True)
+            return cls(graph, directory, 0, sync_records, sync_seconds)
+
+        if graph is not None:
+            raise ValueError(f"{directory} already holds a journal")
+        base = max(snapshots) if snapshots else None
+        if base is None:
+            graph = Graph()
+            base = min(journals)
+        else:
+            graph = read_binary_graph(os.path.join(directory, SNAPSHOT_NAME.format(base))).to_graph()
+        for generation in sorted(journals):
+            if generation >= base:
+                replay(os.path.join(directory, JOURNAL_NAME.format(generation)), graph)
+
+        # appends go to a new generation, so a torn record at the end of the last journal stays last
+        return cls(graph, directory, max([base, *journals]) + 1, sync_records, sync_seconds)
+
+    @property
+    def graph(self):
+        """
+        Complexity - Theta(1)
+        :return: the journaled graph
+        """
+        return self.__graph
+
+    @property
+    def generation(self):
+        """
+        Complexity - Theta(1)
+        :return: the generation of the journal appended to
+        """
+        return self.__generation
+
+    @property
+    def journal_bytes(self):
+        """
+        Complexity - Theta(1)
+        :return: the size of the current journal, including the records not written yet (a
+                 checkpoint is worth it once this is large compared to the graph)
+        """
+        return self.__journal_bytes + len(self.__buffer)
+
+    def sync(self):
+        """
+        Complexity - Theta(size of the buffered records)
+        Writes the buffered records and fsyncs the journal.
+        :return: None
+        """
+        with self.__lock:
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+            self.__record_vertex_count()
+            if self.__buffer:
+                self.__file.write(self.__buffer)
+                self.__journal_bytes += len(self.__buffer)
+                self.__buffer = bytearray()
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+            self.__pending = 0
+
+    def checkpoint(self, wait=False):
+        """
+        Complexity - Theta(1) here, Theta(n log n + m log m) on the background thread
+        Starts a new journal generation and writes a snapshot of the graph as it is now, in the
+        background. Once the snapshot is complete, the older snapshots and journals are deleted.
+        Must not be called from inside a change of the graph (an observer method). A checkpoint
+        still running is waited for first.
+        :param wait: if True, wait until the snapshot is written
+        :return: a Future of the checkpoint (its result is the new generation)
+        """
+        if self.__checkpoint is not None:
+            self.__checkpoint.result()
+
+        with self.__lock:
+            self.sync()
+            self.__file.close()
+            generation = self.__generation + 1
+            self.__open_generation(generation)
+        self.__checkpoint = self.__checkpoints.submit(self.__write_snapshot, self.__graph.copy_graph(), generation)
+        if wait:
+            self.__checkpoint.result()
+        return self.__checkpoint
+
+    def close(self):
+        """
+        Complexity - Theta(size of the buffered records), plus a running checkpoint
+        Syncs the journal, waits for a running checkpoint and stops journaling the graph.
+        :return: None
+        """
+        self.__graph.remove_observer(self)
+        with self.__lock:
+            if self.__file is not None:
+                self.sync()
+                self.__file.close()
+                self.__file = None
+        self.__checkpoints.shutdown(wait=True)
+        if self.__checkpoint is not None:
+            self.__checkpoint.result()
+
+    def check_values(self, *values):
+        """
+        Complexity - Theta(number of values)
+        Called by the graph before it adds vertices or edges or changes a cost (see
+        Graph.add_observer), so that nothing the journal cannot store reaches the graph.
+        :param values: the new vertices and costs
+        :return: None
+        :raises ValueError: if a value is not an 8-byte signed integer
+        """
+        for value in values:
+            if not fits_int64(value):
+                raise ValueError(f"The journal only stores 8-byte signed integers, not {value!r}")
+
+    # Update methods, called by the graph after it has changed (see Graph.add_observer)
+    def vertex_added(self, vertex):
+        """
+        Complexity - Theta(1) amortized
+        :return: None
+        """
+        self.__append(ADD_VERTEX, vertex)
+
+    def vertex_removed(self, vertex):
+        """
+        Complexity - Theta(1) amortized
+        :return: None
+        """
+        self.__append(REMOVE_VERTEX, vertex)
+
+    def edge_added(self, start_vertex, end_vertex, cost):
+        """
+        Complexity - Theta(1) amortized
+        :return: None
+        """
+        self.__append(ADD_EDGE, start_vertex, end_vertex, cost)
+
+    def edge_removed(self, start_vertex, end_vertex):
+        """
+        Complexity - Theta(1) amortized
+        :return: None
+        """
+        self.__append(REMOVE_EDGE, start_vertex, end_vertex)
+
+    def cost_changed(self, start_vertex, end_vertex, old_cost, new_cost):
+        """
+        Complexity - Theta(1) amortized
+        :return: None
+        """
+        self.__append(SET_COST, start_vertex, end_vertex, new_cost)
+
+    def graph_cleared(self):
+        """
+        Complexity - Theta(1) amortized
+        :return: None
+        """
+        self.__append(CLEAR)
+
+    def __append(self, operation, *arguments):
+        """
+        Complexity - Theta(1) amortized
+        Buffers one record (with the vertex count, if replaying would get it wrong), and syncs
+        if enough records went by or starts the timer that syncs them.
+        :return: None
+        """
+        with self.__lock:
+            self.__buffer_record(operation, *arguments)
+            if operation == REMOVE_VERTEX:
+                self.__vertex_count -= 1  # as Graph.remove_vertex does
+            self.__record_vertex_count()
+            if self.__pending >= self.__sync_records:
+                self.sync()
+            elif self.__timer is None:
+                self.__timer = threading.Timer(self.__sync_seconds, self.__sync_on_time)
+                self.__timer.daemon = True
+                self.__timer.start()
+
+    def __buffer_record(self, operation, *arguments):
+        """
+        Complexity - Theta(1) amortized
+        :return: None
+        """
+        record = RECORDS[operation].pack(operation, *arguments)
+        self.__buffer += record
+        self.__buffer += CRC.pack(zlib.crc32(record))
+        self.__pending += 1
+
+    def __record_vertex_count(self):
+        """
+        Complexity - Theta(1)
+        Buffers a VERTEX_COUNT record if the vertice_count of the graph is not the one replaying
+        the journal gives (it was set directly, e.g. by read_graph, or the journal just started).
+        :return: None
+        """
+        vertex_count = self.__graph.vertice_count
+        if vertex_count != self.__vertex_count:
+            self.__buffer_record(VERTEX_COUNT, vertex_count)
+            self.__vertex_count = vertex_count
+
+    def __sync_on_time(self):
+        """
+        Complexity - Theta(size of the buffered records)
+        Runs on the timer thread: syncs the records still buffered.
+        :return: None
+        """
+        with self.__lock:
+            if self.__file is not None and self.__pending:
+                self.sync()
+
+    def __open_generation(self, generation):
+        """
+        Complexity - Theta(1)
+        Starts the journal of a generation.
+        :return: None
+        """
+        self.__generation = generation
+        self.__file = open(os.path.join(self.__directory, JOURNAL_NAME.format(generation)), "wb")
+        self.__file.write(HEADER.pack(MAGIC, VERSION, generation))
+        self.__journal_bytes = HEADER.size
+        # the snapshot of the generation only holds number_of_vertices, so the journal starts
+        # with the exact counter
+        self.__vertex_count = None
+        self.sync()
+
+    def __write_snapshot(self, graph, generation):
+        """
+        Complexity - Theta(n log n + m log m)
+        Runs on the checkpoint thread: writes the snapshot of a generation, then deletes the
+        files of the older generations.
+        :param graph: a copy of the graph at the start of the generation
+        :return: the generation
+        """
+        write_graph(graph, os.path.join(self.__directory, SNAPSHOT_NAME.format(generation)), atomic=True)
+        snapshots, journals = _generations(self.__directory)
+        for older in snapshots:
+            if older < generation:
+                os.remove(os.path.join(self.__directory, SNAPSHOT_NAME.format(older)))
+        for older in journals:
+            if older < generation:
+                os.remove(os.path.join(self.__directory, JOURNAL_NAME.format(older)))
+        return generation
+
+
+def _generations(directory):
+    """
+    Complexity - Theta(number of files in the directory)
+    :return: a tuple (snapshots, journals) of the lists of the generations with a file of that kind
+    """
+    snapshots, journals = [], []
+    for file_name in os.listdir(directory):
+        match = FILE_PATTERN.match(file_name)
+        if match is not None and (match.group(1) == "snapshot") == (match.group(3) == "bin"):
+            (snapshots if match.group(1) == "snapshot" else journals).append(int(match.group(2)))
+    return snapshots, journals
+
+
+# Apply the changes of a journal file to a graph (as an external function)
+def replay(file_name, graph):
+    """
+    Complexity - Theta(number of records)
+    Applies the records of a journal file to a graph, in order, up to the end of the file or to
+    the first record that is cut short or fails its CRC.
+    :param file_name: the name of the journal file
+    :param graph: the graph to apply the changes to
+    :return: the number of records applied
+    :raises ValueError: if the file is not a journal file of a supported version
+    """
+    with open(file_name, "rb") as input_file:
+        data = input_file.read()
+
+    if len(data) < HEADER.size:
+        raise ValueError(f"{file_name} is not a journal file")
+    magic, version, _ = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{file_name} is not a journal file")
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"{file_name} has unsupported journal version {version}")
+
+    applied = 0
+    position = HEADER.size
+    while position < len(data):
+        record_struct = RECORDS.get(data[position])
+        end = position + (record_struct.size if record_struct is not None else 0)
+        if record_struct is None or end + CRC.size > len(data):
+            break
+        (crc,) = CRC.unpack_from(data, end)
+        if zlib.crc32(data[position:end]) != crc:
+            break
+        operation, *arguments = record_struct.unpack_from(data, position)
+        position = end + CRC.size
+
+        if operation == ADD_VERTEX:
+            graph.add_vertex(*arguments)
+        elif operation == REMOVE_VERTEX:
+            graph.remove_vertex(*arguments)
+        elif operation == ADD_EDGE:
+            graph.add_edge(*arguments)
+        elif operation == REMOVE_EDGE:
+            graph.remove_edge(*arguments)
+        elif operation == SET_COST:
+            graph.modify_cost(tuple(arguments[:2]), arguments[2])
+        elif operation == VERTEX_COUNT:
+            graph.vertice_count = arguments[0]
+        else:
+            graph.clear_graph()
+        applied += 1
+    return applied
@@ -1,10 +1,58 @@
+import argparse
+import sys
+
+from src.batch_cli import run_batch
 from src.graph import Graph
+from src.graph_server import run_server
 from src.random_graph import generate_random_graph
 from src.read_graph import read_graph
 from src.ui import UI
 
+
+def parse_arguments(arguments=None):
+    """
+    :param arguments: the command line arguments (None for sys.argv)
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Explore a directed graph with the menu, or answer a batch of "
+                                                 "commands as JSON lines.")
+    parser.add_argument("graph_file", nargs="?", default="input",
+                        help="the graph file to load (text, compressed or binary; default: input)")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="COMMAND_FILE",
+                        help="answer the commands of COMMAND_FILE (standard input if omitted or -) instead of "
+                             "starting the menu, see batch_cli.py")
+    parser.add_argument("--output", default="-", help="the file to write the answers to (default: standard output)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes for the path queries of a batch, or threads for the queries of the "
+                             "server (0 for one per CPU; default: 1)")
+    parser.add_argument("--serve", action="store_true",
+                        help="serve the graph to other processes instead of starting the menu, see graph_server.py")
+    parser.add_argument("--host", default="127.0.0.1", help="the address to serve on (default: loopback)")
+    parser.add_argument("--port", type=int, default=0, help="the TCP port to serve on (default: any free port)")
+    parser.add_argument("--unix-socket", metavar="PATH", help="serve on a Unix socket instead of TCP")
+    parser.add_argument("--lean", action="store_true",
+                        help="store the graph in the memory-lean layout (inbound edges built on first use)")
+    return parser.parse_args(arguments)
+
+
 if __name__ == "__main__":
-    initial_graph = Graph()
-    read_graph(initial_graph, "input")
-    ui = UI(initial_graph)
-    ui.run()
+    options = parse_arguments()
+    initial_graph = Graph(lean=options.lean)
+    read_graph(initial_graph, options.graph_file)
+    if options.serve:
+        run_server(initial_graph, options.host, options.port, options.unix_socket, options.workers or None,
+                   on_start=lambda server: print(f"Serving on {server.address}", flush=True))
+    elif options.batch is None:
+        ui = UI(initial_graph)
+        ui.run()
+    else:
+        commands = sys.stdin if options.batch == "-" else open(options.batch)
+        output = sys.stdout if options.output == "-" else open(options.output, "w")
+        try:
+            failed = run_batch(initial_graph, commands, output, workers=options.workers or None)
+        finally:
+            if commands is not sys.stdin:
+                commands.close()
+            if output is not sys.stdout:
+                output.close()
+        sys.exit(1 if failed else 0)
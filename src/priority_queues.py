@@ -0,0 +1,260 @@
+import heapq
+
+
+# Priority queues for the frontier of Dijkstra's algorithm.
+# Every queue has the same interface:
+#   push(vertex, priority) - inserts the vertex, or lowers its priority if it is already queued
+#   pop()                  - removes and returns a (priority, vertex) pair with the lowest priority
+#   len(queue)             - the number of queued entries (False when empty)
+# HeapQueue and BucketQueue may return a vertex again after a lower priority was pushed for it
+# (with its older, higher priority), so callers skip vertices they have already settled.
+class HeapQueue:
+    """
+    Binary heap (heapq) with lazy deletion: a lower priority is pushed as a new entry and the
+    older entry stays in the heap until it is popped.
+    """
+
+    def __init__(self):
+        self.__heap = []
+
+    def __len__(self):
+        """
+        Complexity - Theta(1)
+        :return: the number of entries in the heap, including outdated ones
+        """
+        return len(self.__heap)
+
+    def push(self, vertex, priority):
+        """
+        Complexity - O(log size)
+        :param vertex: the vertex to queue
+        :param priority: the priority of the vertex
+        :return: None
+        """
+        heapq.heappush(self.__heap, (priority, vertex))
+
+    def pop(self):
+        """
+        Complexity - O(log size)
+        :return: a (priority, vertex) pair with the lowest priority
+        :raises IndexError: if the queue is empty
+        """
+        return heapq.heappop(self.__heap)
+
+
+class IndexedHeapQueue:
+    """
+    d-ary heap that knows the position of every vertex, so a lower priority moves the vertex up
+    in place (decrease-key) instead of adding an entry. Every vertex is in the heap at most once.
+    """
+
+    def __init__(self, arity=4):
+        """
+        :param arity: the number of children of every node of the heap (at least 2)
+        :raises ValueError: if the arity is smaller than 2
+        """
+        if arity < 2:
+            raise ValueError(f"The arity of the heap must be at least 2, not {arity}")
+        self.__arity = arity
+        self.__vertices = []
+        self.__priorities = []
+        self.__positions = {}
+
+    def __len__(self):
+        """
+        Complexity - Theta(1)
+        :return: the number of vertices in the heap
+        """
+        return len(self.__vertices)
+
+    def __contains__(self, vertex):
+        """
+        Complexity - Theta(1)
+        :return: True if the vertex is in the heap, False otherwise
+        """
+        return vertex in self.__positions
+
+    def push(self, vertex, priority):
+        """
+        Complexity - O(log_d size)
+        Inserts the vertex, or lowers its priority if it is in the heap. A priority that is not
+        lower than the current one is ignored.
+        :param vertex: the vertex to queue
+        :param priority: the priority of the vertex
+        :return: None
+        """
+        position = self.__positions.get(vertex)
+        if position is None:
+            position = len(self.__vertices)
+            self.__vertices.append(vertex)
+            self.__priorities.append(priority)
+        elif priority < self.__priorities[position]:
+            self.__priorities[position] = priority
+        else:
+            return
+        self.__sift_up(position, vertex, priority)
+
+    def pop(self):
+        """
+        Complexity - O(d log_d size)
+        :return: the (priority, vertex) pair with the lowest priority
+        :raises IndexError: if the queue is empty
+        """
+        vertices = self.__vertices
+        priorities = self.__priorities
+        vertex, priority = vertices[0], priorities[0]
+        del self.__positions[vertex]
+
+        last_vertex, last_priority = vertices.pop(), priorities.pop()
+        if vertices:
+            self.__sift_down(0, last_vertex, last_priority)
+        return priority, vertex
+
+    def __sift_up(self, position, vertex, priority):
+        """
+        Complexity - O(log_d size)
+        Moves the parents with a higher priority down until the vertex fits at position.
+        :return: None
+        """
+        vertices = self.__vertices
+        priorities = self.__priorities
+        positions = self.__positions
+        arity = self.__arity
+        while position > 0:
+            parent = (position - 1) // arity
+            if priorities[parent] <= priority:
+                break
+            vertices[position] = vertices[parent]
+            priorities[position] = priorities[parent]
+            positions[vertices[position]] = position
+            position = parent
+        vertices[position] = vertex
+        priorities[position] = priority
+        positions[vertex] = position
+
+    def __sift_down(self, position, vertex, priority):
+        """
+        Complexity - O(d log_d size)
+        Moves the children with the lowest priority up until the vertex fits at position.
+        :return: None
+        """
+        vertices = self.__vertices
+        priorities = self.__priorities
+        positions = self.__positions
+        arity = self.__arity
+        size = len(vertices)
+        while True:
+            first_child = position * arity + 1
+            if first_child >= size:
+                break
+            best_child = first_child
+            for child in range(first_child + 1, min(first_child + arity, size)):
+                if priorities[child] < priorities[best_child]:
+                    best_child = child
+            if priorities[best_child] >= priority:
+                break
+            vertices[position] = vertices[best_child]
+            priorities[position] = priorities[best_child]
+            positions[vertices[position]] = position
+            position = best_child
+        vertices[position] = vertex
+        priorities[position] = priority
+        positions[vertex] = position
+
+
+class BucketQueue:
+    """
+    Radix heap (a bucket queue in the spirit of Dial's algorithm) for non-negative integer
+    priorities that are popped in non-decreasing order, as in Dijkstra's algorithm with
+    non-negative integer costs.
+    Entries are kept in buckets by the highest bit in which their priority differs from the last
+    popped one: bucket 0 holds the entries with exactly that priority, bucket b those that differ
+    from it first at bit b - 1. There is one bucket per bit of the largest priority, not one per
+    priority, so large costs (up to 2^63 in binary files) cost no memory. When bucket 0 is empty,
+    the lowest non-empty bucket is split into the lower ones around its smallest priority; an
+    entry only ever moves to lower buckets, so every entry is moved O(log largest priority) times.
+    Lower priorities are pushed as new entries, like HeapQueue.
+    """
+
+    def __init__(self):
+        # bucket b holds (priority, vertex) entries
+        self.__buckets = [[]]
+        self.__last = 0
+        self.__size = 0
+
+    def __len__(self):
+        """
+        Complexity - Theta(1)
+        :return: the number of entries in the buckets, including outdated ones
+        """
+        return self.__size
+
+    def push(self, vertex, priority):
+        """
+        Complexity - Theta(1) amortized
+        :param vertex: the vertex to queue
+        :param priority: the priority of the vertex
+        :return: None
+        :raises ValueError: if the priority is not an integer, or is lower than the last popped one
+        """
+        if not isinstance(priority, int) or priority < self.__last:
+            raise ValueError(f"A bucket queue needs integer priorities of at least {self.__last}, not {priority}")
+        buckets = self.__buckets
+        bucket = (priority ^ self.__last).bit_length()
+        if bucket >= len(buckets):
+            buckets.extend([] for _ in range(bucket + 1 - len(buckets)))
+        buckets[bucket].append((priority, vertex))
+        self.__size += 1
+
+    def pop(self):
+        """
+        Complexity - O(log largest priority) amortized
+        :return: a (priority, vertex) pair with the lowest priority
+        :raises IndexError: if the queue is empty
+        """
+        if not self.__size:
+            raise IndexError("pop from an empty bucket queue")
+        buckets = self.__buckets
+        if not buckets[0]:
+            bucket = 1
+            while not buckets[bucket]:
+                bucket += 1
+            entries = buckets[bucket]
+            buckets[bucket] = []
+            last = self.__last = min(entry[0] for entry in entries)
+            for entry in entries:
+                buckets[(entry[0] ^ last).bit_length()].append(entry)
+        self.__size -= 1
+        return buckets[0].pop()
+
+
+# the queues that can be chosen by name in Graph.dijkstra
+QUEUES = {
+    "heap": HeapQueue,
+    "indexed": IndexedHeapQueue,
+    "bucket": BucketQueue,
+}
+
+
+def check_queue(queue):
+    """
+    Complexity - Theta(1)
+    :param queue: the name of a queue in QUEUES, or a function that returns a new, empty queue
+    :return: None
+    :raises ValueError: if the name is unknown
+    """
+    if not callable(queue) and queue not in QUEUES:
+        raise ValueError(f"Unknown priority queue: {queue}")
+
+
+def make_queue(queue):
+    """
+    Complexity - Theta(1)
+    :param queue: the name of a queue in QUEUES, or a function that returns a new, empty queue
+    :return: a new, empty queue
+    :raises ValueError: if the name is unknown
+    """
+    check_queue(queue)
+    if callable(queue):
+        return queue()
+    return QUEUES[queue]()
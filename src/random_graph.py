@@ -3,32 +3,52 @@ from src.graph import Graph
 
 
 # Create a random graph with specified number of vertices and of edges (as an external function)
-def generate_random_graph(number_of_vertices, number_of_edges):
+def generate_random_graph(number_of_vertices, number_of_edges, seed=None, min_cost=0, max_cost=100):
     """
-    Complexity - O(n^2)
-
-    https://wiki.python.org/moin/TimeComplexity
-        - the time complexity of set() is O(n)
-        - the time complexity of accessing an element is in a dict is O(1)
+    Complexity - O(m) for m <= n^2 / 2, O(n^2) above that
 
     Generate a random graph with a specified number of vertices and of edges.
     If the number of edges is greater than the maximum possible number of edges,
     the graph will have the maximum number of edges.
 
+    Every edge (start, end) is numbered start * n + end, and the edges are drawn as distinct
+    numbers in batches. When more than half of the n^2 possible edges are wanted, the edges
+    left out are drawn instead, so the number of draws never exceeds n^2 / 2. The graph is built
+    with a single Graph.add_edges call.
+
     :param number_of_vertices: the number of vertices
     :param number_of_edges: the number of edges
+    :param seed: the seed of the random number generator (None for a random seed)
+    :param min_cost: the smallest possible cost of an edge
+    :param max_cost: the largest possible cost of an edge (costs are uniform in [min_cost, max_cost])
     :return: the generated graph
     """
+    generator = random.Random(seed)
     graph = Graph(number_of_vertices)
-    edge_counter = 0
     max_edges = number_of_vertices ** 2
+    number_of_edges = min(number_of_edges, max_edges)
 
-    while edge_counter < number_of_edges and edge_counter < max_edges:
-        start_vertex = random.randint(0, number_of_vertices - 1)
-        end_vertex = random.randint(0, number_of_vertices - 1)
-        if not graph.is_edge(start_vertex, end_vertex):
-            cost = random.randint(0, 100)
-            graph.add_edge(start_vertex, end_vertex, cost)
-            edge_counter += 1
+    if number_of_edges <= max_edges // 2:
+        edge_numbers = _distinct_numbers(generator, max_edges, number_of_edges)
+    else:
+        left_out = _distinct_numbers(generator, max_edges, max_edges - number_of_edges)
+        edge_numbers = [number for number in range(max_edges) if number not in left_out]
+
+    costs = generator.choices(range(min_cost, max_cost + 1), k=number_of_edges)
+    graph.add_edges((*divmod(number, number_of_vertices), cost) for number, cost in zip(edge_numbers, costs))
 
     return graph
+
+
+def _distinct_numbers(generator, upper_bound, count):
+    """
+    Complexity - O(count), as long as count <= upper_bound / 2
+    Draws distinct numbers from range(upper_bound) in batches, topping up the duplicates of
+    each batch with a smaller one.
+    :return: a set of count distinct numbers
+    """
+    numbers = set()
+    population = range(upper_bound)
+    while len(numbers) < count:
+        numbers.update(generator.choices(population, k=count - len(numbers)))
+    return numbers
@@ -1,19 +1,91 @@
+import os
+
+from src.binary_graph import is_binary_graph_file, read_binary_graph
+from src.file_compression import wrap_file
+from src.instrumentation import timed
+
+# size of the blocks read from the file by read_graph
+CHUNK_SIZE = 1 << 20
+
+
 # Read the graph from a text file (as an external function)
-def read_graph(graph, file_name):
+@timed("read_graph")
+def read_graph(graph, file_name, progress=None, chunk_size=CHUNK_SIZE):
     """
     Complexity - O(m)
     Read the graph from a text file.
+    The file is streamed in binary blocks of chunk_size bytes and every block is parsed and
+    inserted (through Graph.add_edges) before the next one is read, so only one block of text
+    is held in memory at a time, whatever the size of the file. Files ending in .gz, .bz2, .xz
+    or .zst are decompressed on the fly.
+    Binary graph files (see binary_graph.py) are detected by their magic bytes and loaded
+    from their memory-mapped snapshot instead.
     :param graph: the graph to be read
     :param file_name: the name of the file
+    :param progress: optional function called after every block with (bytes_read, total_bytes),
+                     counted in bytes of the file on disk
+    :param chunk_size: the number of bytes read at a time
     :return: None
+    :raises ValueError: if the file is empty or ends in the middle of an edge
+    """
+    if is_binary_graph_file(file_name):
+        snapshot = read_binary_graph(file_name)
+        graph.clear_graph()
+        for vertex in snapshot.parse_vertices():
+            graph.add_vertex(vertex)
+        graph.add_edges(snapshot.get_edges_with_costs())
+        graph.vertice_count = snapshot.number_of_vertices
+        return
+
+    total_bytes = os.path.getsize(file_name)
+    with open(file_name, "rb") as raw_file, wrap_file(raw_file, file_name, "rb") as input_file:
+        tokens = _parse_integers(input_file, raw_file, total_bytes, progress, chunk_size)
+        first_line = [next(tokens, None), next(tokens, None)]
+        if first_line[0] is None:
+            raise ValueError(f"{file_name} is empty")
+
+        graph.clear_graph()
+        graph.vertice_count = first_line[0]
+        graph.add_edges(_triples(tokens, file_name))
+
+
+def _parse_integers(input_file, raw_file, total_bytes, progress, chunk_size):
+    """
+    Complexity - O(size of the file)
+    Splits the file into integers, block by block. A number cut by the end of a block is kept
+    and glued to the start of the next block.
+    :return: an iterator for the integers in the file
     """
-    with open(file_name) as input_file:
-        lines = input_file.readlines()
+    leftover = b""
+    while True:
+        chunk = input_file.read(chunk_size)
+        if not chunk:
+            break
+
+        chunk = leftover + chunk
+        tokens = chunk.split()
+        if tokens and not chunk[-1:].isspace():
+            leftover = tokens.pop()
+        else:
+            leftover = b""
+
+        yield from map(int, tokens)
+        if progress is not None:
+            progress(raw_file.tell(), total_bytes)
 
-    graph.clear_graph()
-    first_line = lines[0].split()
-    graph.vertice_count = int(first_line[0])
+    if leftover:
+        yield int(leftover)
 
-    for line in lines[1:]:
-        start_vertex, end_vertex, cost = map(int, line.split())
-        graph.add_edge(start_vertex, end_vertex, cost)
+
+def _triples(tokens, file_name):
+    """
+    Complexity - O(m)
+    Groups the integers after the first line into (start_vertex, end_vertex, cost) edges.
+    :return: an iterator for the edges
+    """
+    for start_vertex in tokens:
+        end_vertex = next(tokens, None)
+        cost = next(tokens, None)
+        if cost is None:
+            raise ValueError(f"{file_name} ends in the middle of an edge")
+        yield start_vertex, end_vertex, cost
@@ -0,0 +1,88 @@
+# Result of a single-source shortest path search, reusable for any target
+class ShortestPathTree:
+    """
+    Distances and tree links computed by one search from a root vertex.
+
+    For a forward tree, parents[v] is the predecessor of v on a shortest path from the root to v.
+    For a reverse tree (searched over inbound edges), parents[v] is the successor of v on a
+    shortest path from v to the root. The root maps to None.
+    """
+
+    def __init__(self, root, distances, parents, reverse=False):
+        self.__root = root
+        self.__distances = distances
+        self.__parents = parents
+        self.__reverse = reverse
+
+    @property
+    def root(self):
+        """
+        Complexity - Theta(1)
+        :return: the vertex the search started from
+        """
+        return self.__root
+
+    @property
+    def reverse(self):
+        """
+        Complexity - Theta(1)
+        :return: True if the tree holds paths towards the root, False if it holds paths from it
+        """
+        return self.__reverse
+
+    def __len__(self):
+        """
+        Complexity - Theta(1)
+        :return: the number of vertices reached by the search
+        """
+        return len(self.__distances)
+
+    def __contains__(self, vertex):
+        """
+        Complexity - Theta(1)
+        :return: True if the vertex was reached by the search, False otherwise
+        """
+        return vertex in self.__distances
+
+    def reached_vertices(self):
+        """
+        Complexity - Theta(1)
+        :return: an iterator for the vertices reached by the search
+        """
+        return iter(self.__distances)
+
+    def distance(self, vertex):
+        """
+        Complexity - Theta(1)
+        :param vertex: the vertex to get the distance of
+        :return: the distance between the root and the vertex, or None if it was not reached
+        """
+        return self.__distances.get(vertex)
+
+    def parent(self, vertex):
+        """
+        Complexity - Theta(1)
+        :param vertex: a reached vertex
+        :return: the next vertex towards the root, or None for the root itself
+        """
+        return self.__parents[vertex]
+
+    def path(self, vertex):
+        """
+        Complexity - Theta(length of the path)
+        :param vertex: the vertex at the other end of the path
+        :return: the list of vertices on the path (from the root for a forward tree, towards the
+                 root for a reverse tree), or None if the vertex was not reached
+        """
+        if vertex not in self.__distances:
+            return None
+
+        path = []
+        current_vertex = vertex
+        while current_vertex is not None:
+            path.append(current_vertex)
+            current_vertex = self.__parents[current_vertex]
+
+        if not self.__reverse:
+            path.reverse()
+        return path
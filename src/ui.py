@@ -1,5 +1,6 @@
 import os
 
+from src.instrumentation import METRICS
 from src.random_graph import generate_random_graph
 from src.read_graph import read_graph
 from src.write_graph import write_graph
@@ -21,6 +22,8 @@ COPY_GRAPH = "12"
 CHANGE_GRAPH = "13"
 BACKWARD_BFS = "14"
 DIJKSTRA = "15"
+METRICS_MENU = "16"
+K_SHORTEST_PATHS = "17"
 
 
 class UI:
@@ -46,6 +49,8 @@ class UI:
         print("13. Change graph")
         print("14. Find shortest path using backward BFS")
         print("15. Find lowest cost path using Dijkstra's algorithm")
+        print("16. Operation metrics")
+        print("17. Find the k lowest cost paths (Yen's algorithm)")
         print("0. Exit")
         print("--------------------")
 
@@ -198,7 +203,7 @@ class UI:
 
 
                 elif option == WRITE_GRAPH:
-                    filename = input("Enter filename to write to: ")
+                    filename = input("Enter filename to write to (.bin for the binary format): ")
                     write_graph(self.__graph, filename)
 
                 elif option == RANDOM_GRAPH:
@@ -218,7 +223,11 @@ class UI:
                     start_vertex = int(input("Start vertex: "))
                     end_vertex = int(input("End vertex: "))
                     if self.__graph.is_vertex(start_vertex) and self.__graph.is_vertex(end_vertex):
-                        path = self.__graph.backward_bfs(start_vertex, end_vertex)
+                        option = input("1. Backward BFS\n2. Bidirectional BFS\n>>> ")
+                        if option not in ("1", "2"):
+                            print("Invalid option!")
+                            continue
+                        path = self.__graph.backward_bfs(start_vertex, end_vertex, bidirectional=option == "2")
                         if path is not None:
                             print(f"Path from {start_vertex} to {end_vertex}: {path}, length: {len(path) - 1}")
                         else:
@@ -229,13 +238,48 @@ class UI:
                     start_vertex = int(input("Start vertex: "))
                     end_vertex = int(input("End vertex: "))
                     if self.__graph.is_vertex(start_vertex) and self.__graph.is_vertex(end_vertex):
-                        path, cost = self.__graph.dijkstra(start_vertex, end_vertex)
-                        if path is not None:
+                        option = input("1. Dijkstra\n2. Bidirectional Dijkstra\n3. A* (no heuristic)\n>>> ")
+                        methods = {"1": "dijkstra", "2": "bidirectional", "3": "astar"}
+                        if option not in methods:
+                            print("Invalid option!")
+                            continue
+                        result = self.__graph.dijkstra(start_vertex, end_vertex, method=methods[option])
+                        if result is not None:
+                            path, cost = result
                             print(f"Path from {start_vertex} to {end_vertex}: {path}, cost: {cost}")
                         else:
                             print(f"No path from {start_vertex} to {end_vertex}")
                     else:
                         print("Invalid vertices!")
+                elif option == METRICS_MENU:
+                    state = "enabled" if METRICS.enabled else "disabled"
+                    option = input(f"Metrics are {state}\n1. Enable\n2. Disable\n3. Show (Prometheus)\n"
+                                   f"4. Show (JSON)\n5. Reset\n>>> ")
+                    if option == "1":
+                        METRICS.enabled = True
+                    elif option == "2":
+                        METRICS.enabled = False
+                    elif option == "3":
+                        print(METRICS.to_prometheus(), end="")
+                    elif option == "4":
+                        print(METRICS.to_json(indent=2))
+                    elif option == "5":
+                        METRICS.reset()
+                    else:
+                        print("Invalid option!")
+                elif option == K_SHORTEST_PATHS:
+                    start_vertex = int(input("Start vertex: "))
+                    end_vertex = int(input("End vertex: "))
+                    k = int(input("Number of paths: "))
+                    if self.__graph.is_vertex(start_vertex) and self.__graph.is_vertex(end_vertex):
+                        found = False
+                        for path, cost in self.__graph.k_shortest_paths(start_vertex, end_vertex, k):
+                            print(f"Path from {start_vertex} to {end_vertex}: {path}, cost: {cost}")
+                            found = True
+                        if not found:
+                            print(f"No path from {start_vertex} to {end_vertex}")
+                    else:
+                        print("Invalid vertices!")
                 else:
                     print("Invalid option!")
 
@@ -1,14 +1,107 @@
+import os
+import stat
+import tempfile
+from itertools import islice
+
+from src.binary_graph import BINARY_EXTENSION, write_binary_graph
+from src.file_compression import wrap_file
+from src.instrumentation import timed
+
+# number of edges formatted together before each write (larger batches are no faster and hold
+# more memory)
+BATCH_SIZE = 1 << 10
+
+
 # Write the graph from a text file (as an external function)
-def write_graph(graph, file_name):
+@timed("write_graph")
+def write_graph(graph, file_name, atomic=False, batch_size=BATCH_SIZE):
     """
     Complexity - O(m)
     Write the graph to a text file.
+    Edges are taken together with their costs and formatted batch_size at a time, so there is
+    one write per batch instead of one per edge. Files ending in .gz, .bz2, .xz or .zst are
+    compressed on the fly, and files named with the binary extension (see binary_graph.py)
+    are written in the binary format.
     :param graph: the graph to be written
     :param file_name: the name of the file
+    :param atomic: if True, write to a temporary file in the same directory and rename it over
+                   file_name once it is complete and synced, so readers never see a partial file.
+                   The file keeps the permissions of the file it replaces (or gets those of a
+                   new file under the umask), and the directory is synced after the rename.
+    :param batch_size: the number of edges formatted before each write
     :return: None
     """
-    output_file = open(file_name, "w")
-    output_file.write(f"{graph.number_of_vertices} {graph.number_of_edges}\n")
-    for edge in graph.get_edges_list():
-        output_file.write(f"{edge[0]} {edge[1]} {graph.get_cost(edge[0], edge[1])}\n")
-    output_file.close()
+    if not atomic:
+        _write_graph_file(graph, file_name, file_name, batch_size)
+        return
+
+    directory = os.path.dirname(os.path.abspath(file_name))
+    descriptor, temporary_name = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_name)}.",
+                                                  suffix=".tmp")
+    os.close(descriptor)
+    try:
+        # mkstemp creates the file for its owner only, which the rename would carry over
+        os.chmod(temporary_name, _file_mode(file_name))
+        _write_graph_file(graph, temporary_name, file_name, batch_size)
+        descriptor = os.open(temporary_name, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+        os.replace(temporary_name, file_name)
+    except BaseException:
+        os.remove(temporary_name)
+        raise
+    _fsync_directory(directory)
+
+
+def _file_mode(file_name):
+    """
+    Complexity - Theta(1)
+    :param file_name: the name of the file about to be replaced
+    :return: the permission bits of the file, or those that open gives a new file (0o666 under
+             the umask) if it does not exist
+    """
+    try:
+        return stat.S_IMODE(os.stat(file_name).st_mode)
+    except FileNotFoundError:
+        # the umask can only be read by setting it
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _fsync_directory(directory):
+    """
+    Complexity - Theta(1)
+    Syncs a directory, so that a rename in it survives a crash. Directories cannot be opened on
+    Windows, where this does nothing.
+    :return: None
+    """
+    if os.name == "nt":
+        return
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def _write_graph_file(graph, output_name, file_name, batch_size):
+    """
+    Complexity - O(m)
+    Writes the graph to output_name, in the format chosen by the name file_name.
+    :return: None
+    """
+    if file_name.endswith(BINARY_EXTENSION):
+        write_binary_graph(graph, output_name)
+        return
+
+    with open(output_name, "wb") as raw_file, wrap_file(raw_file, file_name, "wb") as output_file:
+        output_file.write(f"{graph.number_of_vertices} {graph.number_of_edges}\n".encode())
+        edges = graph.get_edges_with_costs()
+        while True:
+            batch = list(islice(edges, batch_size))
+            if not batch:
+                break
+            output_file.write("".join([f"{start} {end} {cost}\n" for start, end, cost in batch]).encode())
@@ -0,0 +1,118 @@
+"""
+A deliberately simple model of a graph and brute-force answers to compare the Graph against.
+"""
+from collections import deque
+
+
+class ReferenceGraph:
+    """
+    Vertices in a set and edges in a dict {(start_vertex, end_vertex): cost}, with the same
+    mutation semantics as Graph.
+    """
+
+    def __init__(self):
+        self.vertices = set()
+        self.edges = {}
+
+    def copy(self):
+        reference = ReferenceGraph()
+        reference.vertices = set(self.vertices)
+        reference.edges = dict(self.edges)
+        return reference
+
+    def add_vertex(self, vertex):
+        if vertex in self.vertices:
+            return False
+        self.vertices.add(vertex)
+        return True
+
+    def add_edge(self, start_vertex, end_vertex, cost):
+        self.vertices.update((start_vertex, end_vertex))
+        if (start_vertex, end_vertex) in self.edges:
+            return False
+        self.edges[start_vertex, end_vertex] = cost
+        return True
+
+    def remove_edge(self, start_vertex, end_vertex):
+        return self.edges.pop((start_vertex, end_vertex), None) is not None
+
+    def remove_vertex(self, vertex):
+        if vertex not in self.vertices:
+            return False
+        self.vertices.remove(vertex)
+        self.edges = {edge: cost for edge, cost in self.edges.items() if vertex not in edge}
+        return True
+
+    def modify_cost(self, start_vertex, end_vertex, cost):
+        self.edges[start_vertex, end_vertex] = cost
+
+    def clear(self):
+        self.vertices.clear()
+        self.edges.clear()
+
+    def successors(self, vertex):
+        return {end: cost for (start, end), cost in self.edges.items() if start == vertex}
+
+    def predecessors(self, vertex):
+        return {start for (start, end) in self.edges if end == vertex}
+
+
+def distances(reference, source):
+    """
+    Bellman-Ford, which needs nothing of the Graph.
+    :return: a dict mapping every vertex reached from source to its distance
+    """
+    result = {source: 0}
+    for _ in range(len(reference.vertices)):
+        changed = False
+        for (start, end), cost in reference.edges.items():
+            if start in result and (end not in result or result[start] + cost < result[end]):
+                result[end] = result[start] + cost
+                changed = True
+        if not changed:
+            break
+    return result
+
+
+def hop_distances(reference, source):
+    """
+    :return: a dict mapping every vertex reached from source to its number of edges from it
+    """
+    result = {source: 0}
+    queue = deque([source])
+    while queue:
+        vertex = queue.popleft()
+        for neighbor in reference.successors(vertex):
+            if neighbor not in result:
+                result[neighbor] = result[vertex] + 1
+                queue.append(neighbor)
+    return result
+
+
+def simple_paths(reference, start_vertex, end_vertex):
+    """
+    :return: the list of (cost, path) of every path without repeated vertices from start_vertex
+             to end_vertex
+    """
+    paths = []
+
+    def extend(path, cost):
+        vertex = path[-1]
+        if vertex == end_vertex:
+            paths.append((cost, list(path)))
+            return
+        for neighbor, edge_cost in reference.successors(vertex).items():
+            if neighbor not in path:
+                path.append(neighbor)
+                extend(path, cost + edge_cost)
+                path.pop()
+
+    extend([start_vertex], 0)
+    return paths
+
+
+def walk_cost(graph, path):
+    """
+    :return: the cost of the walk along path in the graph (KeyError if an edge is missing)
+    """
+    return sum(graph.get_cost(start, end) for start, end in zip(path, path[1:]))
@@ -0,0 +1,130 @@
+import copy
+import pickle
+import random
+
+import pytest
+
+from src.graph import Graph
+from tests.reference import ReferenceGraph, distances, hop_distances, walk_cost
+
+
+def mutate(graph, reference, generator, steps, vertex_range=20):
+    """
+    Applies the same random mutations to the graph and to the reference, checking what every
+    mutation returns.
+    """
+    for _ in range(steps):
+        operation = generator.random()
+        start, end = generator.randrange(vertex_range), generator.randrange(vertex_range)
+        cost = generator.randint(0, 9)
+        if operation < 0.35:
+            assert graph.add_edge(start, end, cost) == reference.add_edge(start, end, cost)
+        elif operation < 0.45:
+            assert graph.add_vertex(start) == reference.add_vertex(start)
+        elif operation < 0.6:
+            if graph.is_vertex(start):
+                assert graph.remove_edge(start, end) == reference.remove_edge(start, end)
+        elif operation < 0.7:
+            assert graph.remove_vertex(start) == reference.remove_vertex(start)
+        elif operation < 0.82:
+            if (start, end) in reference.edges:
+                graph.modify_cost((start, end), cost)
+                reference.modify_cost(start, end, cost)
+        elif operation < 0.9:
+            edges = [(start, end, cost), (end, start, cost + 1)]
+            graph.add_edges(edges)
+            for edge in edges:
+                reference.add_edge(*edge)
+        elif operation < 0.98:
+            pairs = [(start, end), (end, start)]
+            graph.remove_edges(pairs)
+            for pair in pairs:
+                reference.remove_edge(*pair)
+        else:
+            graph.clear_graph()
+            reference.clear()
+
+
+def assert_same(graph, reference):
+    assert set(graph.parse_vertices()) == reference.vertices
+    assert {(start, end): cost for start, end, cost in graph.get_edges_with_costs()} == reference.edges
+    assert graph.number_of_edges == len(reference.edges)
+    for vertex in reference.vertices:
+        successors = reference.successors(vertex)
+        predecessors = reference.predecessors(vertex)
+        assert dict(graph.neighbors(vertex)) == successors
+        assert set(graph.parse_inbound(vertex)) == predecessors
+        assert graph.out_degree(vertex) == len(successors)
+        assert graph.in_degree(vertex) == len(predecessors)
+
+
+@pytest.mark.parametrize("lean", [False, True])
+@pytest.mark.parametrize("seed", range(25))
+def test_random_mutations_match_reference(lean, seed):
+    generator = random.Random(seed)
+    graph, reference = Graph(lean=lean), ReferenceGraph()
+    for _ in range(20):
+        mutate(graph, reference, generator, 15)
+        assert_same(graph, reference)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_searches_match_brute_force(seed):
+    generator = random.Random(seed)
+    graph, reference = Graph(lean=seed % 2 == 1), ReferenceGraph()
+    mutate(graph, reference, generator, 120)
+    snapshot = graph.freeze()
+    vertices = sorted(reference.vertices)
+    for source in vertices[:6]:
+        expected = distances(reference, source)
+        hops = hop_distances(reference, source)
+        tree = graph.shortest_path_tree(source)
+        for target in vertices:
+            cost = expected.get(target)
+            for method in ("dijkstra", "bidirectional", "astar"):
+                result = graph.dijkstra(source, target, method=method)
+                assert (None if result is None else result[1]) == cost, (method, source, target)
+            for queue in ("heap", "indexed", "bucket"):
+                result = graph.dijkstra(source, target, queue=queue)
+                assert (None if result is None else result[1]) == cost, (queue, source, target)
+                if result is not None:
+                    assert result[0][0] == source and result[0][-1] == target
+                    assert walk_cost(graph, result[0]) == cost
+            snapshot_result = snapshot.dijkstra(source, target)
+            assert (None if snapshot_result is None else snapshot_result[1]) == cost
+            assert tree.distance(target) == cost
+            for bidirectional in (False, True):
+                path = graph.backward_bfs(source, target, bidirectional=bidirectional)
+                assert (None if path is None else len(path) - 1) == hops.get(target)
+                if path is not None:
+                    walk_cost(graph, path)  # every edge of the path exists
+
+
+@pytest.mark.parametrize("lean", [False, True])
+@pytest.mark.parametrize("seed", range(8))
+def test_copy_on_write_copies_are_isolated(lean, seed):
+    generator = random.Random(seed)
+    graph, reference = Graph(lean=lean), ReferenceGraph()
+    mutate(graph, reference, generator, 60)
+    copies = [(graph, reference)]
+    for _ in range(6):
+        # copy any graph of the family, then change every graph on its own
+        source, source_reference = generator.choice(copies)
+        copies.append((source.copy_graph(copy_on_write=generator.random() < 0.8), source_reference.copy()))
+        for member, member_reference in copies:
+            mutate(member, member_reference, generator, 10)
+        for member, member_reference in copies:
+            assert_same(member, member_reference)
+
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_deepcopy_and_pickle(lean):
+    generator = random.Random(1)
+    graph, reference = Graph(lean=lean), ReferenceGraph()
+    mutate(graph, reference, generator, 80)
+    for duplicate in (copy.deepcopy(graph), pickle.loads(pickle.dumps(graph))):
+        assert_same(duplicate, reference)
+        duplicate_reference = reference.copy()
+        mutate(duplicate, duplicate_reference, generator, 40)
+        assert_same(duplicate, duplicate_reference)
+        assert_same(graph, reference)
@@ -0,0 +1,86 @@
+import os
+import random
+import shutil
+
+import pytest
+
+from src.graph import Graph
+from src.journal import JOURNAL_NAME, MutationJournal
+from tests.reference import ReferenceGraph
+from tests.test_graph import assert_same, mutate
+
+# nothing reaches the files between two explicit syncs
+NEVER = {"sync_records": 1 << 30, "sync_seconds": 3600}
+
+
+def crash_copy(directory, copy_directory):
+    """
+    Copies the files of an open journal, as a crash would leave them, with a torn record at the
+    end of the newest journal.
+    :return: None
+    """
+    shutil.copytree(directory, copy_directory)
+    journals = [name for name in os.listdir(copy_directory) if name.startswith(JOURNAL_NAME.split("{")[0])]
+    newest = max(journals, key=lambda name: int("".join(filter(str.isdigit, name))))
+    with open(os.path.join(copy_directory, newest), "ab") as journal_file:
+        journal_file.write(b"\x02\x01\x00")
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_crash_replays_the_synced_changes(tmp_path, seed):
+    generator = random.Random(seed)
+    journal = MutationJournal.open(str(tmp_path / "journal"), **NEVER)
+    graph, reference = journal.graph, ReferenceGraph()
+    try:
+        for step in range(6):
+            mutate(graph, reference, generator, 40)
+            if step % 2:
+                # finished before the copy below, which would race its deletions
+                journal.checkpoint(wait=True)
+            graph.vertice_count = generator.randrange(30)
+            journal.sync()
+            synced, synced_count = reference.copy(), graph.number_of_vertices
+            # changes after the sync are lost in the crash
+            mutate(graph, reference, generator, 10)
+
+            crash_directory = str(tmp_path / f"crash-{step}")
+            crash_copy(str(tmp_path / "journal"), crash_directory)
+            recovered = MutationJournal.open(crash_directory, **NEVER)
+            try:
+                assert_same(recovered.graph, synced)
+                assert recovered.graph.number_of_vertices == synced_count
+                # the recovered journal goes on from there
+                mutate(recovered.graph, synced, generator, 20)
+            finally:
+                recovered.close()
+            reopened = MutationJournal.open(crash_directory)
+            assert_same(reopened.graph, synced)
+            reopened.close()
+    finally:
+        journal.close()
+
+    reopened = MutationJournal.open(str(tmp_path / "journal"))
+    assert_same(reopened.graph, reference)
+    reopened.close()
+
+
+def test_journal_refuses_values_it_cannot_store(tmp_path):
+    journal = MutationJournal.open(str(tmp_path))
+    graph = journal.graph
+    graph.add_edge(1, 2, 3)
+    for change in (lambda: graph.add_edge(2, 3, 1 << 63), lambda: graph.add_vertex("x"),
+                   lambda: graph.add_edges([(5, 6, 1), (7, 8, 1.5)]), lambda: graph.modify_cost((1, 2), 1 << 64)):
+        with pytest.raises(ValueError):
+            change()
+    assert sorted(graph.get_edges_with_costs()) == [(1, 2, 3), (5, 6, 1)]
+    journal.close()
+
+    reopened = MutationJournal.open(str(tmp_path))
+    assert sorted(reopened.graph.get_edges_with_costs()) == [(1, 2, 3), (5, 6, 1)]
+    reopened.close()
+
+
+def test_open_refuses_a_graph_for_an_existing_journal(tmp_path):
+    MutationJournal.open(str(tmp_path)).close()
+    with pytest.raises(ValueError):
+        MutationJournal.open(str(tmp_path), Graph())
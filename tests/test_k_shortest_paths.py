@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from src.graph import Graph
+from tests.reference import ReferenceGraph, simple_paths, walk_cost
+
+
+def random_graph(generator, lean):
+    vertex_count = generator.randint(2, 8)
+    graph, reference = Graph(lean=lean), ReferenceGraph()
+    for vertex in range(vertex_count):
+        graph.add_vertex(vertex)
+        reference.add_vertex(vertex)
+    for _ in range(generator.randint(0, 3 * vertex_count)):
+        edge = generator.randrange(vertex_count), generator.randrange(vertex_count), generator.randint(0, 5)
+        graph.add_edge(*edge)
+        reference.add_edge(*edge)
+    return graph, reference, vertex_count
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_k_shortest_paths_match_brute_force(seed):
+    generator = random.Random(seed)
+    for trial in range(60):
+        graph, reference, vertex_count = random_graph(generator, lean=trial % 2 == 1)
+        start, end = generator.randrange(vertex_count), generator.randrange(vertex_count)
+        expected = sorted(cost for cost, _ in simple_paths(reference, start, end))
+
+        paths = list(graph.k_shortest_paths(start, end))
+        assert [cost for _, cost in paths] == expected
+        assert len({tuple(path) for path, _ in paths}) == len(paths)
+        for path, cost in paths:
+            assert path[0] == start and path[-1] == end and len(set(path)) == len(path)
+            assert walk_cost(graph, path) == cost
+
+        k = generator.randint(0, 4)
+        assert [cost for _, cost in graph.k_shortest_paths(start, end, k)] == expected[:k]
+
+
+def test_k_shortest_paths_stops_when_the_graph_changes():
+    graph = Graph()
+    graph.add_edges([(1, 2, 1), (2, 3, 1), (1, 3, 5)])
+    paths = graph.k_shortest_paths(1, 3)
+    assert next(paths) == ([1, 2, 3], 2)
+    graph.add_edge(3, 4, 1)
+    with pytest.raises(RuntimeError):
+        next(paths)
+
+
+def test_k_shortest_paths_rejects_a_negative_k():
+    graph = Graph()
+    graph.add_edge(1, 2, 1)
+    with pytest.raises(ValueError):
+        graph.k_shortest_paths(1, 2, -1)
@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+from src.all_pairs import all_pairs_shortest_paths
+from src.graph import Graph
+from tests.reference import ReferenceGraph, distances, hop_distances, walk_cost
+from tests.test_graph import mutate
+
+
+def reach(reference, source):
+    return set(hop_distances(reference, source))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_subscribed_shortest_paths_follow_the_graph(seed):
+    generator = random.Random(seed)
+    graph, reference = Graph(), ReferenceGraph()
+    mutate(graph, reference, generator, 40, vertex_range=15)
+    subscriptions = [graph.subscribe_shortest_paths(source) for source in sorted(reference.vertices)[:3]]
+    # a subscription stops for good once its source is removed (or the graph cleared)
+    stopped = set()
+    for _ in range(40):
+        mutate(graph, reference, generator, 1, vertex_range=15)
+        for subscription in subscriptions:
+            if subscription in stopped or subscription.source not in reference.vertices:
+                stopped.add(subscription)
+                assert len(subscription) == 0
+                continue
+            expected = distances(reference, subscription.source)
+            for vertex in reference.vertices:
+                assert subscription.distance(vertex) == expected.get(vertex)
+                if vertex in expected:
+                    path = subscription.path(vertex)
+                    assert path[0] == subscription.source and walk_cost(graph, path) == expected[vertex]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_component_index_follows_the_graph(seed):
+    generator = random.Random(seed)
+    graph, reference = Graph(), ReferenceGraph()
+    mutate(graph, reference, generator, 30, vertex_range=12)
+    index = graph.component_index()
+    for step in range(30):
+        mutate(graph, reference, generator, 1, vertex_range=12)
+        reached = {vertex: reach(reference, vertex) for vertex in reference.vertices}
+        for start in reference.vertices:
+            for end in reference.vertices:
+                if not index.may_reach(start, end):
+                    assert end not in reached[start]
+        if step % 5 == 0:
+            component_of = {vertex: i for i, component in enumerate(graph.strongly_connected_components())
+                            for vertex in component}
+            assert set(component_of) == reference.vertices
+            for start in reference.vertices:
+                for end in reference.vertices:
+                    strongly_connected = end in reached[start] and start in reached[end]
+                    assert (component_of[start] == component_of[end]) == strongly_connected
+            # strong components are numbered in topological order
+            for start, end in reference.edges:
+                assert component_of[start] <= component_of[end]
+
+
+@pytest.mark.parametrize("weighted", [True, False])
+@pytest.mark.parametrize("seed", range(5))
+def test_distance_oracle_matches_brute_force(weighted, seed):
+    generator = random.Random(seed)
+    graph, reference = Graph(), ReferenceGraph()
+    mutate(graph, reference, generator, 60, vertex_range=15)
+    oracle = graph.build_distance_oracle(weighted=weighted, auto_rebuild=True)
+    for _ in range(5):
+        for source in reference.vertices:
+            expected = distances(reference, source) if weighted else hop_distances(reference, source)
+            for target in reference.vertices:
+                assert oracle.distance(source, target) == expected.get(target)
+                if weighted and target in expected:
+                    path, cost = oracle.path(source, target)
+                    assert path[0] == source and path[-1] == target
+                    assert cost == expected[target] == walk_cost(graph, path)
+        mutate(graph, reference, generator, 5, vertex_range=15)
+
+
+@pytest.mark.parametrize("method", ["floyd_warshall", "johnson"])
+@pytest.mark.parametrize("seed", range(5))
+def test_all_pairs_shortest_paths_match_brute_force(method, seed):
+    generator = random.Random(seed)
+    graph, reference = Graph(), ReferenceGraph()
+    mutate(graph, reference, generator, 80, vertex_range=15)
+    # a negative edge, without negative cycles, for the potentials of Johnson's algorithm
+    start = min(reference.vertices, default=None)
+    if start is not None and not any(end == start for (_, end) in reference.edges):
+        target = generator.choice(sorted(reference.vertices))
+        if target != start:
+            reference.edges.pop((start, target), None)
+            graph.remove_edge(start, target)
+            graph.add_edge(start, target, -3)
+            reference.add_edge(start, target, -3)
+    matrix = all_pairs_shortest_paths(graph, method=method, workers=1)
+    for source in reference.vertices:
+        expected = distances(reference, source)
+        for target in reference.vertices:
+            assert matrix.distance(source, target) == expected.get(target)